@@ -0,0 +1,4 @@
+"""
+Benchmarks of the framework's own overhead, separate from model latency.
+Run with `python3 -m benchmarks`, see `python3 -m benchmarks --help`.
+"""
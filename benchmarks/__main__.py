@@ -0,0 +1,54 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+
+from tabulate import tabulate
+
+from . import multiagent, baseline
+from .harness import select, run_all, load_results, compare, format_time
+
+parser = argparse.ArgumentParser(description="Benchmark the framework overhead of the agents, without calling the models")
+parser.add_argument("filters", nargs="*", help="Only run the benchmarks whose name contains one of these")
+parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+parser.add_argument("--repeat", default=5, type=int, help="Timed repeats of each benchmark, the median is compared")
+parser.add_argument("--min-time", default=0.2, type=float, help="Minimum seconds of each repeat, sets the calls per repeat")
+parser.add_argument("-o", "--output", default=None, help="Save the results JSON, to compare with a later commit")
+parser.add_argument("--compare", default=None, help="Results JSON of an earlier run to compare with")
+parser.add_argument("--threshold", default=0.1, type=float, help="Relative change of the median reported as a regression or improvement")
+parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if any benchmark failed, or regressed against --compare")
+
+args = parser.parse_args()
+
+names = select(args.filters)
+if args.list:
+    print("\n".join(names))
+    sys.exit(0)
+
+def print_result(name, result):
+    if "skipped" in result:
+        print(f"{name:<70} skipped ({result['skipped']})")
+    elif "failed" in result:
+        print(f"{name:<70} FAILED ({result['failed']})")
+    else:
+        print(f"{name:<70} median {format_time(result['median']):>10}  min {format_time(result['min']):>10}  x{result['number']}")
+
+results = run_all(names, repeat=args.repeat, min_time=args.min_time, on_result=print_result)
+
+if args.output:
+    with Path(args.output).open("w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+if args.compare:
+    old = load_results(args.compare)
+    rows = compare(old, results, threshold=args.threshold)
+    print(f"\nComparing with {args.compare} (commit {old.get('commit')})")
+    print(tabulate([(name, format_time(o), format_time(n), f"{c:+.1%}" if c is not None else "-", status)
+                    for name, o, n, c, status in rows],
+                   headers=["benchmark", "before", "after", "change", "status"]))
+    if args.fail_on_regression and any(row[4] == "regression" for row in rows):
+        sys.exit(1)
+
+if args.fail_on_regression and any("failed" in result for result in results["results"].values()):
+    sys.exit(1)
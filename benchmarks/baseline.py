@@ -0,0 +1,39 @@
+"""
+Benchmarks of the baseline formatters, which parse the tool calls out of every model response.
+"""
+from .harness import benchmark
+
+# Length of the thought before the tool calls, models often think at length before acting
+THOUGHT_SIZES = [1_000, 100_000]
+
+def formatted_response(formatter, thought_size, wrap=lambda calls: calls):
+    """Model response with a thought and two tool calls in the formatter's syntax, wrap adds the delimiters"""
+    from nyuctf_baseline.tools.tools import CommandExec, CheckFlag
+
+    thought = ("Let me look at the binary more closely before trying the exploit. " * (thought_size // 67 + 1))[:thought_size]
+    tool_calls = [
+        CommandExec.make_call(command="objdump -d ctf_files/chall | grep -A20 '<main>:'", timeout=60),
+        CheckFlag.make_call(flag="csawctf{b3nchm4rk_fl4g}"),
+    ]
+    return thought + "\n\n" + wrap(formatter.format_tool_calls(tool_calls))
+
+def default_tools():
+    from nyuctf_baseline.tools import TOOLSETS
+    return {tool.NAME: tool for tool in TOOLSETS["default"]}
+
+@benchmark("formatter.xml.extract_tool_calls", thought=THOUGHT_SIZES)
+def xml_extract_tool_calls(thought):
+    from nyuctf_baseline.formatters import XMLFormatter
+
+    formatter = XMLFormatter(default_tools(), prompt_manager=None)
+    response = formatted_response(formatter, thought)
+    return lambda: formatter.extract_tool_calls(response)
+
+@benchmark("formatter.yaml.extract_tool_calls", thought=THOUGHT_SIZES)
+def yaml_extract_tool_calls(thought):
+    from nyuctf_baseline.formatters import YAMLFormatter
+    from nyuctf_baseline.formatters.yaml import TOOL_USE_START, TOOL_USE_STOP, _md
+
+    formatter = YAMLFormatter(default_tools())
+    response = formatted_response(formatter, thought, wrap=lambda calls: f"{TOOL_USE_START}\n{_md(calls)}\n{TOOL_USE_STOP}")
+    return lambda: formatter.extract_tool_calls(response)
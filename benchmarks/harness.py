@@ -0,0 +1,126 @@
+import json
+import time
+import timeit
+import platform
+import itertools
+import statistics
+import subprocess
+from pathlib import Path
+
+now = lambda: time.time()
+
+# Registered benchmarks by name, each is (setup function, params of the case)
+BENCHMARKS = {}
+
+def benchmark(name, **params):
+    """
+    Register a benchmark. The decorated setup function builds the fixtures outside the timed region,
+    and returns the function to time. Each keyword takes a list of values, and one case is
+    registered for every combination, named e.g. `conversation.messages[rounds=100]`.
+    """
+    def register(setup):
+        keys = list(params.keys())
+        for values in itertools.product(*[params[k] for k in keys]):
+            case = dict(zip(keys, values))
+            case_name = name
+            if case:
+                case_name += "[" + ",".join(f"{k}={v}" for k, v in case.items()) + "]"
+            BENCHMARKS[case_name] = (setup, case)
+        return setup
+    return register
+
+def select(filters=None):
+    """Names of the benchmarks containing any of the filters, all if no filter"""
+    return [name for name in BENCHMARKS if not filters or any(f in name for f in filters)]
+
+def run_benchmark(name, repeat=5, min_time=0.2):
+    """
+    Time one benchmark. The number of calls per repeat is picked so a repeat takes at least min_time,
+    the reported times are per call in seconds. A benchmark whose dependencies are missing is
+    skipped, and one that raises is reported as failed, with the reason so the other benchmarks still run.
+    """
+    setup, case = BENCHMARKS[name]
+    try:
+        timer = timeit.Timer(setup(**case))
+        number = 1
+        while True:
+            elapsed = timer.timeit(number)
+            if elapsed >= min_time or number >= 1_000_000:
+                break
+            number *= 10 if elapsed < min_time / 10 else 2
+        times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    except ImportError as e:
+        return {"skipped": f"{type(e).__name__}: {e}"}
+    except Exception as e:
+        return {"failed": f"{type(e).__name__}: {e}"}
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+def git_commit():
+    """Commit of the tree being benchmarked, None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_all(names, repeat=5, min_time=0.2, on_result=None):
+    """Run the benchmarks and return the results document, on_result is called with each result"""
+    results = {}
+    for name in names:
+        results[name] = run_benchmark(name, repeat=repeat, min_time=min_time)
+        if on_result is not None:
+            on_result(name, results[name])
+    return {
+        "time": now(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+def load_results(path):
+    with Path(path).open("r") as f:
+        return json.load(f)
+
+def compare(old, new, threshold=0.1):
+    """
+    Compare the median times of two results documents.
+    Returns rows of (name, old median, new median, relative change, status), status is one of
+    "regression" or "improvement" if the change is beyond threshold, "ok", "failed" if the benchmark
+    raises in the new run, "skipped" if its dependencies are missing, or "new" if it has no earlier time.
+    """
+    rows = []
+    for name, result in new["results"].items():
+        prev = old["results"].get(name)
+        if "failed" in result:
+            rows.append((name, prev.get("median") if prev is not None else None, None, None, "failed"))
+            continue
+        if "skipped" in result:
+            rows.append((name, None, None, None, "skipped"))
+            continue
+        if prev is None or "median" not in prev:
+            rows.append((name, None, result["median"], None, "new"))
+            continue
+        change = result["median"] / prev["median"] - 1
+        if change > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        rows.append((name, prev["median"], result["median"], change, status))
+    return rows
+
+def format_time(seconds):
+    if seconds is None:
+        return "-"
+    for unit, scale in [("s", 1), ("ms", 1e-3), ("us", 1e-6)]:
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
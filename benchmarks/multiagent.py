@@ -0,0 +1,147 @@
+"""
+Benchmarks of the orchestration hot paths of the multi-agent system: building the conversation
+messages, formatting them for each provider, truncating observations, checking for the flag,
+and serializing the log. Nothing here calls a model or a container.
+"""
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from .harness import benchmark
+
+ROUNDS = [100, 500, 1000]
+OUTPUT_SIZES = [1_000_000, 8_000_000]
+
+FLAG = "csawctf{b3nchm4rk_fl4g}"
+
+def command_output(size, seed=0):
+    """Command output of about size characters, which does not contain the flag"""
+    line = f"[{seed:06d}] drwxr-xr-x 2 ctfplayer ctfplayer 4096 Jan  1 00:00 ctf_files/bin_{seed}\n"
+    return (line * (size // len(line) + 1))[:size]
+
+def build_conversation(rounds, len_observations=5, max_input_tokens=None, output_size=2000):
+    """Executor conversation with a run_command call and its output in every round"""
+    from nyuctf_multiagent.conversation import Conversation
+    from nyuctf_multiagent.tools import ToolCall, ToolResult
+
+    conversation = Conversation(name="executor", len_observations=len_observations,
+                                max_input_tokens=max_input_tokens)
+    conversation.append_system("You are a skilled cybersecurity professional and top CTF player. " * 20)
+    conversation.append_user("Your task is to solve the benchmark challenge. " * 20)
+    conversation.next_round()
+    for i in range(rounds):
+        tool_call = ToolCall(name="run_command", id=f"call_{i}",
+                             arguments=json.dumps({"command": f"ls -la ctf_files/ # round {i}"}),
+                             parsed_arguments={"command": f"ls -la ctf_files/ # round {i}"})
+        conversation.append_assistant(f"Listing the files again to check round {i}.", tool_call)
+        conversation.append_observation(ToolResult(name="run_command", id=tool_call.id, result={
+            "stdout": command_output(output_size, i), "stderr": "", "returncode": 0, "timed_out": False}))
+        conversation.next_round()
+    return conversation
+
+@benchmark("conversation.messages", rounds=ROUNDS)
+def conversation_messages(rounds):
+    conversation = build_conversation(rounds)
+    return lambda: list(conversation.messages)
+
+@benchmark("conversation.messages.token_budget", rounds=ROUNDS)
+def conversation_messages_token_budget(rounds):
+    from nyuctf_multiagent.conversation import count_tokens
+    try:
+        # Loads the encoding, which tiktoken downloads on first use
+        count_tokens("")
+    except Exception as e:
+        raise ImportError(f"tiktoken o200k_base encoding is not available: {e}") from e
+    # Budget of a quarter of the observations, so the oldest rounds are truncated every time
+    conversation = build_conversation(rounds, len_observations=None, max_input_tokens=rounds * 150)
+    # Token counts are cached per message, time the steady state of a running agent
+    list(conversation.messages)
+    return lambda: list(conversation.messages)
+
+def build_backend(name):
+    """Backend of the executor role, the clients are created with a dummy key and never called"""
+    from nyuctf_multiagent.backends import BACKENDS, Role
+    from nyuctf_multiagent.config import Config
+    from nyuctf_multiagent.tools import RunCommandTool, FinishTaskTool
+
+    backend_cls = next(b for b in BACKENDS if b.NAME == name)
+    tools = {t.NAME: t(None) for t in [RunCommandTool, FinishTaskTool]}
+    return backend_cls(Role.EXECUTOR, next(iter(backend_cls.MODELS)), tools, "benchmark", Config())
+
+@benchmark("backend.format_messages", backend=["openai", "anthropic", "together", "gemini"], cache=["cold", "warm"], rounds=[100, 1000])
+def backend_format_messages(backend, cache, rounds):
+    """
+    Provider formatting done by send before the request. Cold formats every message,
+    warm only the messages of the last round, like a running agent.
+    """
+    backend = build_backend(backend)
+    messages = list(build_conversation(rounds, len_observations=None).messages)
+    if cache == "cold":
+        def fn():
+            backend._formatted = {}
+            backend.format_messages(messages)
+        return fn
+    backend.format_messages(messages[:-2])
+    def fn():
+        backend.format_messages(messages)
+        # Drop the last round from the cache, so each call formats one new round
+        for m in messages[-2:]:
+            backend._formatted.pop((m.uid, m.tool_data is None), None)
+    return fn
+
+@benchmark("conversation.append_observation", size=OUTPUT_SIZES)
+def append_observation(size):
+    from nyuctf_multiagent.conversation import Conversation
+    from nyuctf_multiagent.tools import ToolResult
+
+    conversation = Conversation()
+    output = command_output(size)
+    def fn():
+        # append_observation truncates the result in place, so every call needs a new one
+        conversation.append_observation(ToolResult(name="run_command", id="call", result={
+            "stdout": output, "stderr": output, "returncode": 0, "timed_out": False}))
+        conversation.all_messages.clear()
+    return fn
+
+@benchmark("agent.check_flag_in_response", size=OUTPUT_SIZES)
+def check_flag_in_response(size):
+    from nyuctf_multiagent.agent import BaseAgent
+    from nyuctf_multiagent.flag_scanner import FlagScanner
+
+    agent = SimpleNamespace(flag_scanner=FlagScanner(FLAG), environment=SimpleNamespace(solved=False))
+    # Worst case, the flag is not in the output
+    output = command_output(size)
+    return lambda: BaseAgent.check_flag_in_response(agent, output)
+
+@benchmark("flag_scanner.search", size=OUTPUT_SIZES, data=["str", "bytes"])
+def flag_scanner_search(size, data):
+    """Scanning a message or a whole log file for the flag and its encodings"""
+    from nyuctf_multiagent.flag_scanner import FlagScanner
+
+    scanner = FlagScanner(FLAG)
+    output = command_output(size)
+    if data == "bytes":
+        output = output.encode()
+    return lambda: scanner.search(output)
+
+@benchmark("agent.dump_log", rounds=[100, 1000])
+def dump_log(rounds):
+    """Streaming the transcript and compacting it into the JSON log, as in dump_log"""
+    from nyuctf_multiagent.transcript import TranscriptWriter, compact
+
+    conversation = build_conversation(rounds)
+    logdir = Path(tempfile.mkdtemp(prefix="nyuctf_bench_"))
+    logfile = logdir / "benchmark.json"
+    def fn():
+        transcript = TranscriptWriter(logfile.with_suffix(".jsonl"), cost_fn=lambda: 0.0)
+        transcript.event("start", info={"start_time": 0.0, "autoprompter_model": None, "executor_model": "benchmark"})
+        transcript.watch(conversation, "executor")
+        transcript.flush()
+        transcript.event("end", summary={"end_time": 0.0, "time_taken": 0.0, "total_cost": 0.0,
+                                         "success": False, "exit_reason": "max_rounds", "error": None})
+        transcript.close()
+        with logfile.open("w") as lf:
+            json.dump(compact(transcript.path), lf, indent=2)
+        transcript.path.unlink()
+    return fn
@@ -0,0 +1,86 @@
+import java.io.File;
+import java.io.FileReader;
+import java.io.FileWriter;
+import java.io.IOException;
+import java.util.HashMap;
+import java.util.Map;
+
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import ghidra.app.script.GhidraScript;
+
+import com.google.gson.*;
+
+public class AnalyzeToJson extends GhidraScript {
+    private static Logger log;
+
+    public AnalyzeToJson() {
+        log = LogManager.getLogger(AnalyzeToJson.class);
+    }
+
+    private JsonObject runExport(String script, String name) throws Exception {
+        // Private temporary file, so concurrent analyses never read each other's output
+        File output = File.createTempFile(name, ".json");
+        try {
+            // Runs on the already analyzed currentProgram, so auto-analysis happens only once
+            runScript(script, new String[] { output.getPath() });
+            if (output.length() == 0) {
+                log.warn(String.format("%s did not generate output", script));
+                return null;
+            }
+            try (FileReader reader = new FileReader(output)) {
+                return JsonParser.parseReader(reader).getAsJsonObject();
+            }
+        } finally {
+            output.delete();
+        }
+    }
+
+    private void merge(HashMap<String, JsonObject> function_map, JsonObject address_map,
+                       JsonObject export, String kind) {
+        if (export == null) return;
+        for (Map.Entry<String, JsonElement> e : export.getAsJsonObject("functions").entrySet()) {
+            function_map.computeIfAbsent(e.getKey(), k -> new JsonObject()).add(kind, e.getValue());
+        }
+        for (Map.Entry<String, JsonElement> e : export.getAsJsonObject("addresses").entrySet()) {
+            address_map.add(e.getKey(), e.getValue());
+        }
+    }
+
+    public void export(String filename) throws Exception {
+        Gson gson = new GsonBuilder().setPrettyPrinting().create();
+        File outputFile = new File(filename);
+
+        JsonObject decomp = runExport("DecompileToJson.java", "decompile");
+        JsonObject disasm = runExport("DisassembleToJson.java", "disassemble");
+
+        HashMap<String, JsonObject> function_map = new HashMap<String, JsonObject>();
+        JsonObject address_map = new JsonObject();
+        merge(function_map, address_map, decomp, "decompilation");
+        merge(function_map, address_map, disasm, "disassembly");
+
+        JsonObject json_data = new JsonObject();
+        json_data.add("functions", gson.toJsonTree(function_map));
+        json_data.add("addresses", address_map);
+        // Prefer main found from the decompilation, else from the disassembly
+        if (decomp != null && decomp.has("main"))
+            json_data.add("main", decomp.get("main"));
+        else if (disasm != null && disasm.has("main"))
+            json_data.add("main", disasm.get("main"));
+        String json = gson.toJson(json_data);
+
+        // Write JSON to file
+        try (FileWriter writer = new FileWriter(outputFile)) {
+            writer.write(json);
+        } catch (IOException e) {
+            e.printStackTrace();
+        }
+    }
+
+    @Override
+    public void run() throws Exception {
+        String[] args = getScriptArgs();
+        export(args[0]);
+    }
+}
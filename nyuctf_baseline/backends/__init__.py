@@ -2,3 +2,4 @@ from .backend import Backend
 from .vllm_backend import VLLMBackend
 from .anthropic_backend import AnthropicBackend
 from .openai_backend import OpenAIBackend
+from .replay_backend import ReplayBackend, RecordingBackend
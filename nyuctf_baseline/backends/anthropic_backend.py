@@ -22,8 +22,8 @@ class AnthropicBackend(VLLMBackend):
     def client_setup(self):
         if self.api_key:
             api_key = self.api_key
-        elif KEYS and "ANTHROPIC_API_KEY" in KEYS:
-            api_key = KEYS["ANTHROPIC_API_KEY"].strip()
+        elif "ANTHROPIC_API_KEY" in get_keys():
+            api_key = get_keys()["ANTHROPIC_API_KEY"].strip()
         elif "ANTHROPIC_API_KEY" in os.environ:
             api_key = os.environ["ANTHROPIC_API_KEY"]
         elif os.path.exists(os.path.expanduser(self.API_KEY_PATH)):
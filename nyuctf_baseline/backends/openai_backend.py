@@ -13,7 +13,7 @@ from openai import RateLimitError
 from openai.types.chat import ChatCompletionMessage
 from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall as OAIToolCall
 from openai.types.chat.chat_completion_tool_param import ChatCompletionToolParam
-from .utils import KEYS, MODEL_INFO
+from .utils import get_keys, MODEL_INFO
 
 import backoff  # for exponential backoff
 
@@ -38,8 +38,8 @@ class OpenAIBackend(Backend):
 
     def __init__(self, system_message: str, hint_message: str, tools: dict[str,Tool], model: str = None, api_key: str = None, args: Namespace = None):
         if api_key is None:
-            if KEYS and "OPENAI_API_KEY" in KEYS:
-                api_key = KEYS["OPENAI_API_KEY"].strip()
+            if "OPENAI_API_KEY" in get_keys():
+                api_key = get_keys()["OPENAI_API_KEY"].strip()
             elif "OPENAI_API_KEY" in os.environ:
                 api_key = os.environ["OPENAI_API_KEY"]
             elif os.path.exists(os.path.expanduser(API_KEY_PATH)):
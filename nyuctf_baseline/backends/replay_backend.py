@@ -0,0 +1,130 @@
+from argparse import Namespace
+import json
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .backend import Backend
+from ..formatters import Formatter
+from ..tools import Tool, ToolCall, ToolResult
+from ..ctflogging import status
+
+def cassette_path(logfile):
+    """Cassette recorded next to the JSON log file"""
+    logfile = Path(logfile)
+    return logfile.with_name(f"{logfile.stem}.cassette.jsonl")
+
+def make_tool_calls(dumped) -> List[ToolCall]:
+    return [ToolCall.create_unparsed(tc["function"]["name"], tc["id"], tc["function"]["arguments"]) for tc in dumped or []]
+
+def log_responses(log) -> List[Tuple[Optional[str], List[ToolCall], float]]:
+    """Responses rebuilt from the assistant messages of a baseline JSON log, without costs"""
+    responses = []
+    prev_assistant = False
+    for _, m in log["messages"]:
+        if m.get("role") != "assistant":
+            prev_assistant = False
+            continue
+        response = (m.get("content"), make_tool_calls(m.get("tool_calls")), 0.0)
+        if prev_assistant and "tool_calls" in m:
+            # Formatter backends log the raw response, followed by the tool calls extracted from it
+            responses[-1] = response
+        else:
+            responses.append(response)
+        prev_assistant = True
+    return responses
+
+def cassette_responses(path) -> List[Tuple[Optional[str], List[ToolCall], float]]:
+    """Responses recorded in the cassette, with their original costs"""
+    responses = []
+    with open(path, "r") as f:
+        for line in f:
+            entry = json.loads(line)
+            responses.append((entry["content"], make_tool_calls(entry["tool_calls"]), entry["cost"]))
+    return responses
+
+class ReplayBackend(Backend):
+    """
+    Replays the responses of a previous run instead of calling a model, for offline benchmarking.
+    The responses come from a cassette recorded with --record, or from the JSON log of the run.
+    """
+    NAME = 'replay'
+    MODELS = ['replay']
+
+    def __init__(self, system_message: str, hint_message: str, tools: dict[str,Tool], model: str = None, api_key: str = None, args: Namespace = None):
+        self.tools = tools
+        self.args = args
+        self.model = self.MODELS[0]
+        self.system_message = system_message
+        self.hint_message = hint_message
+        self.messages += self.get_initial_messages()
+        if args.replay.endswith(".jsonl"):
+            self.responses = cassette_responses(args.replay)
+        else:
+            with open(args.replay, "r") as f:
+                self.responses = log_responses(json.load(f))
+
+    def setup(self):
+        status.system_message(self.system_message)
+        if self.args.hints:
+            status.hint_message(self.hint_message)
+
+    def get_initial_messages(self):
+        messages = [{"role": "system", "content": self.system_message}]
+        if self.args.hints:
+            messages.append({"role": "user", "content": self.hint_message, "hint": True})
+        return messages
+
+    @classmethod
+    def get_models(cls):
+        return cls.MODELS
+
+    def parse_tool_arguments(self, tool: Tool, tool_call: ToolCall) -> Tuple[bool, ToolCall | ToolResult]:
+        if tool_call.parsed_arguments:
+            return True, tool_call
+        try:
+            arguments = json.loads(tool_call.arguments)
+            # Unparsed calls are logged with their arguments JSON encoded a second time
+            if isinstance(arguments, str):
+                arguments = json.loads(arguments)
+            tool_call.parsed_arguments = arguments
+            Formatter.validate_args(tool, tool_call)
+            Formatter.convert_args(tool, tool_call)
+            return True, tool_call
+        except ValueError as e:
+            msg = f"{type(e).__name__} extracting parameters for {tool.name}: {e}"
+            status.debug_message(msg)
+            return False, tool_call.error(msg)
+
+    def append(self, message : dict|List[ToolResult]):
+        if isinstance(message, list):
+            self.messages.extend([r.model_dump() for r in message])
+        else:
+            self.messages.append(message)
+
+    def send(self, message: Optional[str]=None) -> Tuple[Optional[str],List[ToolCall],float]:
+        if message:
+            self.append({"role": "user", "content": message})
+        if len(self.responses) == 0:
+            raise ValueError("Replay has no more responses")
+        content, tool_calls, cost = self.responses.pop(0)
+        self.append({"role": "assistant", "content": content, "tool_calls": [tc.model_dump() for tc in tool_calls]})
+        return content, tool_calls, cost
+
+    def get_system_message(self):
+        return self.system_message
+
+class RecordingBackend:
+    """Wraps a live backend and records its responses to a cassette for ReplayBackend"""
+    def __init__(self, backend: Backend, path):
+        self.backend = backend
+        self.cassette = open(path, "w")
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def send(self, message: Optional[str]=None):
+        content, tool_calls, cost = self.backend.send(message)
+        entry = {"content": content, "tool_calls": [tc.model_dump() for tc in tool_calls], "cost": cost}
+        self.cassette.write(json.dumps(entry) + "\n")
+        self.cassette.flush()
+        return content, tool_calls, cost
@@ -8,6 +8,7 @@ import json
 from pathlib import Path
 import os
 import backoff
+from functools import cache
 
 PythonSyntax = partial(Syntax, lexer="python", theme=status.THEME, line_numbers=False)
 
@@ -42,8 +43,13 @@ def parse_keys(key_path=None):
                 line = line.split("=")
                 keys[line[0].strip() + "_API_KEY"] = line[1].strip()
         return keys
-    except FileExistsError:
-        return None
+    except FileNotFoundError:
+        return {}
+
+@cache
+def get_keys():
+    """Keys from keys.cfg, parsed on first use rather than when the backends are imported"""
+    return parse_keys()
 
 def fix_xml_seqs(seqs : List[str]) -> List[str]:
     return list(set(seqs +[fix_xml_tag_names(seq) for seq in seqs]))
@@ -64,5 +70,5 @@ class ModelQuirks(NamedTuple):
     augment_start_sequences: Optional[Callable[[List[str]], List[str]]] = None
 
 NO_QUIRKS = ModelQuirks(supports_system_messages=True)
-KEYS = parse_keys()
+# Read at import, the backend classes list their models from it
 MODEL_INFO = parse_models()
@@ -63,8 +63,8 @@ class VLLMBackend(Backend):
     def client_setup(self):
         if self.api_endpoint:
             base_url = self.api_endpoint
-        elif "MODEL_URL" in KEYS:
-            base_url = KEYS["MODEL_URL"].strip()
+        elif "MODEL_URL" in get_keys():
+            base_url = get_keys()["MODEL_URL"].strip()
         else:
             raise ValueError(f"No VLLM Endpoint provided")
         self.client = OpenAI(
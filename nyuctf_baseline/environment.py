@@ -8,10 +8,14 @@ from .ctflogging import status
 
 class CTFEnvironment:
     """Manages the docker env for the agent, and the challenge container."""
-    def __init__(self, challenge: CTFChallenge, container_image: str, network: str):
+    def __init__(self, challenge: CTFChallenge, container_image: str, network: str,
+                 max_output_bytes=None, kill_output_bytes=None):
         self.challenge = challenge
         self.container_image = container_image
         self.network = network
+        # Bytes kept of each command's stdout and stderr, and total output after which the command is killed
+        self.max_output_bytes = max_output_bytes
+        self.kill_output_bytes = kill_output_bytes
         self.available_tools = {}
         for tool in TOOLSETS.get(self.challenge.category, TOOLSETS['default']):
             tool_instance = tool(self)
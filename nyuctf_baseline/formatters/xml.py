@@ -1,6 +1,6 @@
 from argparse import Namespace
 import re
-from bs4 import BeautifulSoup
+import html
 from .formatter import Formatter
 from ..tools import Tool, ToolCall, ToolResult
 from ..prompts import PromptManager
@@ -9,6 +9,88 @@ from typing import List, Tuple
 TOOL_USE_START = '<function_calls>'
 TOOL_USE_STOP = '</function_calls>'
 
+INVOKE_START = re.compile(r'<invoke(\s[^<>]*)?>', re.IGNORECASE)
+INVOKE_PARTIAL = re.compile(r'<(i(n(v(o(k(e(\s[^<>]*)?)?)?)?)?)?)?$', re.IGNORECASE)
+INVOKE_STOP = re.compile(r'</invoke\s*>', re.IGNORECASE)
+ELEMENT_START = re.compile(r'<([A-Za-z_][\w.:-]*)(\s[^<>]*)?>')
+# Elements of an invocation that hold other elements rather than a value
+CONTAINERS = {'parameters'}
+
+def parse_invocation(body : str) -> dict[str,str]:
+    """Parse the body of an <invoke> into a dict of its elements and their text.
+
+    The elements of <parameters> are included at the top level, like the parameters
+    given directly in the <invoke>, and the first occurrence of an element wins. The
+    text of an element is kept as written, with any markup in it, and HTML entities
+    are decoded. An element without a closing tag runs to the end of the body.
+    """
+    elements = {}
+    pos = 0
+    while m := ELEMENT_START.search(body, pos):
+        name = m.group(1).lower()
+        if name in CONTAINERS:
+            pos = m.end()
+            continue
+        # Skip over nested elements of the same name to find the matching close
+        depth = 1
+        end = m.end()
+        for tag in re.finditer(rf'<(/?){re.escape(m.group(1))}(\s[^<>]*)?>', body[m.end():], re.IGNORECASE):
+            depth += -1 if tag.group(1) else 1
+            if depth == 0:
+                end = m.end() + tag.start()
+                pos = m.end() + tag.end()
+                break
+        else:
+            end = pos = len(body)
+        if name not in elements:
+            elements[name] = html.unescape(body[m.end():end])
+    return elements
+
+class InvokeParser:
+    """Incremental parser of the <invoke> elements of a model response.
+
+    Feed the response in chunks as they are streamed, and each invocation is returned
+    as a dict (see parse_invocation) by the feed call where its </invoke> arrives. Only
+    the text of the current invocation is buffered. close() returns an invocation left
+    unclosed at the end of the response.
+    """
+    def __init__(self):
+        self.buffer = ''
+        self.scan = 0
+        self.in_invoke = False
+
+    def feed(self, chunk : str) -> List[dict[str,str]]:
+        self.buffer += chunk
+        invocations = []
+        while True:
+            if not self.in_invoke:
+                if m := INVOKE_START.search(self.buffer, self.scan):
+                    self.buffer = self.buffer[m.end():]
+                    self.scan = 0
+                    self.in_invoke = True
+                    continue
+                # Keep a start tag that may be cut off at the end of the chunk
+                m = INVOKE_PARTIAL.search(self.buffer, max(self.scan, self.buffer.rfind('<')))
+                self.buffer = m.group(0) if m else ''
+                self.scan = 0
+                return invocations
+            if m := INVOKE_STOP.search(self.buffer, self.scan):
+                invocations.append(parse_invocation(self.buffer[:m.start()]))
+                self.buffer = self.buffer[m.end():]
+                self.scan = 0
+                self.in_invoke = False
+                continue
+            # Resume the search where a cut off end tag may start
+            self.scan = max(0, self.buffer.rfind('<'))
+            return invocations
+
+    def close(self) -> List[dict[str,str]]:
+        invocations = [parse_invocation(self.buffer)] if self.in_invoke else []
+        self.buffer = ''
+        self.scan = 0
+        self.in_invoke = False
+        return invocations
+
 class XMLFormatter(Formatter):
     NAME = 'xml'
 
@@ -58,23 +140,18 @@ class XMLFormatter(Formatter):
                 '\n'.join([self.format_result(result) for result in results]) +
                 "\n</function_results>")
 
+    def make_tool_call(self, invocation : dict[str,str]) -> ToolCall:
+        """Create an unparsed ToolCall from an invocation parsed by InvokeParser"""
+        arguments = dict(invocation)
+        name = arguments.pop("tool_name", "[not provided]")
+        id = arguments.pop("call_id", None)
+        # Defer parsing of parameters until we're actually ready to call the tools
+        return ToolCall.create_unparsed(name, id, arguments)
+
     def extract_tool_calls(self, message) -> List[ToolCall]:
-        soup = BeautifulSoup(message, "lxml")
-        invocations = soup.find_all("invoke")
-        tool_calls = []
-        for invocation in invocations:
-            if elem := invocation.find("tool_name"):
-                name = elem.text
-            else:
-                name = "[not provided]"
-            if elem := invocation.find("call_id"):
-                id = elem.text
-            else:
-                id = None
-            # Defer parsing of parameters until we're actually ready to call the tools
-            arguments = invocation
-            tool_calls.append(ToolCall.create_unparsed(name, id, arguments))
-        return tool_calls
+        parser = InvokeParser()
+        invocations = parser.feed(message) + parser.close()
+        return [self.make_tool_call(invocation) for invocation in invocations]
 
     def format_tool_call(self, tool_call : ToolCall, placeholder : bool = False):
         param_str = "\n".join([
@@ -105,12 +182,11 @@ class XMLFormatter(Formatter):
         return content
 
     def extract_params(self, tool : Tool, tc : ToolCall) -> ToolCall:
-        invocation : BeautifulSoup = tc.function.arguments
+        invocation : dict[str,str] = tc.function.arguments
         extracted_parameters = {}
         for param_name in tool.parameters:
-            if elem := invocation.find(param_name):
-                value = elem.text
-                extracted_parameters[param_name] = value
+            if param_name in invocation:
+                extracted_parameters[param_name] = invocation[param_name]
         parsed_tc = ToolCall.create_parsed(tc.name, tc.id, extracted_parameters)
         self.validate_args(tool, parsed_tc)
         self.convert_args(tool, parsed_tc)
@@ -4,10 +4,10 @@ import copy
 from dataclasses import dataclass
 from typing_extensions import Annotated
 from typing import TYPE_CHECKING, Any, Optional, Set, get_type_hints
-from tool_def_generator import ToolDefGenerator
 import inspect
 
 from ..utils import CALL_ID
+from .schema_cache import schema_cache, schema_key, schema_matches
 from ..ctflogging import status
 # if TYPE_CHECKING:
 #     from ..environment import CTFEnvironment
@@ -168,9 +168,14 @@ class Tool:
         super().__init_subclass__(**kwargs)
 
         cls.name = cls.NAME
-        # Automatically generate the schema from the __call__ method's annotations
-        generator = ToolDefGenerator(name_mappings=[(cls.__call__.__qualname__, cls.NAME)])
-        cls.schema = generator.generate(cls.__call__)[0]
+        # Automatically generate the schema from the __call__ method's annotations,
+        # cached on disk since every runner process imports the same tools
+        key = schema_key(cls)
+        cls.schema = schema_cache.get(key)
+        if cls.schema is None or not schema_matches(cls, cls.schema):
+            from tool_def_generator import ToolDefGenerator
+            generator = ToolDefGenerator(name_mappings=[(cls.__call__.__qualname__, cls.NAME)])
+            cls.schema = schema_cache.put(key, generator.generate(cls.__call__)[0])
         # Some convenience attributes
         cls.description = cls.schema['function']['description']
         cls.required_parameters = set(cls.schema['function']['parameters']['required'])
@@ -0,0 +1,87 @@
+import os
+import json
+import inspect
+import hashlib
+import tempfile
+from pathlib import Path
+from importlib import metadata
+
+DEFAULT_CACHE_PATH = "~/.cache/nyuctf_baseline/tool_schemas.json"
+# Bump when the format of the generated schemas changes, to regenerate them
+CACHE_VERSION = 1
+
+def generator_version():
+    """Installed version of ToolDefGenerator, read without importing it"""
+    try:
+        return metadata.version("ToolDefGenerator")
+    except metadata.PackageNotFoundError:
+        return None
+
+def schema_key(cls):
+    """
+    Hash of everything the generated schema of a tool depends on: the ToolDefGenerator version,
+    the tool name and the qualified name, docstring, parameters, annotations and defaults of its __call__.
+    """
+    fn = cls.__call__
+    code = fn.__code__
+    params = code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+    data = repr((CACHE_VERSION, generator_version(), cls.NAME, fn.__module__, fn.__qualname__, fn.__doc__,
+                 params, fn.__annotations__, fn.__defaults__, fn.__kwdefaults__))
+    return hashlib.sha256(data.encode()).hexdigest()
+
+def schema_matches(cls, schema):
+    """Whether a cached schema has the fields used by the tools and every parameter of __call__"""
+    try:
+        parameters = schema["function"]["parameters"]
+        properties = parameters["properties"]
+        if not isinstance(schema["function"]["description"], str) or not isinstance(parameters["required"], list):
+            return False
+    except (KeyError, TypeError):
+        return False
+    return all(p in properties for p in inspect.signature(cls.__call__).parameters if p != "self")
+
+class SchemaCache:
+    """
+    Disk cache of the tool schemas generated by ToolDefGenerator, shared by all processes.
+
+    Generating the schemas is the slow part of importing the tools, and every runner process
+    of a campaign does it for the same tools. Entries are keyed by `schema_key`, so a changed
+    tool misses and is regenerated, as is an entry that does not match the tool. Writes are atomic, and failures to write (such as a read-only
+    home directory) only cost the regeneration. Importing the tools once, such as with
+    `python3 -c "import nyuctf_baseline.tools"`, prebuilds the cache.
+    """
+    def __init__(self, path=None):
+        self.path = Path(path or os.environ.get("NYUCTF_TOOL_SCHEMA_CACHE", DEFAULT_CACHE_PATH)).expanduser()
+        self.entries = None
+
+    def load(self):
+        try:
+            with self.path.open("r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def get(self, key):
+        if self.entries is None:
+            self.entries = self.load()
+        return self.entries.get(key)
+
+    def put(self, key, schema):
+        """Store a schema, returns it as read back from the cache so hits and misses give the same schema"""
+        schema = json.loads(json.dumps(schema))
+        if self.entries is None:
+            self.entries = self.load()
+        self.entries[key] = schema
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Merge with the entries written by other processes since the load
+            entries = {**self.load(), **self.entries}
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+        return schema
+
+schema_cache = SchemaCache()
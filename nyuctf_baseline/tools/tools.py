@@ -1,16 +1,58 @@
 import subprocess
+import selectors
 import json
+import os
 import re
+import time
+import uuid
 import tempfile
 from pathlib import Path
 from typing_extensions import Annotated
 
+from nyuctf_multiagent.command_output import EXEC_MARKER, KILL_SCRIPT, OutputWindow
 from .modules import Tool, CTFCategories
 from ..ctflogging import status
 
 SCRIPT_DIR = Path(__file__).parent.parent.parent.resolve()
 GHIDRA = SCRIPT_DIR / "ghidra_11.0.1_PUBLIC/support/analyzeHeadless"
 
+def ghidra_output_dir(challenge):
+    return SCRIPT_DIR / f"decomp/{challenge.category}/{challenge.challenge_dir.name}"
+
+def load_ghidra_analysis(challenge, binary):
+    """
+    Combined decompilation and disassembly of the binary from a single Ghidra analysis pass.
+    The output is stored in "decomp" so the Decompile and Disassemble tools share it.
+    Returns None if the analysis is not available.
+    """
+    output = ghidra_output_dir(challenge) / f"{binary}.analysis.json"
+    if not output.exists():
+        status.debug_message(f"Running Ghidra to analyze {binary}...")
+        binary_paths = challenge.challenge_dir.glob(f'**/{binary}')
+        real_binary = next(binary_paths, None)
+        if not real_binary or not real_binary.exists():
+            return None
+        status.debug_message(f"Real binary path: {real_binary}")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            tmpdir = Path(tmpdir)
+            subprocess.run(
+                [GHIDRA, tmpdir, "DummyProj", "-scriptpath", SCRIPT_DIR / 'nyuctf_baseline/ghidra_scripts',
+                 "-import", real_binary, "-postscript", "AnalyzeToJson.java", output],
+                check=False, capture_output=True,
+            )
+        if not output.exists():
+            return None
+    return json.loads(output.read_text())
+
+def project_analysis(analysis, kind):
+    """View of the combined analysis with only one kind ("decompilation" or "disassembly") of each function"""
+    functions = {name: f[kind] for name, f in analysis["functions"].items() if kind in f}
+    return {
+        "functions": functions,
+        "addresses": {addr: name for addr, name in analysis["addresses"].items() if name in functions},
+    }
+
 class CommandExec(Tool):
     NAME = "run_command"
     def __init__(self, environment: "CTFEnvironment"):
@@ -27,28 +69,48 @@ class CommandExec(Tool):
         """Run a command in the docker container and return
         {"stdout": stdout, "stderr": stderr, "returncode": returncode, "timed_out": timed_out}
         """
+        marker = f"{EXEC_MARKER}={uuid.uuid4().hex}"
         p = subprocess.Popen(
-            ['docker', 'exec', self.environment.container, 'bash', '-c', command],
+            ['docker', 'exec', '-e', marker, self.environment.container, 'bash', '-c', command],
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
-        try:
-            stdout, stderr = p.communicate(timeout=timeout)
-            out = self._clean(stdout)
-            err = self._clean(stderr)
-            return {"stdout": out, "stderr": err, "returncode": p.returncode, "timed_out": False}
-        except subprocess.TimeoutExpired as e:
+        # Read as the output arrives, so only the head and tail of a huge output are held in memory
+        max_output = self.environment.max_output_bytes
+        kill_output = self.environment.kill_output_bytes
+        windows = {p.stdout: OutputWindow(max_output), p.stderr: OutputWindow(max_output)}
+        deadline = time.time() + timeout
+        timed_out = killed = False
+        with selectors.DefaultSelector() as selector:
+            for pipe in windows:
+                selector.register(pipe, selectors.EVENT_READ)
+            while selector.get_map() and not (timed_out or killed):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    timed_out = True
+                    break
+                for key, _ in selector.select(remaining):
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        selector.unregister(key.fileobj)
+                        continue
+                    windows[key.fileobj].write(data)
+                total = sum(w.size for w in windows.values())
+                killed = kill_output is not None and total > kill_output
+        if timed_out or killed:
+            subprocess.run(['docker', 'exec', self.environment.container, 'sh', '-c', KILL_SCRIPT, marker],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             p.kill()
-            stdout, stderr = p.communicate(timeout=timeout)     
-            out = self._clean(stdout)
-            err = self._clean(stderr) 
-            # out = self._clean(e.stdout)
-            # err = self._clean(e.stderr)
-            return {"stdout": out, "stderr": err, "returncode": None, "timed_out": True}
-        except subprocess.CalledProcessError as e:
-            out = self._clean(e.stdout)
-            err = self._clean(e.stderr)
-            return {"stdout": out, "stderr": err, "returncode": e.returncode, "timed_out": False}
+        p.wait()
+        p.stdout.close()
+        p.stderr.close()
+
+        out = self._clean(windows[p.stdout].getvalue())
+        err = self._clean(windows[p.stderr].getvalue())
+        if killed:
+            err += f"\n[killed after {total} bytes of output]"
+        return {"stdout": out, "stderr": err, "returncode": None if timed_out or killed else p.returncode,
+                "timed_out": timed_out}
 
     def __call__(self, command: Annotated[str, "the command to run"],
                        timeout: Annotated[float, "the maximum number of seconds to run the command"] = 10.0):
@@ -180,36 +242,21 @@ class Decompile(Tool):
         # Look for the decompilation output in "decomp"
         basename = Path(binary).name
         if basename not in self._decomp_cache:
-            decomp_output = SCRIPT_DIR / f"decomp/{self.challenge.category}/{self.challenge.challenge_dir.name}/{basename}.decomp.json"
+            decomp_output = ghidra_output_dir(self.challenge) / f"{basename}.decomp.json"
             if decomp_output.exists():
+                # Pre-generated output of the decompile-only script
                 self._decomp_cache[basename] = json.loads(decomp_output.read_text())
             else:
-                if not self.run_ghidra(basename, decomp_output):
+                analysis = load_ghidra_analysis(self.challenge, basename)
+                if analysis is None:
                     return {"error": f"Decompilation for {binary} not available"}
-                self._decomp_cache[basename] = json.loads(decomp_output.read_text())
+                self._decomp_cache[basename] = project_analysis(analysis, "decompilation")
 
         if found := self.find_function(self._decomp_cache[basename], function):
             return {"decompilation": found}
         else:
             return {"error": f"Function {function} not found in {binary}"}
 
-    def run_ghidra(self, binary, output):
-        status.debug_message(f"Running Ghidra to decompile {binary}...")
-        binary_paths = self.challenge.challenge_dir.glob(f'**/{binary}')
-        real_binary = next(binary_paths, None)
-        if not real_binary or not real_binary.exists():
-            return False
-        status.debug_message(f"Real binary path: {real_binary}")
-        output.parent.mkdir(parents=True, exist_ok=True)
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmpdir = Path(tmpdir)
-            subprocess.run(
-                [GHIDRA, tmpdir, "DummyProj", "-scriptpath", SCRIPT_DIR / 'nyuctf_baseline/ghidra_scripts',
-                 "-import", real_binary, "-postscript", "DecompileToJson.java", output],
-                check=False, capture_output=True,
-            )
-            return output.exists()
-
 class Disassemble(Tool):
     NAME = "disassemble_function"
     CATEGORIES = {CTFCategories.rev, CTFCategories.pwn, CTFCategories.crypto}
@@ -249,34 +296,18 @@ class Disassemble(Tool):
     def disassemble(self, binary, function):
         # Look for the disassembly output in "decomp"
         basename = Path(binary).name
-        disasm_output = SCRIPT_DIR / f"decomp/{self.challenge.category}/{self.challenge.challenge_dir.name}/{basename}.disas.json"
-
         if basename not in self._disasm_cache:
+            disasm_output = ghidra_output_dir(self.challenge) / f"{basename}.disas.json"
             if disasm_output.exists():
+                # Pre-generated output of the disassemble-only script
                 self._disasm_cache[basename] = json.loads(disasm_output.read_text())
             else:
-                if not self.run_ghidra(basename, disasm_output):
+                analysis = load_ghidra_analysis(self.challenge, basename)
+                if analysis is None:
                     return {"error": f"Disassembly for {binary} not available"}
-                self._disasm_cache[basename] = json.loads(disasm_output.read_text())
+                self._disasm_cache[basename] = project_analysis(analysis, "disassembly")
 
         if found := self.find_function(self._disasm_cache[basename], function):
             return {"disassembly": found}
         else:
             return {"error": f"Function {function} not found in {binary}"}
-
-    def run_ghidra(self, binary, output):
-        status.debug_message(f"Running Ghidra to disassemble {binary}...")
-        binary_paths = self.challenge.challenge_dir.glob(f'**/{binary}')
-        real_binary = next(binary_paths, None)
-        if not real_binary or not real_binary.exists():
-            return False
-        status.debug_message(f"Real binary path: {real_binary}")
-        output.parent.mkdir(parents=True, exist_ok=True)
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmpdir = Path(tmpdir)
-            subprocess.run(
-                [GHIDRA, tmpdir, "DummyProj", "-scriptpath", SCRIPT_DIR / 'nyuctf_baseline/ghidra_scripts',
-                 "-import", real_binary, "-postscript", "DisassembleToJson.java", output],
-                check=False, capture_output=True,
-            )
-            return output.exists()
@@ -1,15 +1,24 @@
 import time
 import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from nyuctf.challenge import CTFChallenge
 
 from .logging import logger
 from .conversation import Conversation, MessageRole, Message
 from .tools import DelegateTool, FinishTaskTool, ToolResult, GenAutoPromptTool
+from .transcript import TranscriptWriter, transcript_path, compact
+from .backends.rate_limit import rate_limit_stats
+from .metrics import metrics
+from .flag_scanner import FlagScanner
 from .utils import AgentError
 
 now = lambda: time.time()
 
+# Kinds of flag matches that solve the challenge, see FlagScanner.search
+SOLVED_KINDS = {"flag", "body"}
+
 class BaseAgent:
     """Base class for an Agent"""
     def __init__(self, environment, challenge, prompter, backend):
@@ -18,9 +27,12 @@ class BaseAgent:
         self.prompter = prompter
         self.backend = backend
 
-        self.conversation = Conversation()
+        self.flag_scanner = FlagScanner(challenge.flag)
+        self.conversation = Conversation(max_input_tokens=backend.context_budget())
         self.max_rounds = 30
         self.current_cost = 0.0
+        # Agent attributes recorded in the spans of its rounds
+        self.trace_context = {"role": backend.role.value}
 
     def add_start_prompts(self):
         """
@@ -31,13 +43,17 @@ class BaseAgent:
         self.add_user_message(self.prompter.get("initial"))
 
     def check_flag_in_response(self, response):
-        if response is None:
+        """
+        Mark the challenge solved if the flag or its body is in the text, arguments or tool result.
+        Encodings of the flag are only logged, handouts often contain the flag reversed or encoded.
+        """
+        if response is None or self.environment.solved:
             return
-        stripped_flag = self.challenge.flag
-        if "{" in stripped_flag:
-            stripped_flag = stripped_flag[stripped_flag.index("{")+1:-1]
-        if stripped_flag in response:
-            self.environment.solved = True
+        kind = self.flag_scanner.search_values(response)
+        if kind is not None:
+            logger.debug_message(f"Flag found in response ({kind})")
+            if kind in SOLVED_KINDS:
+                self.environment.solved = True
 
     # Helper functions to add and print messages to the conversation
     def add_system_message(self, message):
@@ -52,15 +68,51 @@ class BaseAgent:
         # Only print thought, action is printed after tool_call is parsed
         logger.assistant_thought(message)
         self.check_flag_in_response(message)
-        if tool_call is not None:
-            self.check_flag_in_response(tool_call.arguments)
+        for tc in self.conversation.all_messages[-1].tool_calls:
+            self.check_flag_in_response(tc.arguments)
 
     def add_observation_message(self, tool_result):
         self.conversation.append_observation(tool_data=tool_result)
         # Get truncated output from the conversation
-        self.check_flag_in_response(str(self.conversation.all_messages[-1].tool_data.result))
+        self.check_flag_in_response(self.conversation.all_messages[-1].tool_data.result)
+
+    def traced(self):
+        """Trace context of the current round, inherited by the spans of the backend and tool calls"""
+        return self.environment.tracer.context(**self.trace_context, round=self.conversation.round)
+
+    def send_messages(self):
+        """Send the conversation to the backend, timed in a span with the token counts and cost"""
+        with self.environment.tracer.span("send", "backend", model=self.backend.model) as span:
+            response = self.backend.send(self.conversation.messages)
+            span.set_response(response)
+        return response
+
+    async def asend_messages(self):
+        """Async version of send_messages"""
+        with self.environment.tracer.span("send", "backend", model=self.backend.model) as span:
+            response = await self.backend.asend(self.conversation.messages)
+            span.set_response(response)
+        return response
 
     def run_one_round(self):
+        with self.traced():
+            self.handle_response(self.send_messages())
+
+    async def arun_one_round(self):
+        with self.traced():
+            response = await self.asend_messages()
+            # Tools block on docker commands, so run them off the event loop
+            call = asyncio.ensure_future(asyncio.to_thread(self.handle_response, response))
+            try:
+                await asyncio.shield(call)
+            except asyncio.CancelledError:
+                # The thread can not be cancelled, stop its command and let it finish before the teardown
+                self.environment.exec_session.kill_running()
+                await asyncio.wait([call])
+                raise
+
+    def handle_response(self, response):
+        """Add the backend response to the conversation and run the tool call"""
         raise NotImplementedError
 
     def print_parsed_call(self, parsed_call):
@@ -82,56 +134,96 @@ class SingleAgent(BaseAgent):
         self.max_cost = max_cost
         self.conversation.len_observations = len_observations
         self.logfile = logfile
+        self.transcript = None
+        # SpeculativeAttempts this is one attempt of, if any
+        self.attempts = None
 
     def __enter__(self):
-        self.challenge.start_challenge_container()
+        # Speculative attempts share the challenge container and progress bar, started by SpeculativeAttempts
+        if self.attempts is None:
+            self.challenge.start_challenge_container()
         self.environment.setup()
         self.start_time = now()
-        logger.start_progress()
+        self.start_transcript()
+        if self.attempts is None:
+            metrics.challenge_started()
+            logger.start_progress()
         return self
 
     def __exit__(self, ex_type, ex_val, tb):
         self.environment.teardown(ex_type, ex_val, tb)
-        self.challenge.stop_challenge_container()
+        if self.attempts is None:
+            self.challenge.stop_challenge_container()
         self.end_time = now()
 
         error = f"{ex_type.__name__}: {str(ex_val)}" if ex_type is not None else None
+        if ex_type is asyncio.CancelledError and self.attempts is not None and self.attempts.winner is not None:
+            # Cancelled because another attempt solved the challenge
+            error = None
         self.dump_log(error=error)
-        logger.stop_progress()
+        if self.attempts is None:
+            metrics.challenge_finished("error" if error is not None else "solved" if self.environment.solved else "unsolved")
+            logger.stop_progress()
+
+    async def __aenter__(self):
+        # Container start and setup are blocking docker calls
+        return await asyncio.to_thread(self.__enter__)
+
+    async def __aexit__(self, ex_type, ex_val, tb):
+        await asyncio.to_thread(self.__exit__, ex_type, ex_val, tb)
 
     def get_exit_reason(self):
         if self.environment.solved:
             return "solved"
         elif self.environment.giveup:
             return "giveup"
-        elif self.total_cost() > self.max_cost:
+        elif self.attempts is not None and self.attempts.winner is not None:
+            return "cancelled"
+        elif not self.within_budget():
             return "cost"
         elif self.conversation.round > self.max_rounds:
             return "max_rounds"
         else:
             return "unknown"
 
+    def start_transcript(self):
+        """Stream the transcript to a JSONL log next to the logfile while running"""
+        if self.logfile is None:
+            return
+        self.transcript = TranscriptWriter(transcript_path(self.logfile), cost_fn=self.total_cost,
+                                           tracer=self.environment.tracer)
+        self.environment.tracer.start(self.transcript)
+        self.transcript.event("start", info={
+            "start_time": self.start_time,
+            "autoprompter_model": None if not self.autoprompter.enabled else self.autoprompter.backend.model,
+            "executor_model": self.backend.model,
+        })
+        if self.autoprompter.enabled:
+            self.transcript.watch(self.autoprompter.conversation, "autoprompter")
+        self.transcript.watch(self.conversation, "executor")
+
     def dump_log(self, error=None):
         if self.logfile is None:
             return
 
         exit_reason = "error" if error is not None else self.get_exit_reason()
         cost = self.total_cost()
+        self.transcript.event("end", summary={
+            "end_time": self.end_time,
+            "time_taken": (self.end_time - self.start_time),
+            "total_cost": cost,
+            "success": self.environment.solved,
+            "exit_reason": exit_reason,
+            "error": error,
+            "rate_limit_stats": rate_limit_stats(),
+            "debug_log": logger.debug_log,
+        })
+        # Spans of background work still running after this are dropped
+        self.environment.tracer.stop()
+        self.transcript.close()
         with self.logfile.open("w") as lf:
-            json.dump({
-                "start_time": self.start_time,
-                "end_time": self.end_time,
-                "time_taken": (self.end_time - self.start_time),
-                "autoprompter_model": None if not self.autoprompter.enabled else self.autoprompter.backend.model,
-                "executor_model": self.backend.model,
-                "total_cost": cost,
-                "success": self.environment.solved,
-                "exit_reason": exit_reason,
-                "error": error,
-                "autoprompter": [] if not self.autoprompter.enabled else self.autoprompter.conversation.dump(),
-                "executor": self.conversation.dump(),
-                "debug_log": logger.debug_log,
-            }, lf, indent=2)
+            json.dump(compact(self.transcript.path), lf, indent=2)
+        self.transcript.path.unlink()
         if exit_reason == "solved":
             logger.print("[green bold]Challenge Solved![/green bold]", force=True, markup=True)
         else:
@@ -145,8 +237,13 @@ class SingleAgent(BaseAgent):
         logger.progress_message(f"${cost:.3f} / ${self.max_cost:.3f}")
         return cost
 
-    def run_one_round(self):
-        response = self.backend.send(self.conversation.messages) 
+    def within_budget(self):
+        """Cost is within max_cost, which is shared by all speculative attempts"""
+        if self.attempts is not None:
+            return self.attempts.within_budget()
+        return self.total_cost() <= self.max_cost
+
+    def handle_response(self, response):
         if response.error is not None:
             raise AgentError(response.error)
 
@@ -178,14 +275,16 @@ class SingleAgent(BaseAgent):
         # Assumes autoprompter is not None
         while not self.environment.solved and not self.autoprompter.finished \
                 and self.autoprompter.conversation.round <= self.autoprompter.max_rounds \
-                and self.total_cost() <= self.max_cost:
+                and self.within_budget():
             self.autoprompter.conversation.next_round()
             self.autoprompter.run_one_round()
 
-        if not self.environment.solved and self.total_cost() <= self.max_cost \
+        if not self.environment.solved and self.within_budget() \
                 and self.autoprompter.autoprompt is None:
             # Prompt last time for the autoprompt
             self.autoprompter.run_for_autoprompt()
+        if self.transcript is not None:
+            self.transcript.flush(self.autoprompter.conversation)
 
     def run(self):
         """
@@ -208,10 +307,47 @@ class SingleAgent(BaseAgent):
 
         while not self.environment.giveup and not self.environment.solved \
                 and self.conversation.round <= self.max_rounds \
-                and self.total_cost() <= self.max_cost:
+                and self.within_budget():
             self.conversation.next_round()
             self.run_one_round()
 
+    async def arun_autoprompter(self):
+        """Async version of run_autoprompter"""
+        while not self.environment.solved and not self.autoprompter.finished \
+                and self.autoprompter.conversation.round <= self.autoprompter.max_rounds \
+                and self.within_budget():
+            self.autoprompter.conversation.next_round()
+            await self.autoprompter.arun_one_round()
+
+        if not self.environment.solved and self.within_budget() \
+                and self.autoprompter.autoprompt is None:
+            await self.autoprompter.arun_for_autoprompt()
+        if self.transcript is not None:
+            self.transcript.flush(self.autoprompter.conversation)
+
+    async def arun(self):
+        """
+        Async version of run, backend requests are awaited so many challenges
+        can run concurrently on one event loop.
+        """
+        initial_prompt = self.prompter.get("initial")
+        if self.autoprompter.enabled:
+            await self.arun_autoprompter()
+            if self.autoprompter.autoprompt is not None:
+                initial_prompt = self.autoprompter.autoprompt
+            elif not self.environment.solved:
+                logger.print("WARNING! Autoprompter failed to generate a prompt, using the hardcoded one", force=True, style="dark_orange bold")
+
+        logger.print("============= EXECUTOR ===============", style="bold")
+        self.add_system_message(self.prompter.get("system"))
+        self.add_user_message(initial_prompt)
+
+        while not self.environment.giveup and not self.environment.solved \
+                and self.conversation.round <= self.max_rounds \
+                and self.within_budget():
+            self.conversation.next_round()
+            await self.arun_one_round()
+
 
 class AutoPromptAgent(BaseAgent):
     """The AutoPrompt will gnerate a prompt and pass it to the Planner-Executor system"""
@@ -226,8 +362,7 @@ class AutoPromptAgent(BaseAgent):
     def enable_autoprompt(self):
         self.enabled = True
 
-    def run_one_round(self):
-        response = self.backend.send(self.conversation.messages)
+    def handle_response(self, response):
         if response.error is not None:
             raise AgentError(response.error)
             
@@ -263,7 +398,15 @@ class AutoPromptAgent(BaseAgent):
         Prompt the autoprompted last time if it did not already generate a prompt
         """
         self.add_user_message(self.prompter.get("finish_autoprompt"))
-        response = self.backend.send(self.conversation.messages)
+        with self.traced():
+            self.handle_autoprompt_response(self.send_messages())
+
+    async def arun_for_autoprompt(self):
+        self.add_user_message(self.prompter.get("finish_autoprompt"))
+        with self.traced():
+            self.handle_autoprompt_response(await self.asend_messages())
+
+    def handle_autoprompt_response(self, response):
         self.current_cost += response.cost
 
         if response.error is not None:
@@ -289,27 +432,34 @@ class AutoPromptAgent(BaseAgent):
 
 class PlannerAgent(BaseAgent):
     """The Planner Agent of a multi-agent Planner-Executor system"""
-    def __init__(self, environment, challenge, prompter, backend, max_rounds=30):
+    def __init__(self, environment, challenge, prompter, backend, max_rounds=30, max_parallel_tasks=1):
         super().__init__(environment, challenge, prompter, backend)
         self.max_rounds = max_rounds
-        self.delegated_task = None
+        self.max_parallel_tasks = max_parallel_tasks
+        self.delegated_tasks = []
 
-    def run_one_round(self):
-        response = self.backend.send(self.conversation.messages)
+    def handle_response(self, response):
         if response.error is not None:
             raise AgentError(response.error)
             
         self.current_cost += response.cost
-        self.add_assistant_message(response.content, response.tool_call)
+        # Only take parallel tool calls if several tasks can be delegated at once
+        tool_calls = response.tool_calls if self.max_parallel_tasks > 1 else response.tool_calls[:1]
+        self.add_assistant_message(response.content,
+                                   tool_calls[0] if len(tool_calls) == 1 else (tool_calls or None))
 
-        if not response.tool_call:
+        if len(tool_calls) == 0:
             self.add_user_message(self.prompter.get("continue"))
             return
 
-        parsed, parsed_call = self.backend.parse_tool_arguments(response.tool_call)
+        for tool_call in tool_calls:
+            self.handle_tool_call(tool_call)
+
+    def handle_tool_call(self, tool_call):
+        parsed, parsed_call = self.backend.parse_tool_arguments(tool_call)
         if not parsed:
             # Print unparsed tool_call
-            logger.assistant_action(response.tool_call.format())
+            logger.assistant_action(tool_call.format())
             # Contains the ToolResult with error
             self.print_result(parsed_call)
             self.add_observation_message(parsed_call)
@@ -319,8 +469,14 @@ class PlannerAgent(BaseAgent):
         self.print_parsed_call(parsed_call)
 
         if parsed_call.name == DelegateTool.NAME:
-            self.delegated_task = parsed_call
-            # MultiAgent system is responsible to add observation to the conversation.
+            if len(self.delegated_tasks) < self.max_parallel_tasks:
+                self.delegated_tasks.append(parsed_call)
+                # MultiAgent system is responsible to add observation to the conversation.
+            else:
+                tool_result = ToolResult.error_for_call(parsed_call,
+                                f"Too many tasks delegated at once, at most {self.max_parallel_tasks} allowed")
+                self.print_result(tool_result)
+                self.add_observation_message(tool_result)
         else:
             tool_result = self.environment.run_tool(parsed_call)
             self.print_result(tool_result)
@@ -336,14 +492,17 @@ class ExecutorAgent(BaseAgent):
         self.finish_summary = None
         self.error = None
 
-    def new(self):
-        """Create new executor with same settings but new conversation"""
+    def new(self, fork_backend=False):
+        """
+        Create new executor with same settings but new conversation.
+        fork_backend: use a copy of the backend, for executors running concurrently.
+        """
         return ExecutorAgent(self.environment, self.challenge, self.prompter,
-                             self.backend, max_rounds=self.max_rounds,
+                             self.backend.fork() if fork_backend else self.backend,
+                             max_rounds=self.max_rounds,
                              len_observations=self.conversation.len_observations)
 
-    def run_one_round(self):
-        response = self.backend.send(self.conversation.messages)
+    def handle_response(self, response):
         if response.error is not None:
             self.finished = True
             self.error = response.error
@@ -382,7 +541,15 @@ class ExecutorAgent(BaseAgent):
         Prompt the executor last time to ask for task summary
         """
         self.add_user_message(self.prompter.get("finish_summary"))
-        response = self.backend.send(self.conversation.messages)
+        with self.traced():
+            self.handle_finish_summary_response(self.send_messages())
+
+    async def arun_for_finish_summary(self):
+        self.add_user_message(self.prompter.get("finish_summary"))
+        with self.traced():
+            self.handle_finish_summary_response(await self.asend_messages())
+
+    def handle_finish_summary_response(self, response):
         self.current_cost += response.cost
 
         if response.error is not None:
@@ -419,59 +586,99 @@ class PlannerExecutorSystem:
         self.logfile = logfile
 
         self.all_executors = []
+        self.transcript = None
+        # SpeculativeAttempts this is one attempt of, if any
+        self.attempts = None
 
     def __enter__(self):
-        self.challenge.start_challenge_container()
+        # Speculative attempts share the challenge container and progress bar, started by SpeculativeAttempts
+        if self.attempts is None:
+            self.challenge.start_challenge_container()
         self.environment.setup()
         self.start_time = now()
-        logger.start_progress()
+        self.start_transcript()
+        if self.attempts is None:
+            metrics.challenge_started()
+            logger.start_progress()
         return self
 
     def __exit__(self, ex_type, ex_val, tb):
         self.environment.teardown(ex_type, ex_val, tb)
-        self.challenge.stop_challenge_container()
+        if self.attempts is None:
+            self.challenge.stop_challenge_container()
         self.end_time = now()
 
         error = f"{ex_type.__name__}: {str(ex_val)}" if ex_type is not None else None
+        if ex_type is asyncio.CancelledError and self.attempts is not None and self.attempts.winner is not None:
+            # Cancelled because another attempt solved the challenge
+            error = None
         self.dump_log(error=error)
-        logger.stop_progress()
+        if self.attempts is None:
+            metrics.challenge_finished("error" if error is not None else "solved" if self.environment.solved else "unsolved")
+            logger.stop_progress()
+
+    async def __aenter__(self):
+        # Container start and setup are blocking docker calls
+        return await asyncio.to_thread(self.__enter__)
+
+    async def __aexit__(self, ex_type, ex_val, tb):
+        await asyncio.to_thread(self.__exit__, ex_type, ex_val, tb)
 
     def get_exit_reason(self):
         if self.environment.solved:
             return "solved"
         elif self.environment.giveup:
             return "giveup"
-        elif self.total_cost() > self.max_cost:
+        elif self.attempts is not None and self.attempts.winner is not None:
+            return "cancelled"
+        elif not self.within_budget():
             return "cost"
         elif self.planner.conversation.round > self.planner.max_rounds:
             return "planner_rounds"
         else:
             return "unknown"
 
+    def start_transcript(self):
+        """Stream the transcript to a JSONL log next to the logfile while running"""
+        if self.logfile is None:
+            return
+        self.transcript = TranscriptWriter(transcript_path(self.logfile), cost_fn=self.total_cost,
+                                           tracer=self.environment.tracer)
+        self.environment.tracer.start(self.transcript)
+        self.transcript.event("start", info={
+            "start_time": self.start_time,
+            "autoprompter_model": None if not self.autoprompter.enabled else self.autoprompter.backend.model,
+            "planner_model": self.planner.backend.model,
+            "executor_model": self.executor.backend.model,
+        })
+        if self.autoprompter.enabled:
+            self.transcript.watch(self.autoprompter.conversation, "autoprompter")
+        self.transcript.watch(self.planner.conversation, "planner")
+
     def dump_log(self, error=None):
         if self.logfile is None:
             return
 
         exit_reason = "error" if error is not None else self.get_exit_reason()
         cost = self.total_cost()
+        self.transcript.event("end", summary={
+            "end_time": self.end_time,
+            "time_taken": (self.end_time - self.start_time),
+            "total_cost": cost,
+            "success": self.environment.solved,
+            "exit_reason": exit_reason,
+            "error": error,
+            "executor_errors": [e.error for e in self.all_executors],
+            "rate_limit_stats": rate_limit_stats(),
+            "debug_log": logger.debug_log,
+        })
+        # Spans of background work still running after this are dropped
+        self.environment.tracer.stop()
+        self.transcript.close()
+        # The JSON log keeps the same format, built from the streamed transcript
         with self.logfile.open("w") as lf:
-            json.dump({
-                "start_time": self.start_time,
-                "end_time": self.end_time,
-                "time_taken": (self.end_time - self.start_time),
-                "autoprompter_model": None if not self.autoprompter.enabled else self.autoprompter.backend.model,
-                "planner_model": self.planner.backend.model,
-                "executor_model": self.executor.backend.model,
-                "total_cost": cost,
-                "success": self.environment.solved,
-                "exit_reason": exit_reason,
-                "error": error,
-                "autoprompter": [] if not self.autoprompter.enabled else self.autoprompter.conversation.dump(),
-                "planner": self.planner.conversation.dump(),
-                "executors": [e.conversation.dump() for e in self.all_executors],
-                "executor_errors": [e.error for e in self.all_executors],
-                "debug_log": logger.debug_log,
-            }, lf, indent=2)
+            json.dump(compact(self.transcript.path), lf, indent=2)
+        self.transcript.path.unlink()
         if exit_reason == "solved":
             logger.print("[green bold]Challenge Solved![/green bold]", force=True, markup=True)
         else:
@@ -485,19 +692,27 @@ class PlannerExecutorSystem:
         logger.progress_message(f"${cost:.3f} / ${self.max_cost:.3f}")
         return cost
 
+    def within_budget(self):
+        """Cost is within max_cost, which is shared by all speculative attempts"""
+        if self.attempts is not None:
+            return self.attempts.within_budget()
+        return self.total_cost() <= self.max_cost
+
     def run_autoprompter(self):
         """Run the autoprompter to set the autoprompt for planner"""
         # Assumes autoprompter is not None
         while not self.environment.solved and not self.autoprompter.finished \
                 and self.autoprompter.conversation.round <= self.autoprompter.max_rounds \
-                and self.total_cost() <= self.max_cost:
+                and self.within_budget():
             self.autoprompter.conversation.next_round()
             self.autoprompter.run_one_round()
 
-        if not self.environment.solved and self.total_cost() <= self.max_cost \
+        if not self.environment.solved and self.within_budget() \
                 and self.autoprompter.autoprompt is None:
             # Prompt last time for the autoprompt
             self.autoprompter.run_for_autoprompt()
+        if self.transcript is not None:
+            self.transcript.flush(self.autoprompter.conversation)
 
     def run(self):
         # Use the hardcoded prompt if no autoprompter
@@ -518,39 +733,75 @@ class PlannerExecutorSystem:
 
         while not self.environment.solved and not self.environment.giveup and \
                 self.planner.conversation.round <= self.planner.max_rounds and \
-                self.total_cost() <= self.max_cost:
+                self.within_budget():
             self.planner.conversation.next_round()
             self.planner.run_one_round()
 
-            if self.planner.delegated_task is not None:
-                result = self.run_executor(self.planner.delegated_task)
-                # No need to print this
-                tool_result = ToolResult(name=DelegateTool.NAME, id=self.planner.delegated_task.id, result=result)
-                self.planner.add_observation_message(tool_result)
-                self.planner.delegated_task = None
+            if len(self.planner.delegated_tasks) > 0:
+                results = self.run_executors(self.planner.delegated_tasks)
+                for task, result in zip(self.planner.delegated_tasks, results):
+                    # No need to print this
+                    tool_result = ToolResult(name=DelegateTool.NAME, id=task.id, result=result)
+                    self.planner.add_observation_message(tool_result)
+                self.planner.delegated_tasks = []
             
-    def run_executor(self, task):
+    def run_executors(self, tasks):
+        """Run an executor for each delegated task, concurrently if there are several"""
+        if len(tasks) == 1:
+            return [self.run_executor(tasks[0])]
+        # Executors share the environment container
+        executors = [self.start_executor(task, fork_backend=True) for task in tasks]
+        with ThreadPoolExecutor(max_workers=len(executors)) as pool:
+            return list(pool.map(self.run_started_executor, executors))
+
+    def start_executor(self, task, fork_backend=False):
+        """Create a new executor for the task, with empty conversation"""
         logger.print("============= EXECUTOR ==============", style="bold")
-        executor = self.executor.new() # Create new executor with empty conversation
+        executor = self.executor.new(fork_backend=fork_backend)
         self.all_executors.append(executor)
+        self.executor_started(executor, task)
 
         # Add executor prompts
         task_description = task.parsed_arguments["task"]
         executor.add_system_message(executor.prompter.get("system"))
         executor.add_user_message(executor.prompter.get("initial", task_description=task_description))
+        return executor
+
+    def run_executor(self, task):
+        return self.run_started_executor(self.start_executor(task))
 
+    def run_started_executor(self, executor):
         while not self.environment.solved and not executor.finished \
                 and executor.conversation.round <= executor.max_rounds \
-                and self.total_cost() <= self.max_cost:
+                and self.within_budget():
             executor.conversation.next_round()
             executor.run_one_round()
 
-        if not self.environment.solved and self.total_cost() <= self.max_cost \
+        if not self.environment.solved and self.within_budget() \
                 and executor.finish_summary is None:
             # Prompt last time for finish_summary
             executor.run_for_finish_summary()
 
         logger.print("============= EXECUTOR DONE =========", style="bold")
+        self.executor_finished(executor)
+        return self.executor_result(executor)
+
+    def executor_started(self, executor, task):
+        index = self.all_executors.index(executor)
+        executor.trace_context["executor"] = index
+        if self.transcript is not None:
+            # The delegate call id matches the executor with its planner message
+            self.transcript.event("executor_start", executor=index, task_id=task.id)
+            self.transcript.watch(executor.conversation, "executor", executor=index)
+
+    def executor_finished(self, executor):
+        if self.transcript is not None:
+            self.transcript.flush(executor.conversation)
+            self.transcript.event("executor_end", executor=self.all_executors.index(executor),
+                                  error=executor.error, cost=executor.current_cost)
+
+    def executor_result(self, executor):
+        """Result of the finished executor to send to the planner"""
         if executor.finished and executor.finish_summary is not None:
             # Send the executor finish summary to the planner.
             return executor.finish_summary
@@ -561,3 +812,73 @@ class PlannerExecutorSystem:
             # Executor did not complete the task, send empty result
             return self.executor.prompter.get("finish_empty")
 
+    async def arun_autoprompter(self):
+        """Async version of run_autoprompter"""
+        while not self.environment.solved and not self.autoprompter.finished \
+                and self.autoprompter.conversation.round <= self.autoprompter.max_rounds \
+                and self.within_budget():
+            self.autoprompter.conversation.next_round()
+            await self.autoprompter.arun_one_round()
+
+        if not self.environment.solved and self.within_budget() \
+                and self.autoprompter.autoprompt is None:
+            await self.autoprompter.arun_for_autoprompt()
+        if self.transcript is not None:
+            self.transcript.flush(self.autoprompter.conversation)
+
+    async def arun(self):
+        """
+        Async version of run, backend requests are awaited so many challenges
+        can run concurrently on one event loop.
+        """
+        planner_initial = self.planner.prompter.get("initial")
+
+        if self.autoprompter.enabled:
+            await self.arun_autoprompter()
+            if self.autoprompter.autoprompt is not None:
+                planner_initial = self.autoprompter.autoprompt
+            elif not self.environment.solved:
+                logger.print("WARNING! Autoprompter failed to generate a prompt, using the hardcoded one", force=True, style="dark_orange bold")
+
+        logger.print("============= PLANNER ===============", style="bold")
+        self.planner.add_system_message(self.planner.prompter.get("system"))
+        self.planner.add_user_message(planner_initial)
+
+        while not self.environment.solved and not self.environment.giveup and \
+                self.planner.conversation.round <= self.planner.max_rounds and \
+                self.within_budget():
+            self.planner.conversation.next_round()
+            await self.planner.arun_one_round()
+
+            if len(self.planner.delegated_tasks) > 0:
+                results = await self.arun_executors(self.planner.delegated_tasks)
+                for task, result in zip(self.planner.delegated_tasks, results):
+                    tool_result = ToolResult(name=DelegateTool.NAME, id=task.id, result=result)
+                    self.planner.add_observation_message(tool_result)
+                self.planner.delegated_tasks = []
+
+    async def arun_executors(self, tasks):
+        """Async version of run_executors"""
+        if len(tasks) == 1:
+            return [await self.arun_executor(tasks[0])]
+        executors = [self.start_executor(task, fork_backend=True) for task in tasks]
+        return await asyncio.gather(*[self.arun_started_executor(e) for e in executors])
+
+    async def arun_executor(self, task):
+        """Async version of run_executor"""
+        return await self.arun_started_executor(self.start_executor(task))
+
+    async def arun_started_executor(self, executor):
+        while not self.environment.solved and not executor.finished \
+                and executor.conversation.round <= executor.max_rounds \
+                and self.within_budget():
+            executor.conversation.next_round()
+            await executor.arun_one_round()
+
+        if not self.environment.solved and self.within_budget() \
+                and executor.finish_summary is None:
+            await executor.arun_for_finish_summary()
+
+        logger.print("============= EXECUTOR DONE =========", style="bold")
+        self.executor_finished(executor)
+        return self.executor_result(executor)
@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from .logging import logger
+from .metrics import metrics
+
+now = lambda: time.time()
+
+def attempt_temperature(temperatures, index):
+    """Temperature of the attempt, cycling over the given temperatures. None keeps the config temperature."""
+    if not temperatures:
+        return None
+    return temperatures[index % len(temperatures)]
+
+def attempt_logfile(logfile, index):
+    """Log file of one attempt, next to the logfile of the challenge"""
+    logfile = Path(logfile)
+    return logfile.with_name(f"{logfile.stem}.attempt{index}{logfile.suffix}")
+
+class SpeculativeAttempts:
+    """
+    Runs K independent attempts (SingleAgent or PlannerExecutorSystem) at one challenge concurrently.
+
+    Each attempt has its own player container and is run with the async agent loops.
+    The first attempt to solve the challenge wins and the rest are cancelled and torn down.
+    The costs of all attempts count against one shared max_cost.
+    The challenge container is started once and shared by all attempts.
+    """
+    def __init__(self, challenge, systems, max_cost=1.0, logfile=None):
+        self.challenge = challenge
+        self.systems = systems
+        self.max_cost = max_cost
+        self.logfile = logfile
+
+        self.winner = None
+        self.errors = [None] * len(systems)
+        for system in systems:
+            system.attempts = self
+
+    def __enter__(self):
+        self.challenge.start_challenge_container()
+        metrics.challenge_started()
+        self.start_time = now()
+        logger.start_progress()
+        return self
+
+    def __exit__(self, ex_type, ex_val, tb):
+        self.challenge.stop_challenge_container()
+        self.end_time = now()
+
+        error = f"{ex_type.__name__}: {str(ex_val)}" if ex_type is not None else None
+        self.dump_log(error=error)
+        metrics.challenge_finished("error" if error is not None else "solved" if self.solved else "unsolved")
+        logger.stop_progress()
+
+    def total_cost(self):
+        return sum(system.total_cost() for system in self.systems)
+
+    def within_budget(self):
+        return self.total_cost() <= self.max_cost
+
+    @property
+    def solved(self):
+        return self.winner is not None
+
+    def get_exit_reason(self):
+        if self.solved:
+            return "solved"
+        elif not self.within_budget():
+            return "cost"
+        elif all(e is not None for e in self.errors):
+            return "error"
+        else:
+            return "unsolved"
+
+    async def run_attempt(self, system):
+        # Each attempt dumps its own debug messages with its log
+        logger.start_attempt_debug_log()
+        # Setup is shielded from cancellation, so the player container of a cancelled attempt is always torn down
+        setup = asyncio.ensure_future(system.__aenter__())
+        try:
+            await asyncio.shield(setup)
+        except BaseException as e:
+            await asyncio.wait([setup])
+            if setup.cancelled() or setup.exception() is not None:
+                # Setup failed, tear down the player container it got to start, there is no run to log
+                await asyncio.to_thread(system.environment.teardown, type(e), e, None)
+            else:
+                await system.__aexit__(type(e), e, None)
+            raise
+        try:
+            await system.arun()
+        except BaseException as e:
+            await system.__aexit__(type(e), e, e.__traceback__)
+            raise
+        await system.__aexit__(None, None, None)
+
+    async def arun(self):
+        tasks = [asyncio.create_task(self.run_attempt(system)) for system in self.systems]
+        pending = set(tasks)
+        try:
+            while len(pending) > 0 and self.winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = tasks.index(task)
+                    if task.exception() is not None:
+                        e = task.exception()
+                        self.errors[index] = f"{type(e).__name__}: {str(e)}"
+                        logger.print(f"Attempt {index} error: {self.errors[index]}", style="red bold", force=True)
+                    elif self.systems[index].environment.solved and self.winner is None:
+                        self.winner = index
+                        logger.print(f"Attempt {index} solved the challenge, cancelling the rest", style="bold", force=True)
+        finally:
+            # Cancelled attempts are torn down in their __aexit__
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def run(self):
+        asyncio.run(self.arun())
+
+    def dump_log(self, error=None):
+        if self.logfile is None:
+            return
+
+        exit_reason = "error" if error is not None else self.get_exit_reason()
+        cost = self.total_cost()
+        attempts = []
+        for system, attempt_error in zip(self.systems, self.errors):
+            attempts.append({
+                "logfile": str(system.logfile) if system.logfile is not None else None,
+                "success": system.environment.solved,
+                "exit_reason": "error" if attempt_error is not None else system.get_exit_reason(),
+                "error": attempt_error,
+                "total_cost": system.total_cost(),
+            })
+        with Path(self.logfile).open("w") as lf:
+            json.dump({
+                "start_time": self.start_time,
+                "end_time": self.end_time,
+                "time_taken": (self.end_time - self.start_time),
+                "total_cost": cost,
+                "success": self.solved,
+                "exit_reason": exit_reason,
+                "error": error,
+                "winner": self.winner,
+                "attempts": attempts,
+            }, lf, indent=2)
+        if self.solved:
+            logger.print(f"[green bold]Challenge Solved by attempt {self.winner}![/green bold]", force=True, markup=True)
+        else:
+            logger.print("[red bold]Challenge Not Solved![/red bold]", force=True, markup=True)
+        logger.print(f"exit: {exit_reason} cost: ${cost:.3f} attempts: {len(self.systems)}", force=True)
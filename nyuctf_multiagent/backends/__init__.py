@@ -1,8 +1,46 @@
-from .openai_backend import OpenAIBackend
-from .anthropic_backend import AnthropicBackend
-from .together_backend import TogetherBackend
-from .gemini_backend import GeminiBackend
-from .backend import Role
-
-BACKENDS = [OpenAIBackend, AnthropicBackend, TogetherBackend, GeminiBackend]
-MODELS = {m: b for b in BACKENDS for m in b.MODELS}
+from importlib import import_module
+from collections.abc import Mapping
+
+from .backend import Role, MODEL_INFO
+
+# Module and class of each backend. Imported on first use, so only the SDKs of the providers in use are loaded.
+BACKEND_CLASSES = {
+    "openai": ("openai_backend", "OpenAIBackend"),
+    "anthropic": ("anthropic_backend", "AnthropicBackend"),
+    "together": ("together_backend", "TogetherBackend"),
+    "gemini": ("gemini_backend", "GeminiBackend"),
+    "replay": ("replay_backend", "ReplayBackend"),
+}
+
+def backend_class(name):
+    """Backend class by NAME, importing its module and provider SDK"""
+    module, cls = BACKEND_CLASSES[name]
+    return getattr(import_module(f".{module}", __name__), cls)
+
+class ModelRegistry(Mapping):
+    """Backend class of each model in model_info.json, the backend is imported when its class is looked up"""
+    def __init__(self, model_info):
+        self.backends = {model: name for name, models in model_info.items() for model in models}
+
+    def __getitem__(self, model):
+        return backend_class(self.backends[model])
+
+    def __iter__(self):
+        return iter(self.backends)
+
+    def __len__(self):
+        return len(self.backends)
+
+    def __contains__(self, model):
+        return model in self.backends
+
+MODELS = ModelRegistry(MODEL_INFO)
+
+def __getattr__(name):
+    # BACKENDS and the backend classes are imported on access
+    if name == "BACKENDS":
+        return [backend_class(b) for b in BACKEND_CLASSES]
+    for b, (_, cls) in BACKEND_CLASSES.items():
+        if cls == name:
+            return backend_class(b)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,31 +1,30 @@
 import json
-from anthropic import Anthropic, RateLimitError
+from anthropic import Anthropic, AsyncAnthropic, RateLimitError
 
 from ..conversation import MessageRole
 from ..tools import ToolCall, ToolResult
 
 
-from .backend import Backend, BackendResponse
+from .backend import Backend, BackendResponse, MODEL_INFO
+
+# Cache the prompt prefix up to the marked block, https://docs.anthropic.com/en/docs/build-with-claude/prompt-caching
+CACHE_CONTROL = {"type": "ephemeral"}
 
 class AnthropicBackend(Backend):
     NAME = "anthropic"
-    MODELS = {
-        "claude-3-5-sonnet-20241022": {
-            "max_context": 200000,
-            "cost_per_input_token": 3e-06,
-            "cost_per_output_token": 15e-06
-        },
-        "claude-3-5-haiku-20241022": {
-            "max_context": 200000,
-            "cost_per_input_token": 0.8e-06,
-            "cost_per_output_token": 4e-06
-        }
-    }
+    RATE_LIMIT_ERRORS = (RateLimitError,)
+    MODELS = MODEL_INFO[NAME]
 
     def __init__(self, role, model, tools, api_key, config):
         super().__init__(role, model, tools, config)
         self.client = Anthropic(api_key=api_key)
+        self.aclient = AsyncAnthropic(api_key=api_key)
         self.tool_schemas = [self.get_tool_schema(tool) for tool in tools.values()]
+        # Prompt caching breakpoint after the tools, they are the same every round
+        if len(self.tool_schemas) > 0:
+            self.tool_schemas[-1]["cache_control"] = CACHE_CONTROL
+        self.cache_write_price = self.MODELS[model].get("cost_per_cache_write_token", self.in_price)
+        self.cache_read_price = self.MODELS[model].get("cost_per_cache_read_token", self.in_price)
 
     @staticmethod
     def get_tool_schema(tool):
@@ -41,10 +40,18 @@ class AnthropicBackend(Backend):
         }
 
     def calculate_cost(self, response):
-        return self.in_price * response.usage.input_tokens + self.out_price * response.usage.output_tokens
+        # input_tokens does not include the tokens written to or read from the prompt cache
+        usage = response.usage
+        return self.in_price * usage.input_tokens + self.out_price * usage.output_tokens + \
+               self.cache_write_price * (getattr(usage, "cache_creation_input_tokens", None) or 0) + \
+               self.cache_read_price * (getattr(usage, "cache_read_input_tokens", None) or 0)
 
-    def _call_model(self, system, messages):
-        return self.client.messages.create(
+    def usage_tokens(self, response):
+        usage = response.usage
+        return usage.input_tokens + usage.output_tokens + (getattr(usage, "cache_creation_input_tokens", None) or 0)
+
+    def _request_params(self, system, messages):
+        return dict(
                 model=self.model,
                 max_tokens=self.get_param(self.role, "max_tokens"),
                 temperature=self.get_param(self.role, "temperature"),
@@ -52,39 +59,57 @@ class AnthropicBackend(Backend):
                 tools=self.tool_schemas,
                 messages=messages)
 
-    def send(self, messages):
-        formatted_messages = []
+    def _call_model(self, system, messages):
+        return self.client.messages.create(**self._request_params(system, messages))
+
+    async def _acall_model(self, system, messages):
+        return await self.aclient.messages.create(**self._request_params(system, messages))
+
+    def format_message(self, m):
+        if m.role == MessageRole.OBSERVATION:
+            msg = {"role": "user",
+                   "content": [{
+                       "type": "tool_result",
+                       "tool_use_id": m.tool_data.id,
+                       "content": json.dumps(m.tool_data.result)
+                    }]}
+        elif m.role == MessageRole.ASSISTANT:
+            msg = {"role": m.role.value, "content": []}
+            if m.content is not None:
+                msg["content"].append({"type": "text", "text": m.content})
+            for tc in m.tool_calls:
+                msg["content"].append({"type": "tool_use",
+                                       "id": tc.id,
+                                       "name": tc.name,
+                                       "input": tc.arguments})
+        else:
+            msg = {"role": m.role.value, "content": [{"type": "text", "text": m.content}]}
+        return msg
+
+    def format_messages(self, messages):
+        """Returns the system prompt and the formatted messages"""
         system = None
+        conversation = []
         for m in messages:
             if m.role == MessageRole.SYSTEM:
                 system = m.content
-                continue
-            if m.role == MessageRole.OBSERVATION:
-                msg = {"role": "user",
-                       "content": [{
-                           "type": "tool_result",
-                           "tool_use_id": m.tool_data.id,
-                           "content": json.dumps(m.tool_data.result)
-                        }]}
-            elif m.role == MessageRole.ASSISTANT:
-                msg = {"role": m.role.value, "content": []}
-                if m.content is not None:
-                    msg["content"].append({"type": "text", "text": m.content})
-                if m.tool_data is not None:
-                    msg["content"].append({"type": "tool_use",
-                                           "id": m.tool_data.id,
-                                           "name": m.tool_data.name,
-                                           "input": m.tool_data.arguments})
             else:
-                msg = {"role": m.role.value, "content": [{"type": "text", "text": m.content}]}
-            formatted_messages.append(msg)
+                conversation.append(m)
+        formatted_messages = super().format_messages(conversation)
 
-        try:
-            response = self._call_model(system, formatted_messages)
-            cost = self.calculate_cost(response)
-        except RateLimitError as e:
-            return BackendResponse(error=f"Backend Error: {e}")
+        # Breakpoints on the system prompt and the end of the conversation, so the next round
+        # reads the whole prefix from the cache and only the new messages are processed
+        if system is not None:
+            system = [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
+        if len(formatted_messages) > 0 and len(formatted_messages[-1]["content"]) > 0:
+            # Copy, the formatted messages are reused in the next send without the breakpoint
+            last = formatted_messages[-1]
+            formatted_messages[-1] = {**last, "content": last["content"][:-1] + \
+                                      [{**last["content"][-1], "cache_control": CACHE_CONTROL}]}
+        return system, formatted_messages
 
+    def parse_response(self, response):
+        cost = self.calculate_cost(response)
         content = [m for m in response.content if m.type == "text"]
         tool_call = [m for m in response.content if m.type == "tool_use"]
         if len(content) > 0:
@@ -92,11 +117,27 @@ class AnthropicBackend(Backend):
         else:
             content = None
 
-        if len(tool_call) > 0:
-            tool_call = tool_call[0]
-            tool_call = ToolCall(name=tool_call.name, id=tool_call.id,
-                                 arguments=tool_call.input)
-        else:
-            tool_call = None
+        tool_calls = [ToolCall(name=tc.name, id=tc.id, arguments=tc.input) for tc in tool_call]
+
+        # Cached prompt tokens are not counted in input_tokens
+        usage = response.usage
+        input_tokens = usage.input_tokens + (getattr(usage, "cache_creation_input_tokens", None) or 0) + \
+                       (getattr(usage, "cache_read_input_tokens", None) or 0)
+        return BackendResponse(content=content, tool_calls=tool_calls, cost=cost,
+                               input_tokens=input_tokens, output_tokens=usage.output_tokens)
 
-        return BackendResponse(content=content, tool_call=tool_call, cost=cost)
+    def send(self, messages):
+        system, formatted_messages = self.format_messages(messages)
+        try:
+            response = self.limited_call(self._call_model, system, formatted_messages)
+        except RateLimitError as e:
+            return BackendResponse(error=f"Backend Error: {e}")
+        return self.parse_response(response)
+
+    async def asend(self, messages):
+        system, formatted_messages = self.format_messages(messages)
+        try:
+            response = await self.alimited_call(self._acall_model, system, formatted_messages)
+        except RateLimitError as e:
+            return BackendResponse(error=f"Backend Error: {e}")
+        return self.parse_response(response)
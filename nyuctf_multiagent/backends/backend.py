@@ -1,9 +1,23 @@
 import json
-from dataclasses import dataclass
+import copy
+import time
+import asyncio
+from dataclasses import dataclass, field
 from enum import Enum
+from pathlib import Path
 
 from ..tools import ToolResult
 
+# Context size and prices of the models of each backend, by backend NAME. Static, so the models
+# can be listed and validated without importing the provider SDKs.
+with open(Path(__file__).parent / "model_info.json", "r") as f:
+    MODEL_INFO = json.load(f)
+
+# Retries of a request that hit the provider rate limit, with exponential backoff
+RATE_LIMIT_RETRIES = 8
+RATE_LIMIT_BACKOFF = 2.0
+RATE_LIMIT_MAX_BACKOFF = 60.0
+
 class Role(Enum):
     PLANNER = "planner"
     EXECUTOR = "executor"
@@ -15,7 +29,18 @@ class BackendResponse:
     content: str=None
     error: str=None
     tool_call: object=None
+    # All tool calls if the model made parallel calls, tool_call is the first one
+    tool_calls: list=field(default_factory=list)
     cost: float=0
+    # Token usage reported by the provider, None if unknown
+    input_tokens: int=None
+    output_tokens: int=None
+
+    def __post_init__(self):
+        if self.tool_call is None and len(self.tool_calls) > 0:
+            self.tool_call = self.tool_calls[0]
+        elif self.tool_call is not None and len(self.tool_calls) == 0:
+            self.tool_calls = [self.tool_call]
 
     def __str__(self):
         return (f"content='{self.content}'" if self.content else "") + \
@@ -26,14 +51,10 @@ class BackendResponse:
 class Backend:
     """Base class for LLM Backend"""
     NAME = "base" # Set the backend name
-    # Set the model details for each subclass
-    MODELS = {
-        # "name": {
-        #    "max_context": <int>,
-        #    "cost_per_input_token": <float>,
-        #    "cost_per_output_token": <float>
-        # }
-    }
+    # Set the model details for each subclass, as MODEL_INFO[NAME]
+    MODELS = {}
+    # Provider exceptions for rate limited requests, retried with backoff. Set in the subclass.
+    RATE_LIMIT_ERRORS = ()
 
     def __init__(self, role: Role, model, tools, config):
         if self.NAME == "base" or len(self.MODELS) == 0:
@@ -48,6 +69,121 @@ class Backend:
         self.config = config
         self.in_price = self.MODELS[model]["cost_per_input_token"]
         self.out_price = self.MODELS[model]["cost_per_output_token"]
+        # Formatted messages of the last send, by message uid
+        self._formatted = {}
+        # Shared RateLimiter of the provider and API key, set by the runner
+        self.rate_limiter = None
+
+    def format_message(self, message):
+        """Convert one conversation message to the provider format, implemented by the subclass"""
+        raise NotImplementedError
+
+    def format_messages(self, messages):
+        """
+        Provider format of the messages. Formatted messages are kept from the previous send,
+        so each round only formats the new messages instead of the whole conversation.
+        The returned dicts are shared across sends, copy them before modifying.
+        """
+        formatted = {}
+        for m in messages:
+            # Old assistant messages are sent without the tool call once truncated
+            key = (m.uid, m.tool_data is None)
+            formatted[key] = self._formatted.get(key) or self.format_message(m)
+        # Only keep the messages of this send, drops truncated and finished conversations
+        self._formatted = formatted
+        return list(formatted.values())
+
+    def estimate_tokens(self, request):
+        """Rough token count of the request for the rate limiter, 4 characters per token plus max_tokens of output"""
+        return len(json.dumps(request, default=str)) // 4 + self.get_param(self.role, "max_tokens")
+
+    def usage_tokens(self, response):
+        """Tokens used by the provider response, overridden by the subclass. None if unknown."""
+        return None
+
+    def retry_delay(self, error, attempt):
+        """Backoff before retrying a rate limited request, uses the retry-after header if the provider sent one"""
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            return min(float(headers.get("retry-after")), RATE_LIMIT_MAX_BACKOFF)
+        except (TypeError, ValueError):
+            return min(RATE_LIMIT_BACKOFF * 2 ** attempt, RATE_LIMIT_MAX_BACKOFF)
+
+    def limited_call(self, call, *request):
+        """
+        Call the model through the rate limiter. Rate limited requests are queued and
+        retried with backoff, the error is only raised after RATE_LIMIT_RETRIES.
+        """
+        estimate = self.estimate_tokens(request)
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(estimate)
+            try:
+                response = call(*request)
+                break
+            except self.RATE_LIMIT_ERRORS as e:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                delay = self.retry_delay(e, attempt)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.block(delay)
+                time.sleep(delay)
+        if self.rate_limiter is not None and (actual := self.usage_tokens(response)) is not None:
+            self.rate_limiter.settle(estimate, actual)
+        return response
+
+    async def alimited_call(self, call, *request):
+        """Async version of limited_call"""
+        estimate = self.estimate_tokens(request)
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(estimate)
+            try:
+                response = await call(*request)
+                break
+            except self.RATE_LIMIT_ERRORS as e:
+                if attempt == RATE_LIMIT_RETRIES:
+                    raise
+                delay = self.retry_delay(e, attempt)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.block(delay)
+                await asyncio.sleep(delay)
+        if self.rate_limiter is not None and (actual := self.usage_tokens(response)) is not None:
+            self.rate_limiter.settle(estimate, actual)
+        return response
+
+    def send(self, messages):
+        """Send the conversation messages to the model and return a BackendResponse"""
+        raise NotImplementedError
+
+    async def asend(self, messages):
+        """
+        Async version of send. Backends with an async client override this,
+        by default the blocking send runs in a worker thread.
+        """
+        return await asyncio.to_thread(self.send, messages)
+
+    def fork(self):
+        """
+        Copy of the backend for another agent running concurrently.
+        Shares the API clients, which are thread-safe, but not the formatted message cache.
+        """
+        forked = copy.copy(self)
+        forked._formatted = {}
+        return forked
+
+    @property
+    def parallel_tool_calls(self):
+        """Only the planner can make parallel tool calls, to delegate several tasks at once"""
+        return self.role == Role.PLANNER and self.get_param(self.role, "max_parallel_tasks") > 1
+
+    def context_budget(self):
+        """Input token budget of the conversation, the configured fraction of max_context minus the output tokens"""
+        max_context = self.MODELS[self.model].get("max_context")
+        if max_context is None:
+            return None
+        return int(max_context * self.get_param(self.role, "context_fraction")) - \
+                self.get_param(self.role, "max_tokens")
 
     def get_param(self, role: Role, param: str):
         try:
@@ -4,38 +4,12 @@ from google.api_core.exceptions import ResourceExhausted
 from ..conversation import MessageRole
 from ..tools import ToolCall, ToolResult
 import uuid
-from .backend import Backend, BackendResponse
+from .backend import Backend, BackendResponse, MODEL_INFO
 
 class GeminiBackend(Backend):
     NAME = "gemini"
-    MODELS = {
-        "gemini-2.0-flash-exp": {
-            "max_context": 1000000,
-            "cost_per_input_token": 0,
-            "cost_per_output_token": 0
-        },
-        "gemini-1.5-flash": {
-            "max_context": 1000000,
-            "cost_per_input_token": 75e-08,
-            "cost_per_output_token": 3e-07
-        },
-        "gemini-1.5-flash-8b": {
-            "max_context": 1000000,
-            "cost_per_input_token": 375e-09,
-            "cost_per_output_token": 15e-08
-        },
-        "gemini-1.5-pro": {
-            "max_context": 2000000,
-            "cost_per_input_token": 125e-08,
-            "cost_per_output_token": 5e-06
-        },
-        # Will be deprecated from 02/15/2025
-        "gemini-1.0-pro": {
-            "max_context": 32000,
-            "cost_per_input_token": 5e-07,
-            "cost_per_output_token": 15e-07
-        }
-    }
+    RATE_LIMIT_ERRORS = (ResourceExhausted,)
+    MODELS = MODEL_INFO[NAME]
 
     def __init__(self, role, model, tools, api_key, config):
         super().__init__(role, model, tools, config)
@@ -56,49 +30,65 @@ class GeminiBackend(Backend):
             }
         }
 
+    def _generation_config(self):
+        return genai.types.GenerationConfig(
+                temperature=self.get_param(self.role, "temperature"),
+                max_output_tokens=self.get_param(self.role, "max_tokens")
+            )
+
     def _call_model(self, system, messages):
         return genai.GenerativeModel(
             model_name=self.model, 
             system_instruction=system).generate_content(
             messages,
-            generation_config=genai.types.GenerationConfig(
-                temperature=self.get_param(self.role, "temperature"),
-                max_output_tokens=self.get_param(self.role, "max_tokens")
-            ),
+            generation_config=self._generation_config(),
+            tools=self.tool_schemas)
+
+    async def _acall_model(self, system, messages):
+        return await genai.GenerativeModel(
+            model_name=self.model,
+            system_instruction=system).generate_content_async(
+            messages,
+            generation_config=self._generation_config(),
             tools=self.tool_schemas)
 
     def calculate_cost(self, response):
         return self.in_price * response["usage_metadata"]["prompt_token_count"] + self.out_price * response["usage_metadata"]["candidates_token_count"]
 
-    def send(self, messages):
-        formatted_messages = []
+    def format_message(self, m):
+        if m.role == MessageRole.OBSERVATION:
+            msg = {"role": "user",
+                   "parts": str(json.dumps(m.tool_data.result))}
+        elif m.role == MessageRole.ASSISTANT:
+            msg = {"role": "model" if m.role.value == "assistant" else "user", "parts": "Assistant has no thought!"}
+            if m.content is not None and len(m.content) > 0:
+                msg["parts"] = m.content
+            if m.tool_data is not None:
+                msg["parts"] = [{"function_call": {
+                                    "name": tc.name,
+                                    "args": tc.arguments
+                                }} for tc in m.tool_calls]
+        else:                
+            msg = {"role": "model" if m.role.value == "assistant" else "user", "parts": "Assistant has no thought" if m.content is None else str(m.content)}
+        return msg
+
+    def usage_tokens(self, response):
+        return response.usage_metadata.total_token_count
+
+    def format_messages(self, messages):
+        """Returns the system prompt and the formatted messages"""
         system = None
+        conversation = []
         for m in messages:
             if m.role == MessageRole.SYSTEM:
                 system = m.content
-                continue
-            if m.role == MessageRole.OBSERVATION:
-                msg = {"role": "user",
-                       "parts": str(json.dumps(m.tool_data.result))}
-            elif m.role == MessageRole.ASSISTANT:
-                msg = {"role": "model" if m.role.value == "assistant" else "user", "parts": "Assistant has no thought!"}
-                if m.content is not None and len(m.content) > 0:
-                    msg["parts"] = m.content
-                if m.tool_data is not None:
-                    msg["parts"] = [{"function_call": {
-                                        "name": m.tool_data.name,
-                                        "args": m.tool_data.arguments
-                                    }}]
-            else:                
-                msg = {"role": "model" if m.role.value == "assistant" else "user", "parts": "Assistant has no thought" if m.content is None else str(m.content)}
-            formatted_messages.append(msg)
-
-        try:
-            response = self._call_model(system, formatted_messages).to_dict()
-            cost = self.calculate_cost(response)
-        except ResourceExhausted as e:
-            return BackendResponse(error=f"Backend Error: {e}")
+            else:
+                conversation.append(m)
+        return system, super().format_messages(conversation)
 
+    def parse_response(self, response):
+        """Parse the response converted to dict"""
+        cost = self.calculate_cost(response)
         try:
             parts = response["candidates"][0]["content"]["parts"]
             content = [m['text'] for m in parts if "text" in m.keys()]
@@ -110,11 +100,25 @@ class GeminiBackend(Backend):
         else:
             content = None
         
-        if len(tool_call) > 0:
-            tool_call = tool_call[0]
-            tool_call = ToolCall(name=tool_call["name"], id=str(uuid.uuid4()),
-                                 arguments=tool_call["args"])
-        else:
-            tool_call = None
+        tool_calls = [ToolCall(name=tc["name"], id=str(uuid.uuid4()), arguments=tc["args"])
+                      for tc in tool_call]
 
-        return BackendResponse(content=content, tool_call=tool_call, cost=cost)
+        return BackendResponse(content=content, tool_calls=tool_calls, cost=cost,
+                               input_tokens=response["usage_metadata"]["prompt_token_count"],
+                               output_tokens=response["usage_metadata"]["candidates_token_count"])
+
+    def send(self, messages):
+        system, formatted_messages = self.format_messages(messages)
+        try:
+            response = self.limited_call(self._call_model, system, formatted_messages).to_dict()
+        except ResourceExhausted as e:
+            return BackendResponse(error=f"Backend Error: {e}")
+        return self.parse_response(response)
+
+    async def asend(self, messages):
+        system, formatted_messages = self.format_messages(messages)
+        try:
+            response = (await self.alimited_call(self._acall_model, system, formatted_messages)).to_dict()
+        except ResourceExhausted as e:
+            return BackendResponse(error=f"Backend Error: {e}")
+        return self.parse_response(response)
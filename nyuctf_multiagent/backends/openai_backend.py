@@ -1,61 +1,22 @@
 import json
-from openai import OpenAI, RateLimitError, BadRequestError
+from openai import OpenAI, AsyncOpenAI, RateLimitError, BadRequestError
 from openai.types.chat import ChatCompletionMessage
 
 from ..conversation import MessageRole
 from ..tools import ToolCall, ToolResult
 
-from .backend import Backend, BackendResponse
+from .backend import Backend, BackendResponse, MODEL_INFO
 
 
 class OpenAIBackend(Backend):
     NAME = 'openai'
-    MODELS = {
-        "gpt-4o-2024-11-20": {
-            "max_context": 128000,
-            "cost_per_input_token": 2.5e-06,
-            "cost_per_output_token": 10e-06
-        },
-        "gpt-4o-2024-08-06": {
-            "max_context": 128000,
-            "cost_per_input_token": 2.5e-06,
-            "cost_per_output_token": 10e-06
-        },
-        "gpt-4o-2024-05-13": {
-            "max_context": 128000,
-            "cost_per_input_token": 5e-06,
-            "cost_per_output_token": 15e-06
-        },
-        "gpt-4o-mini-2024-07-18": {
-            "max_context": 128000,
-            "cost_per_input_token": 0.15e-06,
-            "cost_per_output_token": 0.6e-06
-        },
-        "gpt-3.5-turbo-1106": {
-            "max_context": 16385,
-            "cost_per_input_token": 1e-06,
-            "cost_per_output_token": 2e-06
-        },
-        "gpt-4-1106-preview": {
-            "max_context": 128000,
-            "cost_per_input_token": 10e-06,
-            "cost_per_output_token": 30e-06
-        },
-        "gpt-4-0125-preview": {
-            "max_context": 128000,
-            "cost_per_input_token": 10e-06,
-            "cost_per_output_token": 30e-06
-        },
-        "gpt-4-turbo-2024-04-09": {
-            "max_context": 128000,
-            "cost_per_input_token": 10e-06,
-            "cost_per_output_token": 30e-06
-        },
-    }
+    RATE_LIMIT_ERRORS = (RateLimitError,)
+    MODELS = MODEL_INFO[NAME]
 
     def __init__(self, role, model, tools, api_key, config):
         super().__init__(role, model, tools, config)
         self.client = OpenAI(api_key=api_key)
+        self.aclient = AsyncOpenAI(api_key=api_key)
         self.tool_schemas = [self.get_tool_schema(tool) for tool in tools.values()]
 
     @staticmethod
@@ -74,55 +35,73 @@ class OpenAIBackend(Backend):
             }
         }
 
-    # @backoff.on_exception(backoff.expo, RateLimitError, max_tries=5)
-    def _call_model(self, messages) -> ChatCompletionMessage:
-        return self.client.chat.completions.create(
+    def _request_params(self, messages):
+        return dict(
             model=self.model,
             messages=messages,
             tools=self.tool_schemas,
             tool_choice="auto", # TODO try "required" here to force a function call
-            parallel_tool_calls=False,
+            parallel_tool_calls=self.parallel_tool_calls,
             temperature=self.get_param(self.role, "temperature"),
             max_tokens=self.get_param(self.role, "max_tokens")
         )
 
+    def _call_model(self, messages) -> ChatCompletionMessage:
+        return self.client.chat.completions.create(**self._request_params(messages))
+
+    async def _acall_model(self, messages) -> ChatCompletionMessage:
+        return await self.aclient.chat.completions.create(**self._request_params(messages))
+
     def calculate_cost(self, response):
         return self.in_price * response.usage.prompt_tokens + self.out_price * response.usage.completion_tokens
 
-    def send(self, messages):
-        formatted_messages = []
-        for m in messages:
-            if m.role == MessageRole.OBSERVATION:
-                msg = {"role": "tool",
-                       "content": json.dumps(m.tool_data.result),
-                       "tool_call_id": m.tool_data.id}
-            elif m.role == MessageRole.ASSISTANT:
-                msg = {"role": m.role.value}
-                if m.content is not None:
-                    msg["content"] = m.content
-                if m.tool_data is not None:
-                    msg["tool_calls"] = [{"id": m.tool_data.id,
-                                          "type": "function",
-                                          "function": {
-                                              "name": m.tool_data.name,
-                                              "arguments": m.tool_data.arguments
-                                            }}]
-            else:
-                msg = {"role": m.role.value, "content": m.content}
-            formatted_messages.append(msg)
+    def usage_tokens(self, response):
+        return response.usage.total_tokens
+
+    def format_message(self, m):
+        if m.role == MessageRole.OBSERVATION:
+            msg = {"role": "tool",
+                   "content": json.dumps(m.tool_data.result),
+                   "tool_call_id": m.tool_data.id}
+        elif m.role == MessageRole.ASSISTANT:
+            msg = {"role": m.role.value}
+            if m.content is not None:
+                msg["content"] = m.content
+            if m.tool_data is not None:
+                msg["tool_calls"] = [{"id": tc.id,
+                                      "type": "function",
+                                      "function": {
+                                          "name": tc.name,
+                                          "arguments": tc.arguments
+                                        }} for tc in m.tool_calls]
+        else:
+            msg = {"role": m.role.value, "content": m.content}
+        return msg
+
+    def parse_response(self, response):
+        cost = self.calculate_cost(response)
+        usage = response.usage
+        response = response.choices[0].message
 
+        tool_calls = [ToolCall(name=oai_call.function.name, id=oai_call.id,
+                               arguments=oai_call.function.arguments)
+                      for oai_call in (response.tool_calls or [])]
+
+        return BackendResponse(content=response.content, tool_calls=tool_calls, cost=cost,
+                               input_tokens=usage.prompt_tokens, output_tokens=usage.completion_tokens)
+
+    def send(self, messages):
+        formatted_messages = self.format_messages(messages)
         try:
-            response = self._call_model(formatted_messages)
-            cost = self.calculate_cost(response)
-            response = response.choices[0].message
-        except BadRequestError as e:
+            response = self.limited_call(self._call_model, formatted_messages)
+        except (BadRequestError, RateLimitError) as e:
             return BackendResponse(error=f"Backend Error: {e}")
+        return self.parse_response(response)
 
-        if response.tool_calls and len(response.tool_calls) > 0:
-            oai_call = response.tool_calls[0]
-            tool_call = ToolCall(name=oai_call.function.name, id=oai_call.id,
-                                 arguments=oai_call.function.arguments)
-        else:
-            tool_call = None
-
-        return BackendResponse(content=response.content, tool_call=tool_call, cost=cost)
+    async def asend(self, messages):
+        formatted_messages = self.format_messages(messages)
+        try:
+            response = await self.alimited_call(self._acall_model, formatted_messages)
+        except (BadRequestError, RateLimitError) as e:
+            return BackendResponse(error=f"Backend Error: {e}")
+        return self.parse_response(response)
@@ -0,0 +1,152 @@
+import json
+import time
+import fcntl
+import asyncio
+import hashlib
+from pathlib import Path
+
+from ..logging import logger
+
+DEFAULT_STATE_DIR = "~/.cache/nyuctf_multiagent/ratelimit"
+
+now = lambda: time.time()
+
+class RateLimiter:
+    """
+    Token-bucket limiter of requests per minute and tokens per minute for one provider and API key.
+
+    The bucket state lives in a small JSON file locked with fcntl, so all worker processes on
+    the host share the same limits. Requests that do not fit wait in a queue until the buckets
+    refill instead of failing. A provider rate limit error pauses all processes for the backoff.
+    """
+    def __init__(self, path, rpm=None, tpm=None):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rpm = rpm
+        self.tpm = tpm
+
+        # Queue wait stats of this process
+        self.requests = 0
+        self.queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.rate_limit_errors = 0
+
+    def _update(self, fn):
+        """Apply fn to the refilled bucket state under the lock, and return its result"""
+        with self.lock_path.open("a") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            t = now()
+            try:
+                state = json.loads(self.path.read_text())
+            except (FileNotFoundError, json.JSONDecodeError):
+                state = {"time": t, "requests": self.rpm or 0, "tokens": self.tpm or 0, "blocked_until": 0}
+            elapsed = max(t - state["time"], 0)
+            if self.rpm:
+                state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm / 60)
+            if self.tpm:
+                state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60)
+            state["time"] = t
+            result = fn(state, t)
+            self.path.write_text(json.dumps(state))
+            return result
+
+    def _reserve(self, tokens):
+        """Take one request and the tokens from the buckets, or return the seconds to wait"""
+        def reserve(state, t):
+            wait = max(state["blocked_until"] - t, 0)
+            if self.rpm and state["requests"] < 1:
+                wait = max(wait, (1 - state["requests"]) * 60 / self.rpm)
+            # A request larger than the bucket goes through once the bucket is full
+            if self.tpm and state["tokens"] < min(tokens, self.tpm):
+                wait = max(wait, (min(tokens, self.tpm) - state["tokens"]) * 60 / self.tpm)
+            if wait == 0:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+            return wait
+        return self._update(reserve)
+
+    def _record_wait(self, waited):
+        self.requests += 1
+        if waited > 0:
+            self.queued += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            logger.debug_message(f"Rate limiter {self.path.stem} queued request for {waited:.2f}s")
+
+    def acquire(self, tokens):
+        """Wait until the request with the estimated tokens fits in the limits, returns the time waited"""
+        start = now()
+        waited = 0.0
+        while (wait := self._reserve(tokens)) > 0:
+            time.sleep(wait)
+            waited = now() - start
+        self._record_wait(waited)
+        return waited
+
+    async def aacquire(self, tokens):
+        """Async version of acquire"""
+        start = now()
+        waited = 0.0
+        while (wait := self._reserve(tokens)) > 0:
+            await asyncio.sleep(wait)
+            waited = now() - start
+        self._record_wait(waited)
+        return waited
+
+    def settle(self, estimated, actual):
+        """Correct the tokens bucket with the actual token usage of the request"""
+        def settle(state, t):
+            if self.tpm:
+                state["tokens"] = min(self.tpm, state["tokens"] + estimated - actual)
+        self._update(settle)
+
+    def block(self, delay):
+        """Pause requests of all processes after the provider returned a rate limit error"""
+        self.rate_limit_errors += 1
+        def block(state, t):
+            state["blocked_until"] = max(state["blocked_until"], t + delay)
+        self._update(block)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "queued": self.queued,
+            "wait_total": self.wait_total,
+            "wait_max": self.wait_max,
+            "wait_mean": self.wait_total / self.requests if self.requests > 0 else 0.0,
+            "rate_limit_errors": self.rate_limit_errors,
+        }
+
+def parse_rate_limits(values):
+    """
+    Parse the --rate-limit options of the form provider=RPM,TPM to {provider: (rpm, tpm)}.
+    Either limit can be left empty, e.g. anthropic=50, or openai=,800000.
+    """
+    limits = {}
+    for value in values or []:
+        provider, _, spec = value.partition("=")
+        rpm, _, tpm = spec.partition(",")
+        limits[provider.strip().lower()] = (float(rpm) if rpm else None, float(tpm) if tpm else None)
+    return limits
+
+# Limiters of this process, by provider and key, so all backends with the same key share one
+_limiters = {}
+
+def load_rate_limiter(args, provider, api_key):
+    """Rate limiter for the provider and API key from the --rate-limit options, or None if not limited"""
+    limits = parse_rate_limits(args.rate_limit)
+    if provider not in limits:
+        return None
+    # Only a hash of the key goes in the state file name
+    key_hash = hashlib.sha256((api_key or "").encode()).hexdigest()[:12]
+    name = f"{provider}-{key_hash}"
+    if name not in _limiters:
+        rpm, tpm = limits[provider]
+        _limiters[name] = RateLimiter(Path(args.rate_limit_dir).expanduser() / f"{name}.json", rpm=rpm, tpm=tpm)
+    return _limiters[name]
+
+def rate_limit_stats():
+    """Queue wait stats of all rate limiters of this process"""
+    return {name: limiter.stats() for name, limiter in _limiters.items()}
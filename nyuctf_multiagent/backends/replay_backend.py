@@ -0,0 +1,155 @@
+import json
+import threading
+from pathlib import Path
+from collections import deque
+
+from ..conversation import MessageRole
+from ..tools import ToolCall
+
+from .backend import Backend, BackendResponse, Role, MODEL_INFO
+
+def cassette_path(logfile):
+    """Cassette recorded next to the JSON log file"""
+    logfile = Path(logfile)
+    return logfile.with_name(f"{logfile.stem}.cassette.jsonl")
+
+def replay_source(path, challenge):
+    """
+    Transcript or cassette to replay for the challenge. A directory is searched for the
+    cassette, then the JSON log, of the challenge.
+    """
+    path = Path(path)
+    if not path.is_dir():
+        return path
+    for source in [path / f"{challenge.canonical_name}.cassette.jsonl", path / f"{challenge.canonical_name}.json"]:
+        if source.exists():
+            return source
+    raise FileNotFoundError(f"No cassette or log of {challenge.canonical_name} to replay in {path}")
+
+def use_replay(config, source):
+    """Set all the agents of the config to replay from the source"""
+    for agent_config in [config.planner, config.executor, config.autoprompter]:
+        agent_config.model = "replay"
+        agent_config.cassette = str(source)
+
+def transcript_responses(log, role):
+    """Responses of the role, rebuilt from the assistant messages of the JSON log"""
+    if role == Role.EXECUTOR:
+        # Single executor runs have one conversation, planner-executor runs have one per delegated task
+        messages = log["executor"] if "executor" in log else [m for e in log.get("executors", []) for m in e]
+    else:
+        messages = log.get(role.value) or []
+
+    responses = []
+    for m in messages:
+        if m["role"] != str(MessageRole.ASSISTANT):
+            continue
+        dumped = m.get("tool_calls") or ([m["tool_call"]] if m.get("tool_call") else [])
+        tool_calls = []
+        for tc in dumped:
+            # Tool call ids are not logged, use deterministic ones
+            call_id = f"replay-{role.value}-{len(responses)}-{len(tool_calls)}"
+            if "parsed_args" in tc:
+                tool_calls.append(ToolCall(name=tc["name"], id=call_id, arguments=json.dumps(tc["parsed_args"])))
+            else:
+                tool_calls.append(ToolCall(name=tc["name"], id=call_id, arguments=tc.get("args")))
+        # The log does not have the cost of each response
+        responses.append(BackendResponse(content=m["content"], tool_calls=tool_calls))
+    return responses
+
+def cassette_responses(path, role):
+    """Responses of the role recorded in the cassette, with their original costs"""
+    responses = []
+    with Path(path).open("r") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["role"] != role.value:
+                continue
+            tool_calls = [ToolCall(name=tc["name"], id=tc["id"], arguments=tc["arguments"]) for tc in entry["tool_calls"]]
+            responses.append(BackendResponse(content=entry["content"], error=entry["error"],
+                                             tool_calls=tool_calls, cost=entry["cost"],
+                                             input_tokens=entry.get("input_tokens"),
+                                             output_tokens=entry.get("output_tokens")))
+    return responses
+
+class ReplayBackend(Backend):
+    """
+    Replays recorded responses instead of calling a model, for offline benchmarking.
+
+    The responses of each agent role come from a cassette recorded with --record, which keeps
+    the exact responses and costs, or from the JSON log of a previous run (without costs).
+    The messages sent are ignored, so replays are deterministic as long as the tools give the
+    same results. Set the source with --replay or the `cassette` option of the agent config.
+    """
+    NAME = "replay"
+    MODELS = MODEL_INFO[NAME]
+
+    def __init__(self, role, model, tools, api_key, config):
+        super().__init__(role, model, tools, config)
+        source = self.get_param(role, "cassette")
+        if source is None:
+            raise ValueError(f"No cassette set for the {role.value} replay backend, use --replay")
+        if source.endswith(".jsonl"):
+            responses = cassette_responses(source, role)
+        else:
+            with open(source, "r") as f:
+                responses = transcript_responses(json.load(f), role)
+        # Shared by forks, executors that run one after another replay in order
+        self.responses = deque(responses)
+
+    def format_message(self, m):
+        return m
+
+    def send(self, messages):
+        if len(self.responses) == 0:
+            return BackendResponse(error=f"Replay has no more {self.role.value} responses")
+        # Fresh tool calls, the agent sets the parsed arguments on them
+        response = self.responses.popleft()
+        tool_calls = [ToolCall(name=tc.name, id=tc.id, arguments=tc.arguments) for tc in response.tool_calls]
+        return BackendResponse(content=response.content, error=response.error, tool_calls=tool_calls,
+                               cost=response.cost, input_tokens=response.input_tokens,
+                               output_tokens=response.output_tokens)
+
+class Cassette:
+    """JSONL file of the responses of all backends of a run, replayed by ReplayBackend"""
+    def __init__(self, path):
+        self.path = Path(path)
+        self.file = self.path.open("w")
+        # Concurrent executors record from their own threads
+        self.lock = threading.Lock()
+
+    def record(self, role, response):
+        entry = {
+            "role": role.value,
+            "content": response.content,
+            "error": response.error,
+            "cost": response.cost,
+            "input_tokens": response.input_tokens,
+            "output_tokens": response.output_tokens,
+            "tool_calls": [{"name": tc.name, "id": tc.id, "arguments": tc.arguments} for tc in response.tool_calls],
+        }
+        with self.lock:
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+
+class RecordingBackend:
+    """Wraps a live backend and records its responses to a cassette"""
+    def __init__(self, backend, cassette):
+        self.backend = backend
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def send(self, messages):
+        response = self.backend.send(messages)
+        self.cassette.record(self.backend.role, response)
+        return response
+
+    async def asend(self, messages):
+        response = await self.backend.asend(messages)
+        self.cassette.record(self.backend.role, response)
+        return response
+
+    def fork(self):
+        return RecordingBackend(self.backend.fork(), self.cassette)
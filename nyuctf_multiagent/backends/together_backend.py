@@ -1,4 +1,5 @@
 from .openai_backend import OpenAIBackend
+from .backend import MODEL_INFO
 
 class TogetherBackend(OpenAIBackend):
     """
@@ -8,30 +9,10 @@ class TogetherBackend(OpenAIBackend):
     https://docs.together.ai/docs/function-calling
     """
     NAME = "together"
-    MODELS = {
-        "meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo": {
-            "max_context": 131072,
-            "cost_per_input_token": 0.18e-06,
-            "cost_per_output_token": 0.18e-06,
-        },
-        "meta-llama/Meta-Llama-3.1-70B-Instruct-Turbo": {
-            "max_context": 131072,
-            "cost_per_input_token": 0.88e-06,
-            "cost_per_output_token": 0.88e-06,
-        },
-        "meta-llama/Llama-3.3-70B-Instruct-Turbo": {
-            "max_context": 131072,
-            "cost_per_input_token": 0.88e-06,
-            "cost_per_output_token": 0.88e-06,
-        },
-        "meta-llama/Meta-Llama-3.1-405B-Instruct-Turbo": {
-            "max_context": 130815,
-            "cost_per_input_token": 3.5e-06,
-            "cost_per_output_token": 3.5e-06,
-        }
-    }
+    MODELS = MODEL_INFO[NAME]
 
     def __init__(self, role, model, tools, api_key, config):
         super().__init__(role, model, tools, api_key, config)
         # Reset the client base URL
         self.client.base_url = "https://api.together.xyz/v1"
+        self.aclient.base_url = "https://api.together.xyz/v1"
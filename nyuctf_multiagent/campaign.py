@@ -0,0 +1,194 @@
+import os
+import time
+import threading
+import multiprocessing
+from multiprocessing.util import Finalize
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from nyuctf.dataset import CTFDataset
+from nyuctf.challenge import CTFChallenge
+
+from .runner import build_planner_executor, build_attempts
+from .attempts import SpeculativeAttempts
+from .container_pool import ContainerPool
+from .backends.rate_limit import rate_limit_stats
+from .metrics import metrics, start_metrics_server
+from .logging import logger
+from .utils import get_log_filename
+
+now = lambda: time.time()
+
+@dataclass
+class ChallengeResult:
+    """Outcome of one challenge run in a campaign"""
+    challenge: str
+    status: str # solved, unsolved, error, skipped
+    exit_reason: str = None
+    cost: float = 0.0
+    time_taken: float = 0.0
+    error: str = None
+    logfile: str = None
+    worker: int = None
+    pool_stats: dict = None
+    attempts: int = 1
+    winner: int = None # attempt that solved the challenge
+    rate_limit_stats: dict = None
+
+def load_dataset(args):
+    if args.dataset is not None:
+        return CTFDataset(dataset_json=args.dataset)
+    else:
+        return CTFDataset(split=args.split)
+
+def get_campaign_challenges(args, dataset):
+    """Challenge names from --challenge-list or --challenges, else the whole dataset"""
+    if args.challenge_list is not None:
+        with open(args.challenge_list, "r") as f:
+            return [l.strip() for l in f if l.strip() and not l.startswith("#")]
+    if len(args.challenges) > 0:
+        return list(args.challenges)
+    return list(dataset.dataset.keys())
+
+# Per-process state of the campaign workers
+_worker_dataset = None
+_worker_pool = None
+
+def _init_worker(args, metrics_queue=None):
+    global _worker_dataset, _worker_pool
+    # Workers share the terminal, so only the campaign process prints
+    logger.set(quiet=True, debug=False, show_progress=False)
+    if metrics_queue is not None:
+        # The campaign process serves the metrics of all workers
+        metrics.forward_to(metrics_queue)
+    _worker_dataset = load_dataset(args)
+    if args.pool_size > 0:
+        # Pre-start the container for the next challenge while this worker runs the current one
+        _worker_pool = ContainerPool(args.container_image, args.container_network, size=args.pool_size)
+        # atexit does not run in pool workers, multiprocessing finalizers do
+        Finalize(_worker_pool, _worker_pool.close, exitpriority=10)
+
+def run_campaign_challenge(args, chalname, logfile, config_dir):
+    """Run one challenge inside a worker process and return its result"""
+    # The debug log is dumped with each transcript, do not leak it across challenges
+    logger.debug_log.clear()
+    start = now()
+    system = None
+    try:
+        challenge = CTFChallenge(_worker_dataset.get(chalname), _worker_dataset.basedir)
+        if args.attempts > 1:
+            system = build_attempts(args, challenge, logfile, config_dir, container_pool=_worker_pool)
+        else:
+            system = build_planner_executor(args, challenge, logfile, config_dir, container_pool=_worker_pool)
+        with system:
+            system.run()
+        if isinstance(system, SpeculativeAttempts):
+            solved, winner = system.solved, system.winner
+        else:
+            solved, winner = system.environment.solved, None
+        return ChallengeResult(challenge=chalname,
+                               status="solved" if solved else "unsolved",
+                               exit_reason=system.get_exit_reason(),
+                               cost=system.total_cost(),
+                               time_taken=now() - start,
+                               logfile=str(logfile),
+                               worker=os.getpid(),
+                               pool_stats=_worker_pool.stats() if _worker_pool is not None else None,
+                               attempts=args.attempts,
+                               winner=winner,
+                               rate_limit_stats=rate_limit_stats())
+    except Exception as e:
+        return ChallengeResult(challenge=chalname, status="error", exit_reason="error",
+                               cost=system.total_cost() if system is not None else 0.0,
+                               time_taken=now() - start,
+                               error=f"{type(e).__name__}: {str(e)}",
+                               logfile=str(logfile),
+                               worker=os.getpid(),
+                               pool_stats=_worker_pool.stats() if _worker_pool is not None else None,
+                               attempts=args.attempts,
+                               rate_limit_stats=rate_limit_stats())
+
+def print_campaign_summary(results, wall_time):
+    ran = [r for r in results if r.status != "skipped"]
+    solved = [r for r in ran if r.status == "solved"]
+    errors = [r for r in ran if r.status == "error"]
+    skipped = len(results) - len(ran)
+    cost = sum(r.cost for r in ran)
+    solve_rate = len(solved) / len(ran) * 100 if len(ran) > 0 else 0.0
+    throughput = len(ran) / wall_time * 3600 if wall_time > 0 else 0.0
+
+    logger.print("============= CAMPAIGN SUMMARY ==============", style="bold", force=True)
+    logger.print(f"challenges: {len(results)} ran: {len(ran)} skipped: {skipped} errors: {len(errors)}", force=True)
+    attempts = max((r.attempts for r in ran), default=1)
+    metric = f" pass@{attempts}" if attempts > 1 else ""
+    logger.print(f"solved{metric}: {len(solved)}/{len(ran)} ({solve_rate:.2f}%)", force=True)
+    logger.print(f"total cost: ${cost:.3f} wall time: {wall_time:.1f}s throughput: {throughput:.2f} challenges/hour", force=True)
+
+    # Pool stats are cumulative per worker, so take the latest from each
+    pool_stats = {}
+    for r in ran:
+        if r.pool_stats is not None:
+            pool_stats[r.worker] = r.pool_stats
+    if len(pool_stats) > 0:
+        hits = sum(s["hits"] for s in pool_stats.values())
+        misses = sum(s["misses"] for s in pool_stats.values())
+        acquire_max = max(s["acquire_max"] for s in pool_stats.values())
+        acquire_mean = sum(s["acquire_mean"] * (s["hits"] + s["misses"]) for s in pool_stats.values()) / max(hits + misses, 1)
+        logger.print(f"container pool: hits: {hits} misses: {misses} " + \
+                     f"acquire mean: {acquire_mean:.2f}s max: {acquire_max:.2f}s", force=True)
+
+    # Rate limiter stats are also cumulative per worker and limiter
+    rate_stats = {}
+    for r in ran:
+        for name, stats in (r.rate_limit_stats or {}).items():
+            rate_stats[(r.worker, name)] = stats
+    if len(rate_stats) > 0:
+        requests = sum(s["requests"] for s in rate_stats.values())
+        queued = sum(s["queued"] for s in rate_stats.values())
+        wait_total = sum(s["wait_total"] for s in rate_stats.values())
+        wait_max = max(s["wait_max"] for s in rate_stats.values())
+        rate_limit_errors = sum(s["rate_limit_errors"] for s in rate_stats.values())
+        logger.print(f"rate limiter: requests: {requests} queued: {queued} " + \
+                     f"wait total: {wait_total:.1f}s max: {wait_max:.2f}s provider rate limit errors: {rate_limit_errors}", force=True)
+
+    for r in errors:
+        logger.print(f"[red]error[/red] {r.challenge}: {r.error}", markup=True, force=True)
+
+def run_campaign(args, config_dir):
+    """
+    Run the planner-executor system over many challenges with a pool of worker processes.
+    Each challenge runs in its own process, since the logger and environment state are per-process.
+    """
+    dataset = load_dataset(args)
+    chalnames = get_campaign_challenges(args, dataset)
+    logger.print(f"Running campaign of {len(chalnames)} challenges with {args.workers} workers", force=True)
+
+    metrics_queue = None
+    if start_metrics_server(args) is not None:
+        metrics_queue = multiprocessing.Queue()
+        threading.Thread(target=metrics.drain, args=(metrics_queue,), name="metrics-drain", daemon=True).start()
+
+    results = []
+    start = now()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args, metrics_queue)) as pool:
+        futures = {}
+        for chalname in chalnames:
+            challenge = CTFChallenge(dataset.get(chalname), dataset.basedir)
+            logfile = get_log_filename(args, challenge)
+            if logfile.exists() and args.skip_existing:
+                logger.print(f"Skipping {chalname} as log file exists", force=True)
+                results.append(ChallengeResult(challenge=chalname, status="skipped", logfile=str(logfile)))
+                continue
+            fut = pool.submit(run_campaign_challenge, args, chalname, logfile, config_dir)
+            futures[fut] = chalname
+
+        for fut in as_completed(futures):
+            result = fut.result()
+            results.append(result)
+            logger.print(f"[{len(results)}/{len(chalnames)}] {result.challenge}: {result.status} " + \
+                         f"exit: {result.exit_reason} cost: ${result.cost:.3f} time: {result.time_taken:.1f}s", force=True)
+
+    if metrics_queue is not None:
+        metrics_queue.put(None)
+    print_campaign_summary(results, now() - start)
+    return results
@@ -0,0 +1,54 @@
+# Capping and killing of command output, shared by ExecSession and the CommandExec tool of nyuctf_baseline.
+# The baseline imports this module on its own, so it must not import anything outside the standard library.
+
+# Environment variable marking the processes of a command, inherited by all its children
+EXEC_MARKER = "NYUCTF_EXEC_ID"
+# Kills every process in the container whose environment has the marker given as $0. Docker does
+# not kill an exec when its client disconnects, and the processes can leave the process group.
+KILL_SCRIPT = ('for e in /proc/[0-9]*/environ; do '
+               'if grep -qxzF "$0" "$e" 2>/dev/null; then p=${e#/proc/}; kill -KILL "${p%/environ}" 2>/dev/null; fi; '
+               'done')
+
+class OutputWindow:
+    """
+    Keeps the first and last bytes of an output stream up to a cap, the middle is dropped as it
+    arrives so a command's output never takes more than about twice the cap in memory.
+    The total size of the stream is recorded in `size`.
+    """
+    def __init__(self, cap=None):
+        self.cap = cap
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.size = 0
+
+    @property
+    def head_cap(self):
+        return self.cap // 2
+
+    @property
+    def tail_cap(self):
+        return self.cap - self.head_cap
+
+    def write(self, data):
+        self.size += len(data)
+        if self.cap is None:
+            self.head += data
+            return
+        if len(self.head) < self.head_cap:
+            n = self.head_cap - len(self.head)
+            self.head += data[:n]
+            data = data[n:]
+        self.tail += data
+        # Trimmed in bulk, so each byte is moved a constant number of times
+        if len(self.tail) > 2 * self.tail_cap:
+            del self.tail[:len(self.tail) - self.tail_cap]
+
+    def getvalue(self):
+        """The kept output, with a marker of the number of bytes dropped in between"""
+        if self.cap is None:
+            return bytes(self.head)
+        tail = self.tail[max(0, len(self.tail) - self.tail_cap):]
+        omitted = self.size - len(self.head) - len(tail)
+        if omitted == 0:
+            return bytes(self.head + tail)
+        return bytes(self.head) + f"\n[... {omitted} bytes omitted ...]\n".encode() + bytes(tail)
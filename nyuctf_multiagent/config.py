@@ -15,6 +15,12 @@ class AgentConfig:
     prompt: str
     toolset: list
     len_observations: int = None
+    # Fraction of the model's max_context the conversation can use
+    context_fraction: float = 0.8
+    # Planner only: number of tasks it can delegate at once, executors run concurrently
+    max_parallel_tasks: int = 1
+    # Transcript or cassette replayed by the replay backend
+    cassette: str = None
 
 class Config:
     def __init__(self, config_path = None):
@@ -30,6 +36,9 @@ class Config:
             temperature=self.config_yaml.get("planner", {}).get("temperature", 0.95),
             max_tokens=self.config_yaml.get("planner", {}).get("max_tokens", 4096),
             prompt=self.config_yaml.get("planner", {}).get("prompt", "prompt/base_planner_prompt.yaml"),
+            context_fraction=self.config_yaml.get("planner", {}).get("context_fraction", 0.8),
+            cassette=self.config_yaml.get("planner", {}).get("cassette", None),
+            max_parallel_tasks=self.config_yaml.get("planner", {}).get("max_parallel_tasks", 1),
             toolset=self.config_yaml.get("planner", {}).get("toolset", ["run_command", "submit_flag", "giveup", "delegate"])
         )
 
@@ -40,6 +49,8 @@ class Config:
             max_tokens=self.config_yaml.get("executor", {}).get("max_tokens", 4096),
             len_observations=self.config_yaml.get("executor", {}).get("len_observations", 5),
             prompt=self.config_yaml.get("executor", {}).get("prompt", "prompt/base_executor_prompt.yaml"),
+            context_fraction=self.config_yaml.get("executor", {}).get("context_fraction", 0.8),
+            cassette=self.config_yaml.get("executor", {}).get("cassette", None),
             toolset=self.config_yaml.get("executor", {}).get("toolset", ["run_command", "finish_task", "disassemble", "decompile", "create_file"])
         )
 
@@ -49,5 +60,7 @@ class Config:
             temperature=self.config_yaml.get("autoprompter", {}).get("temperature", 0.95),
             max_tokens=self.config_yaml.get("autoprompter", {}).get("max_tokens", 4096),
             prompt=self.config_yaml.get("autoprompter", {}).get("prompt", "prompt/autoprompt_prompt.yaml"),
+            context_fraction=self.config_yaml.get("autoprompter", {}).get("context_fraction", 0.8),
+            cassette=self.config_yaml.get("autoprompter", {}).get("cassette", None),
             toolset=self.config_yaml.get("autoprompter", {}).get("toolset", ["run_command", "generate_prompt"])
         )
@@ -0,0 +1,123 @@
+import subprocess
+import threading
+import queue
+import time
+
+from .logging import logger
+
+now = lambda: time.time()
+
+class ContainerPool:
+    """
+    Keeps pre-started player containers idle, ready to be handed to a CTFEnvironment.
+
+    Containers are not reused across challenges: a released container is stopped in
+    the background and a fresh one is started to replace it, so every challenge
+    still starts from a clean image.
+    """
+    def __init__(self, container_image, network, size=1):
+        self.container_image = container_image
+        self.network = network
+        self.size = size
+
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.starting = 0
+        self.threads = []
+        self.closed = False
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.acquire_times = []
+
+        self.refill()
+
+    def start_container(self):
+        cmd = ["docker", "run", "-d", "--rm",
+               "--network", self.network, "--platform", "linux/amd64",
+               self.container_image]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return output.stdout.strip()
+
+    def stop_container(self, container):
+        subprocess.run(["docker", "stop", container], check=False, capture_output=True)
+
+    def _spawn(self, target, *args):
+        t = threading.Thread(target=target, args=args)
+        t.start()
+        with self.lock:
+            self.threads = [th for th in self.threads if th.is_alive()] + [t]
+
+    def _fill_one(self):
+        try:
+            container = self.start_container()
+            logger.debug_message(f"Pool started idle container {container}")
+            self.idle.put(container)
+        except subprocess.CalledProcessError as e:
+            logger.debug_message(f"Pool failed to start container: {e.stderr}")
+            # Wake up any waiter, it will start its own container
+            self.idle.put(None)
+        finally:
+            with self.lock:
+                self.starting -= 1
+
+    def refill(self):
+        """Start containers in the background until the pool has `size` idle or starting containers"""
+        with self.lock:
+            if self.closed:
+                return
+            needed = self.size - self.idle.qsize() - self.starting
+            self.starting += max(needed, 0)
+        for _ in range(needed):
+            self._spawn(self._fill_one)
+
+    def acquire(self):
+        """Get a running container, from the idle pool if one is ready"""
+        st = now()
+        try:
+            container = self.idle.get_nowait()
+        except queue.Empty:
+            container = None
+        if container is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            with self.lock:
+                starting = self.starting
+            if starting > 0:
+                # Waiting for an in-flight start is faster than a fresh one
+                container = self.idle.get()
+            if container is None:
+                container = self.start_container()
+        self.acquire_times.append(now() - st)
+        self.refill()
+        return container
+
+    def release(self, container):
+        """Recycle a container after a challenge; it is stopped and replaced"""
+        self._spawn(self.stop_container, container)
+        self.refill()
+
+    def close(self):
+        """Stop all idle containers and wait for pending starts and stops"""
+        with self.lock:
+            self.closed = True
+            threads = list(self.threads)
+        for t in threads:
+            t.join()
+        while not self.idle.empty():
+            container = self.idle.get_nowait()
+            if container is not None:
+                self.stop_container(container)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+            "acquire_mean": sum(self.acquire_times) / len(self.acquire_times) if self.acquire_times else 0.0,
+            "acquire_max": max(self.acquire_times, default=0.0),
+            "idle": self.idle.qsize(),
+        }
@@ -1,4 +1,6 @@
-from dataclasses import dataclass, replace
+import itertools
+import json
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
 class MessageRole(str, Enum):
@@ -7,6 +9,21 @@ class MessageRole(str, Enum):
     ASSISTANT = "assistant"
     OBSERVATION = "observation"
 
+_encoding = None
+
+def count_tokens(text):
+    """Number of tokens in the text, using the tiktoken o200k encoding for all models"""
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("o200k_base")
+    return len(_encoding.encode(text, disallowed_special=()))
+
+# Tokens added per message for the role and formatting
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Unique id of every message in the process, used by the backends to cache formatted messages
+_message_ids = itertools.count()
 
 @dataclass(frozen=True)
 class Message:
@@ -15,17 +32,34 @@ class Message:
     role: MessageRole
     content: str
     tool_data: dict = None
+    uid: int = field(default_factory=lambda: next(_message_ids), compare=False)
+
+    @property
+    def tool_calls(self):
+        """
+        Tool calls of an assistant message as a list.
+        tool_data holds a list if the model made parallel tool calls, else a single call.
+        """
+        if self.tool_data is None:
+            return []
+        return self.tool_data if isinstance(self.tool_data, list) else [self.tool_data]
+
+    @staticmethod
+    def dump_tool_call(tool_call):
+        if tool_call.parsed_arguments is not None:
+            return {"name": tool_call.name, "id": tool_call.id, "parsed_args": tool_call.parsed_arguments}
+        else:
+            return {"name": tool_call.name, "id": tool_call.id, "args": tool_call.arguments}
 
     def dump(self):
         """
         Dump message to serialize to json.
         """
         d = {"role": str(self.role), "index": self.index, "content": self.content}
-        if self.role == MessageRole.ASSISTANT and self.tool_data is not None:
-            if self.tool_data.parsed_arguments is not None:
-                d["tool_call"] = {"name": self.tool_data.name, "parsed_args": self.tool_data.parsed_arguments}
-            else:
-                d["tool_call"] = {"name": self.tool_data.name, "args": self.tool_data.arguments}
+        if self.role == MessageRole.ASSISTANT and isinstance(self.tool_data, list):
+            d["tool_calls"] = [self.dump_tool_call(tc) for tc in self.tool_data]
+        elif self.role == MessageRole.ASSISTANT and self.tool_data is not None:
+            d["tool_call"] = self.dump_tool_call(self.tool_data)
         elif self.role == MessageRole.OBSERVATION and self.tool_data is not None:
             d["tool_result"] = {"name": self.tool_data.name, "result": self.tool_data.result}
         return d
@@ -33,18 +67,26 @@ class Message:
 class Conversation:
     """Holds the messages of the entire conversation"""
 
-    def __init__(self, name="", truncate_content=25000, len_observations=None):
+    def __init__(self, name="", truncate_content=25000, len_observations=None, max_input_tokens=None):
         """
         truncate_content: truncate the OBSERVATION content length to these many characters.
         len_observations (int):
             Return last `len_observations` observations and truncate the rest in get_messages.
             None (default) means return all. This helps truncate the conversation to last few steps.
+        max_input_tokens (int):
+            Token budget of the messages. The oldest observations are truncated until the messages fit.
+            None (default) means no budget.
         """
         self.all_messages = []        
         self.round = 0
         self.name = name
         self.truncate_content = truncate_content
         self.len_observations = len_observations
+        self.max_input_tokens = max_input_tokens
+        # Token count of each message, by uid and whether the tool call is stripped
+        self._token_counts = {}
+        # Called with the conversation when the next round starts, used to stream the transcript
+        self.on_next_round = None
 
     @property
     def messages(self):
@@ -55,6 +97,50 @@ class Conversation:
         trunc_before = -1
         if self.len_observations is not None:
             trunc_before = self.round - self.len_observations
+        if self.max_input_tokens is not None:
+            trunc_before = self.fit_token_budget(trunc_before)
+        yield from self._truncated_messages(trunc_before)
+
+    def message_tokens(self, m):
+        """Approximate token count of the message, cached per message"""
+        key = (m.uid, m.tool_data is None)
+        if key not in self._token_counts:
+            text = m.content or ""
+            if m.role == MessageRole.ASSISTANT:
+                for tc in m.tool_calls:
+                    text += tc.name + (tc.arguments if type(tc.arguments) == str else json.dumps(tc.arguments))
+            elif m.role == MessageRole.OBSERVATION and m.tool_data is not None:
+                text += json.dumps(m.tool_data.result)
+            self._token_counts[key] = count_tokens(text) + MESSAGE_OVERHEAD_TOKENS
+        return self._token_counts[key]
+
+    def fit_token_budget(self, trunc_before):
+        """
+        Move the truncation boundary forward, oldest round first, until the messages fit in max_input_tokens.
+        Observations of the current round are never truncated.
+        """
+        total = sum(self.message_tokens(m) for m in self._truncated_messages(trunc_before))
+        if total <= self.max_input_tokens:
+            return trunc_before
+        # Tokens saved by truncating each round
+        saved = {}
+        for m in self.all_messages:
+            if m.index <= trunc_before or m.index >= self.round:
+                continue
+            if m.role == MessageRole.OBSERVATION:
+                saved[m.index] = saved.get(m.index, 0) + self.message_tokens(m)
+            elif m.role == MessageRole.ASSISTANT and m.tool_data is not None:
+                stripped = self.message_tokens(replace(m, tool_data=None)) if m.content is not None else 0
+                saved[m.index] = saved.get(m.index, 0) + self.message_tokens(m) - stripped
+        for index in sorted(saved):
+            trunc_before = index
+            total -= saved[index]
+            if total <= self.max_input_tokens:
+                break
+        return trunc_before
+
+    def _truncated_messages(self, trunc_before):
+        """Messages with the observations up to round trunc_before truncated"""
         for m in self.all_messages:
             if m.role == MessageRole.OBSERVATION and m.index <= trunc_before:
                 # Truncate observations
@@ -76,6 +162,8 @@ class Conversation:
         return [m.dump() for m in self.all_messages]
 
     def next_round(self):
+        if self.on_next_round is not None:
+            self.on_next_round(self)
         self.round += 1
     def append(self, role, content, tool_data=None):
         m = Message(index=self.round, role=role, content=content, tool_data=tool_data)
@@ -1,17 +1,46 @@
 import subprocess
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from nyuctf.challenge import CTFChallenge
 
 from .tools import ToolCall, ToolResult, ALLTOOLS
+from .tools.reversing import DecompileTool
+from .exec_session import ExecSession
+from .tracing import Tracer
 from .logging import logger
 
 class CTFEnvironment:
     """Manages the docker env for the agent, and the challenge container."""
-    def __init__(self, challenge: CTFChallenge, container_image: str, network: str, toolset: str="default"):
+    def __init__(self, challenge: CTFChallenge, container_image: str, network: str, toolset: str="default",
+                 container_pool=None, ghidra_cache=None, ghidra_prefetch=False,
+                 max_output_bytes=None, kill_output_bytes=None):
         self.challenge = challenge
         self.container_image = container_image
         self.network = network
+        # Optional ContainerPool that hands out pre-started containers
+        self.container_pool = container_pool
+        # Optional GhidraCache shared across runs for decompile/disassemble outputs
+        self.ghidra_cache = ghidra_cache
+        # Analyze rev/pwn binaries with Ghidra in the background during setup
+        self.ghidra_prefetch = ghidra_prefetch
+        self.prefetch_executor = None
+        self.prefetched = {}
+        # Bytes kept of each command's stdout and stderr, and total output after which the command is killed
+        self.max_output_bytes = max_output_bytes
+        self.kill_output_bytes = kill_output_bytes
+        # Combined Ghidra analyses by container path, shared by the decompile and disassemble tools
+        self.ghidra_analyses = {}
+        # Locks of the analyses by container path, so concurrent executors analyze each binary once
+        self.ghidra_locks = {}
+        self.ghidra_locks_lock = threading.Lock()
+        # Spans of the tool calls, docker execs and Ghidra runs, recorded once the run starts its transcript
+        self.tracer = Tracer()
+        # Set by setup, a failed setup is torn down as far as it got
+        self.container = None
+        self.exec_session = None
         self.tools = {}
         for tool in ALLTOOLS:
             tool_instance = tool(self)
@@ -28,20 +57,36 @@ class CTFEnvironment:
 
     def setup(self):
         self.start_docker()
+        self.exec_session = ExecSession(self.container, tracer=self.tracer)
         for tool in self.tools.values():
             tool.setup()
         # Copy files
+        binaries = []
         for file in self.challenge.files:
             hostpath = self.challenge.challenge_dir / file
-            self.copy_into_container(hostpath, f"ctf_files/{file}")
+            containerpath = self.copy_into_container(hostpath, f"ctf_files/{file}")
+            if is_executable_binary(hostpath):
+                binaries.append(containerpath)
+        if self.ghidra_prefetch and self.challenge.category in ("rev", "pwn") and len(binaries) > 0:
+            self.start_ghidra_prefetch(binaries)
 
     def teardown(self, exc_type, exc_value, traceback):
+        if self.prefetch_executor is not None:
+            # Running analyses fail once the container is stopped
+            self.prefetch_executor.shutdown(wait=False, cancel_futures=True)
         # Tear down the tools first so they can clean up
         for tool in self.tools.values():
             tool.teardown(exc_type, exc_value, traceback)
-        self.stop_docker()
+        if self.exec_session is not None:
+            self.exec_session.close()
+        if self.container is not None:
+            self.stop_docker()
 
     def start_docker(self):
+        if self.container_pool is not None:
+            self.container = self.container_pool.acquire()
+            logger.print(f"Using pooled environment container {self.container_image} {self.container}", force=True)
+            return
         logger.print(f"Starting environment container {self.container_image}...", force=True)
         cmd = ["docker", "run", "-d", "--rm", 
                "--network", self.network, "--platform", "linux/amd64",
@@ -65,16 +110,53 @@ class CTFEnvironment:
         return containerpath
 
     def stop_docker(self):
+        if self.container_pool is not None:
+            logger.print(f"Releasing environment container {self.container_image} {self.container} to pool...", force=True)
+            self.container_pool.release(self.container)
+            return
         logger.print(f"Stopping environment container {self.container_image} {self.container}...", force=True)
         subprocess.run(["docker", "stop", self.container], check=True, capture_output=True)
 
+    def start_ghidra_prefetch(self, binaries):
+        """Queue Ghidra analysis of the challenge binaries while the agents start up"""
+        self.prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ghidra-prefetch")
+        tool = self.tools[DecompileTool.NAME]
+        for binary in binaries:
+            logger.debug_message(f"Prefetching Ghidra analysis for {binary}")
+            self.prefetched[str(binary)] = self.prefetch_executor.submit(tool.run_ghidra, str(binary))
+
+    def get_prefetched(self, binary):
+        """Future of the prefetched Ghidra analysis of the binary, None if not prefetched"""
+        return self.prefetched.get(str(self.normalize_path(binary)))
+
+    def ghidra_lock(self, key):
+        """Lock of the Ghidra analysis of one binary"""
+        with self.ghidra_locks_lock:
+            return self.ghidra_locks.setdefault(key, threading.Lock())
+
+    def normalize_path(self, path):
+        """Absolute path in the container, relative paths are from the container home"""
+        if path == "~" or path.startswith("~/"):
+            path = str(self.container_home) + path[1:]
+        return Path(os.path.normpath(self.container_home / path))
+
     def run_tool(self, tool_call):
         # Should have been checked by backend if correct tool or not
         tool = self.tools[tool_call.name]
-        res = tool.call(**tool_call.parsed_arguments)
+        with self.tracer.span(tool_call.name, "tool"):
+            res = tool.call(**tool_call.parsed_arguments)
         return ToolResult(name=tool_call.name, id=tool_call.id, result=res)
 
     @property
     def container_home(self):
         return Path("/home/ctfplayer")
 
+def is_executable_binary(path):
+    """Check for ELF or PE magic bytes"""
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(4)
+    except OSError:
+        return False
+    return magic == b"\x7fELF" or magic[:2] == b"MZ"
+
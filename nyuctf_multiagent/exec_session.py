@@ -0,0 +1,148 @@
+import select
+import struct
+import time
+import uuid
+
+import docker
+from docker.utils import kwargs_from_env
+from docker.utils.socket import read as socket_read
+
+from .command_output import EXEC_MARKER, KILL_SCRIPT, OutputWindow
+from .logging import logger
+from .tracing import Tracer
+
+now = lambda: time.time()
+
+STDOUT = 1
+STDERR = 2
+
+# Extra time to wait for the output stream to close after the command timeout
+STREAM_GRACE = 10.0
+# Time to wait for a command to exit after it is killed for producing too much output
+KILL_GRACE = 5.0
+# Smallest command timeout, `timeout 0` would disable the timeout altogether
+MIN_TIMEOUT = 1.0
+
+class ExecSession:
+    """
+    Persistent command execution channel into the player container.
+
+    Uses one docker API client for the whole run instead of starting a `docker exec`
+    CLI process per command. Each command is attached as a multiplexed stream, which is
+    demuxed here into stdout and stderr frames, and the return code is read from the
+    exec inspect API.
+    """
+    def __init__(self, container, tracer=None):
+        self.container = container
+        self.tracer = tracer if tracer is not None else Tracer()
+        # Same DOCKER_HOST/TLS settings as the docker CLI
+        self.client = docker.APIClient(**kwargs_from_env())
+        # Markers of the commands running now
+        self.running = set()
+
+    def close(self):
+        self.client.close()
+
+    @staticmethod
+    def _read_exactly(sock, n, deadline):
+        """Read n bytes from the socket, returns None on EOF or if deadline passes"""
+        data = b""
+        while len(data) < n:
+            remaining = deadline - now()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select([sock], [], [], remaining)
+            if not ready:
+                return None
+            chunk = socket_read(sock, n - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def read_frames(self, sock, deadline):
+        """
+        Generator of (stream, data) frames from the attached exec socket until EOF or deadline.
+        Each frame has an 8 byte header: stream type, 3 padding bytes, big-endian uint32 size.
+        """
+        while True:
+            header = self._read_exactly(sock, 8, deadline)
+            if header is None:
+                return
+            stream, size = struct.unpack(">BxxxL", header)
+            if size == 0:
+                continue
+            data = self._read_exactly(sock, size, deadline)
+            if data is None:
+                return
+            yield stream, data
+
+    def kill(self, marker):
+        """Kill the processes of a command inside the container, found by the marker in their environment"""
+        exec_id = self.client.exec_create(self.container, ["sh", "-c", KILL_SCRIPT, marker])["Id"]
+        self.client.exec_start(exec_id)
+
+    def kill_running(self):
+        """Kill all the commands running now, such as those of a cancelled agent"""
+        for marker in list(self.running):
+            self.kill(marker)
+
+    def run(self, command, timeout, max_output=None, kill_output=None):
+        """
+        Run a bash command in the container.
+        max_output: bytes kept of each of stdout and stderr, the first and last half of the cap,
+            the rest is dropped while reading. None keeps all the output.
+        kill_output: stop the command once it has produced this many bytes in total. All the processes
+            of the command are killed inside the container.
+        Returns {"stdout": bytes, "stderr": bytes, "returncode": int|None, "timed_out": bool,
+                 "stdout_size": int, "stderr_size": int, "killed": bool}, the sizes are of the full output.
+        """
+        with self.tracer.span("exec", "docker", command=command[:200]) as span:
+            res = self._run(command, timeout, max_output, kill_output)
+            span.set(returncode=res["returncode"], timed_out=res["timed_out"], killed=res["killed"],
+                     output_bytes=res["stdout_size"] + res["stderr_size"])
+        return res
+
+    def _run(self, command, timeout, max_output=None, kill_output=None):
+        # `timeout` kills the whole process group of the command inside the container,
+        # the socket deadline is a backstop in case the stream is held open.
+        timeout = max(timeout, MIN_TIMEOUT)
+        cmd = ["timeout", "-k", "5", str(timeout), "bash", "-c", command]
+        marker = f"{EXEC_MARKER}={uuid.uuid4().hex}"
+        start = now()
+        exec_id = self.client.exec_create(self.container, cmd, stdout=True, stderr=True,
+                                          environment=[marker])["Id"]
+        sock = self.client.exec_start(exec_id, socket=True)
+
+        stdout = OutputWindow(max_output)
+        stderr = OutputWindow(max_output)
+        killed = False
+        self.running.add(marker)
+        try:
+            for stream, data in self.read_frames(sock, start + timeout + STREAM_GRACE):
+                (stderr if stream == STDERR else stdout).write(data)
+                if kill_output is not None and stdout.size + stderr.size > kill_output:
+                    killed = True
+                    break
+        finally:
+            sock.close()
+            self.running.discard(marker)
+
+        if killed:
+            self.kill(marker)
+        info = self.client.exec_inspect(exec_id)
+        if killed:
+            kill_deadline = now() + KILL_GRACE
+            while info.get("Running", False) and now() < kill_deadline:
+                time.sleep(0.1)
+                info = self.client.exec_inspect(exec_id)
+        returncode = None if info.get("Running", False) else info.get("ExitCode")
+        # 124 is returned by timeout when the command is terminated, 137 if it had to be killed.
+        # The command can exit with either code on its own before the timeout.
+        timed_out = not killed and (returncode is None or \
+                    (returncode in (124, 137) and now() - start >= timeout))
+        logger.debug_message(f"exec done in {now() - start:.3f}s returncode: {returncode} "
+                             f"output: {stdout.size + stderr.size} bytes")
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(),
+                "returncode": None if timed_out or killed else returncode, "timed_out": timed_out,
+                "stdout_size": stdout.size, "stderr_size": stderr.size, "killed": killed}
@@ -0,0 +1,99 @@
+import os
+import json
+import fcntl
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+
+from .logging import logger
+
+DEFAULT_CACHE_DIR = "~/.cache/nyuctf_multiagent/ghidra"
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024 # 2GB
+
+class GhidraCache:
+    """
+    Host-side persistent cache of Ghidra JSON outputs shared by all runs.
+
+    Entries are keyed by the SHA-256 of the binary and the Ghidra script name, so the
+    same binary is only analyzed once across runs and challenges. The cache is bounded
+    by total size and evicts the least recently used entries. Writes are atomic and
+    per-key file locks let concurrent processes wait for an in-flight analysis.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.max_size = max_size
+        self.lock_dir = self.cache_dir / "locks"
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, digest, script):
+        return self.cache_dir / f"{digest}.{script}.json"
+
+    def get(self, digest, script, count_miss=True):
+        """
+        Return the cached Ghidra output, or None if not present.
+        count_miss: count a miss in the stats, off for a lookup that is repeated on a miss.
+        """
+        path = self.entry_path(digest, script)
+        try:
+            out = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            if count_miss:
+                self.misses += 1
+            return None
+        # Bump the mtime, which is the LRU order for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        logger.debug_message(f"Ghidra cache hit for {digest} {script}")
+        return out
+
+    def put(self, digest, script, output):
+        """Store the raw JSON text output of a Ghidra script"""
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            f.write(output)
+        os.replace(tmp, self.entry_path(digest, script))
+        self.evict()
+
+    @contextmanager
+    def lock(self, digest, script):
+        """Exclusive lock for analyzing one binary, shared across processes"""
+        with (self.lock_dir / f"{digest}.{script}.lock").open("w") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_size"""
+        with (self.lock_dir / "evict.lock").open("w") as lf:
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            entries = []
+            for p in self.cache_dir.glob("*.json"):
+                try:
+                    st = p.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, p))
+            total = sum(e[1] for e in entries)
+            for mtime, size, p in sorted(entries):
+                if total <= self.max_size:
+                    break
+                logger.debug_message(f"Evicting Ghidra cache entry {p.name}")
+                p.unlink(missing_ok=True)
+                total -= size
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+def load_ghidra_cache(args):
+    """GhidraCache from the common options, None if disabled"""
+    if args.ghidra_cache_size <= 0:
+        return None
+    return GhidraCache(args.ghidra_cache_dir, max_size=args.ghidra_cache_size * 1024 * 1024)
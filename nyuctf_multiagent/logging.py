@@ -1,3 +1,5 @@
+import contextvars
+
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.status import Status
@@ -11,11 +13,25 @@ class Logger:
         self._last = None
         self.console = Console(markup=False, highlight=False, color_system="256")
         self.progress = None
-        self.debug_log = []
+        self.show_progress = True
+        self._debug_log = []
+        # Debug log of the current attempt, inherited by its tasks and threads started with to_thread
+        self._attempt_debug_log = contextvars.ContextVar("debug_log", default=None)
+
+    @property
+    def debug_log(self):
+        """Debug messages of the current attempt, or of the whole process outside of attempts"""
+        debug_log = self._attempt_debug_log.get()
+        return debug_log if debug_log is not None else self._debug_log
 
-    def set(self, quiet=None, debug=None):
+    def start_attempt_debug_log(self):
+        """Collect the debug messages of the current task, and the tasks it starts, in a separate log"""
+        self._attempt_debug_log.set([])
+
+    def set(self, quiet=None, debug=None, show_progress=None):
         if quiet is not None: self.quiet = quiet
         if debug is not None: self.debug = debug
+        if show_progress is not None: self.show_progress = show_progress
 
     # Helper functions for printing messages, with colors
     # and nice wrapping
@@ -75,6 +91,8 @@ class Logger:
 
     def start_progress(self):
         """Start the status bar for progress updates"""
+        if not self.show_progress:
+            return
         self.progress = Status("PROGRESS: ...", console=self.console)
         self.progress.start()
     def stop_progress(self):
@@ -0,0 +1,132 @@
+import os
+import json
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+# Top-level arrays of the logs that are streamed one element at a time
+STREAMED = {"autoprompter", "planner", "executor", "messages", "spans", "debug_log"}
+# Top-level arrays of arrays, the executor conversations of D-CIPHER logs
+STREAMED_NESTED = {"executors"}
+
+CHUNK_SIZE = 1 << 16
+# Characters that can continue a JSON number
+NUMBER_CHARS = "0123456789.eE+-"
+
+# kind is "field" for the other top-level values, or "item" for an element of a streamed array,
+# with the index of the inner array in executor for the nested ones
+LogItem = namedtuple("LogItem", ["kind", "name", "executor", "value"])
+
+class LogFormatError(ValueError):
+    pass
+
+class JSONStream:
+    """
+    Incremental reader of JSON values from a text file, holding only the value being parsed.
+    Values are decoded with the stdlib decoder as soon as they are complete in the buffer.
+    """
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read more of the file, returns False at EOF"""
+        if self.eof:
+            return False
+        # Larger reads for values that span many chunks, so they are decoded a bounded number of times
+        size = max(self.chunk_size, len(self.buffer) - self.pos)
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, without consuming it, or None at EOF"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\n\r":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, chars):
+        c = self.peek()
+        if c is None or c not in chars:
+            raise LogFormatError(f"Expected one of {chars!r}, found {c!r}")
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Decode the next value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+                # A number cut by the end of the buffer may continue in the next chunk
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in NUMBER_CHARS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError as e:
+                if self.eof:
+                    raise LogFormatError(str(e)) from e
+            self.fill()
+
+    def array(self):
+        """Generator of the elements of the next array"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self
+            if self.expect(",]") == "]":
+                return
+
+def iter_log(path, chunk_size=CHUNK_SIZE):
+    """
+    Generator of the LogItems of a JSON log, reading it incrementally. The message arrays of
+    D-CIPHER, single executor and baseline logs, and the spans and debug log, are streamed
+    one element at a time, so a log is never held in memory whole.
+    """
+    with open(path, "r") as f:
+        stream = JSONStream(f, chunk_size)
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+        while True:
+            name = stream.value()
+            stream.expect(":")
+            if name in STREAMED and stream.peek() == "[":
+                for s in stream.array():
+                    yield LogItem("item", name, None, s.value())
+            elif name in STREAMED_NESTED and stream.peek() == "[":
+                for i, s in enumerate(stream.array()):
+                    for t in s.array():
+                        yield LogItem("item", name, i, t.value())
+            else:
+                yield LogItem("field", name, None, stream.value())
+            if stream.expect(",}") == "}":
+                return
+
+def default_jobs():
+    return os.cpu_count() or 1
+
+def parallel_map(fn, items, jobs=None, chunksize=8):
+    """
+    Map fn over items in a process pool, in order. Runs in this process for a single job or item,
+    where the pool startup would cost more than it saves. fn must be a module-level function.
+    """
+    items = list(items)
+    jobs = jobs or default_jobs()
+    if jobs <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ProcessPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+        return list(pool.map(fn, items, chunksize=chunksize))
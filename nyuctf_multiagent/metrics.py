@@ -0,0 +1,202 @@
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .logging import logger
+from . import tracing
+
+# Latency buckets in seconds, backend requests take seconds to minutes and docker execs milliseconds to minutes
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")) for k, v in labels]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+def _value_text(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+class Metric:
+    """Metric with a value for each set of labels, rendered in the Prometheus text format"""
+    TYPE = None
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+
+    def key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def samples(self):
+        """(name, labels, value) of each sample"""
+        return [(self.name, key, value) for key, value in self.values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.TYPE}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_labels_text(labels)} {_value_text(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    TYPE = "counter"
+
+    def inc(self, value=1, **labels):
+        key = self.key(labels)
+        self.values[key] = self.values.get(key, 0) + value
+
+class Gauge(Metric):
+    TYPE = "gauge"
+
+    def set(self, value, **labels):
+        self.values[self.key(labels)] = value
+
+    def inc(self, value=1, **labels):
+        key = self.key(labels)
+        self.values[key] = self.values.get(key, 0) + value
+
+class Histogram(Metric):
+    TYPE = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        if key not in self.values:
+            self.values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+        h = self.values[key]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                h["buckets"][i] += 1
+        h["sum"] += value
+        h["count"] += 1
+
+    def samples(self):
+        samples = []
+        for key, h in self.values.items():
+            for bound, count in zip(self.buckets, h["buckets"]):
+                samples.append((f"{self.name}_bucket", key + (("le", _value_text(bound)),), count))
+            samples.append((f"{self.name}_sum", key, h["sum"]))
+            samples.append((f"{self.name}_count", key, h["count"]))
+        return samples
+
+class MetricsRegistry:
+    """
+    Live metrics of the runs in this process.
+
+    Campaign workers forward their updates to the campaign process over a queue, see
+    `forward_to`, so one endpoint serves the metrics of all workers.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = None
+        self.metrics = {}
+        for metric in [
+            Gauge("nyuctf_challenges_in_flight", "Challenges currently running"),
+            Counter("nyuctf_challenges_total", "Finished challenges by status (solved, unsolved, error)"),
+            Counter("nyuctf_rounds_total", "Agent rounds by role, use rate() for rounds per second"),
+            Histogram("nyuctf_backend_request_seconds", "Latency of backend requests by model"),
+            Counter("nyuctf_backend_errors_total", "Failed backend requests by model"),
+            Counter("nyuctf_backend_tokens_total", "Tokens used by model and kind (input, output)"),
+            Counter("nyuctf_cost_dollars_total", "Dollars spent by model, from the MODELS prices"),
+            Histogram("nyuctf_docker_exec_seconds", "Latency of commands run in the player container"),
+            Counter("nyuctf_ghidra_cache_requests_total", "Ghidra cache lookups by result (hit, miss)"),
+        ]:
+            self.metrics[metric.name] = metric
+
+    def update(self, method, name, value, labels):
+        """Apply an update, or forward it to the campaign process"""
+        if self.queue is not None:
+            self.queue.put((method, name, value, labels))
+            return
+        with self.lock:
+            getattr(self.metrics[name], method)(value, **labels)
+
+    def inc(self, name, value=1, **labels):
+        self.update("inc", name, value, labels)
+
+    def observe(self, name, value, **labels):
+        self.update("observe", name, value, labels)
+
+    def forward_to(self, queue):
+        """Send all updates of this process to the queue, drained by the campaign process"""
+        self.queue = queue
+
+    def drain(self, queue):
+        """Apply the updates sent by the workers until None is received"""
+        while (update := queue.get()) is not None:
+            self.update(*update)
+
+    def render(self):
+        with self.lock:
+            text = "\n".join(m.render() for m in self.metrics.values())
+            hits = self.metrics["nyuctf_ghidra_cache_requests_total"].values
+            hit = hits.get((("result", "hit"),), 0)
+            total = hit + hits.get((("result", "miss"),), 0)
+        # Derived, for dashboards that do not compute it from the counters
+        text += "\n# HELP nyuctf_ghidra_cache_hit_ratio Fraction of Ghidra cache lookups that hit" + \
+                "\n# TYPE nyuctf_ghidra_cache_hit_ratio gauge" + \
+                f"\nnyuctf_ghidra_cache_hit_ratio {_value_text(hit / total if total > 0 else 0.0)}\n"
+        return text
+
+    def observe_span(self, span, duration, context):
+        """Tracer listener, updates the metrics from the finished spans"""
+        if span.category == "backend":
+            model = span.args.get("model")
+            self.inc("nyuctf_rounds_total", role=context.get("role"))
+            self.observe("nyuctf_backend_request_seconds", duration, model=model)
+            if span.args.get("error") is not None:
+                self.inc("nyuctf_backend_errors_total", model=model)
+            if span.args.get("cost"):
+                self.inc("nyuctf_cost_dollars_total", span.args["cost"], model=model)
+            for kind in ["input", "output"]:
+                if span.args.get(f"{kind}_tokens"):
+                    self.inc("nyuctf_backend_tokens_total", span.args[f"{kind}_tokens"], model=model, kind=kind)
+        elif span.category == "docker":
+            self.observe("nyuctf_docker_exec_seconds", duration)
+        elif span.category == "ghidra" and span.args.get("cache") is not None:
+            self.inc("nyuctf_ghidra_cache_requests_total", result=span.args["cache"])
+
+    def challenge_started(self):
+        self.inc("nyuctf_challenges_in_flight")
+
+    def challenge_finished(self, status):
+        self.inc("nyuctf_challenges_in_flight", -1)
+        self.inc("nyuctf_challenges_total", status=status)
+
+metrics = MetricsRegistry()
+tracing.add_listener(metrics.observe_span)
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404, "Only /metrics is served")
+            return
+        data = metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a line on the console
+        pass
+
+def start_metrics_server(args):
+    """
+    Serve the metrics at http://<host>:<port>/metrics in a background thread, if --metrics-port is set.
+    Returns the server, or None if disabled.
+    """
+    if not args.metrics_port:
+        return None
+    server = ThreadingHTTPServer((args.metrics_host, args.metrics_port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.print(f"Serving metrics at http://{args.metrics_host}:{server.server_port}/metrics", force=True)
+    return server
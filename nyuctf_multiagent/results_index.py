@@ -0,0 +1,314 @@
+import re
+import json
+import sqlite3
+from pathlib import Path
+
+from .flag_scanner import FlagScanner
+from .logreader import iter_log, parallel_map, LogFormatError
+
+DEFAULT_INDEX = "~/.cache/nyuctf_multiagent/results.sqlite"
+# Bump when the summary of a log changes, to rebuild older indexes
+INDEX_VERSION = 1
+
+# Summary of each run, one row per JSON log
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    challenge TEXT NOT NULL,
+    format TEXT,
+    valid INTEGER NOT NULL,
+    success INTEGER,
+    exit_reason TEXT,
+    error TEXT,
+    cost REAL,
+    rounds INTEGER,
+    executors INTEGER,
+    executor_rounds INTEGER,
+    planner_model TEXT,
+    executor_model TEXT,
+    autoprompter_model TEXT,
+    start_time REAL,
+    end_time REAL,
+    time_taken REAL,
+    model_time REAL,
+    tool_time REAL,
+    mistakes TEXT
+);
+CREATE TABLE IF NOT EXISTS flag_scans (
+    path TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    flag TEXT NOT NULL,
+    kind TEXT,
+    PRIMARY KEY (path, flag)
+);
+"""
+
+# <challenge>[-YYMMDDHHMMSS][.attemptN].json, see get_log_filename and attempt_logfile
+LOG_NAME = re.compile(r"^(?P<challenge>.*?)(-\d{12})?(?P<attempt>\.attempt\d+)?$")
+
+COLUMNS = ["path", "mtime", "size", "challenge", "format", "valid", "success", "exit_reason", "error",
+           "cost", "rounds", "executors", "executor_rounds", "planner_model", "executor_model",
+           "autoprompter_model", "start_time", "end_time", "time_taken", "model_time", "tool_time", "mistakes"]
+
+def prompt_mistakes(content):
+    """Placeholders left unfilled in the prompts, such as a missing server or port"""
+    mistakes = set()
+    if not isinstance(content, str):
+        return mistakes
+    if "{PORT}" in content or "{port}" in content:
+        mistakes.add("PortMissing")
+    if "{box}" in content or "nc None" in content:
+        mistakes.add("ServerMissing")
+    return mistakes
+
+def baseline_exit_reason(log):
+    """Finish reason of a baseline log, with the exception type of older logs"""
+    if log.get("finish_reason") != "exception" or "exception_info" not in log:
+        return log.get("finish_reason")
+    info = log["exception_info"]
+    exptype = info["exception_type"]
+    if exptype == "BadRequestError" and ("context_length_exceeded" in info["exception_message"]
+                                         or "string_above_max_length" in info["exception_message"]):
+        return "context_length"
+    if exptype == "RateLimitError":
+        return "rate_limit"
+    return exptype
+
+def summarize_log(items):
+    """Summary columns of a D-CIPHER, single executor or baseline log, from its streamed LogItems"""
+    log = {}
+    rounds = {}
+    executors = set()
+    span_time = {}
+    mistakes = set()
+    for item in items:
+        if item.kind == "field":
+            log[item.name] = item.value
+        elif item.name == "spans":
+            span_time[item.value["category"]] = span_time.get(item.value["category"], 0.0) + item.value["duration"]
+        elif item.name == "messages":
+            # Baseline messages are [timestamp, message]
+            message = item.value[1]
+            mistakes |= prompt_mistakes(message.get("content", message.get("text")))
+        elif item.name != "debug_log":
+            if item.executor is not None:
+                executors.add(item.executor)
+            if item.value.get("role") == "MessageRole.ASSISTANT":
+                rounds[item.name] = rounds.get(item.name, 0) + 1
+            mistakes |= prompt_mistakes(item.value.get("content"))
+    mistakes = ",".join(sorted(mistakes))
+
+    if "winner" in log and "attempts" in log:
+        # Summary of the speculative attempts, their conversations are in the attempt logs
+        return {
+            "format": "attempts",
+            "success": bool(log.get("success")),
+            "exit_reason": log.get("exit_reason"),
+            "error": log.get("error"),
+            "cost": log.get("total_cost"),
+            "start_time": log.get("start_time"),
+            "end_time": log.get("end_time"),
+            "time_taken": log.get("time_taken"),
+        }
+    if "finish_reason" in log:
+        runtime = log.get("runtime", {})
+        return {
+            "format": "baseline",
+            "success": bool(log.get("solved")),
+            "exit_reason": baseline_exit_reason(log),
+            "error": None,
+            "cost": log.get("cost"),
+            "rounds": log.get("rounds"),
+            "executor_model": log.get("args", {}).get("model"),
+            "start_time": log.get("start_time"),
+            "end_time": log.get("end_time"),
+            "time_taken": runtime.get("total"),
+            "model_time": runtime.get("model"),
+            "tool_time": runtime.get("tools"),
+            "mistakes": mistakes,
+        }
+    if "success" not in log:
+        raise KeyError("Not a run log")
+    summary = {
+        "success": bool(log.get("success")),
+        "exit_reason": log.get("exit_reason"),
+        "error": log.get("error"),
+        "cost": log.get("total_cost"),
+        "executor_model": log.get("executor_model"),
+        "autoprompter_model": log.get("autoprompter_model"),
+        "start_time": log.get("start_time"),
+        "end_time": log.get("end_time"),
+        "time_taken": log.get("time_taken"),
+        "model_time": span_time.get("backend") if span_time else None,
+        "tool_time": span_time.get("tool") if span_time else None,
+        "mistakes": mistakes,
+    }
+    if log.get("planner_model") is not None:
+        summary.update({
+            "format": "dcipher",
+            "planner_model": log["planner_model"],
+            "rounds": rounds.get("planner", 0),
+            "executors": len(executors),
+            "executor_rounds": rounds.get("executors", 0),
+        })
+    else:
+        summary.update({
+            "format": "single_executor",
+            "rounds": rounds.get("executor", 0),
+            "executor_rounds": rounds.get("executor", 0),
+        })
+    return summary
+
+def read_log(path):
+    """
+    Summary row of the log at path, run in the worker processes of ResultsIndex.update.
+    The logs of the speculative attempts of a run have the format "attempt", the run is
+    counted once by its "attempts" summary log.
+    """
+    path = Path(path)
+    stat = path.stat()
+    name = LOG_NAME.match(path.stem)
+    row = {"path": str(path), "mtime": stat.st_mtime, "size": stat.st_size,
+           "challenge": name.group("challenge"), "valid": True}
+    try:
+        row.update(summarize_log(iter_log(path)))
+    except (LogFormatError, UnicodeDecodeError, KeyError, TypeError, AttributeError, IndexError):
+        row["valid"] = False
+    if name.group("attempt") is not None:
+        row["format"] = "attempt"
+    return row
+
+def scan_log(path_flag):
+    """Kind of the flag match in the raw log, run in the worker processes of ResultsIndex.flag_found"""
+    path, flag = path_flag
+    kind = FlagScanner(flag).search_file(path)
+    escaped = json.dumps(flag)[1:-1]
+    if kind is None and escaped != flag:
+        # Quotes, backslashes and non-ASCII characters are escaped in the JSON log
+        kind = FlagScanner(escaped).search_file(path)
+    return kind
+
+class ResultsIndex:
+    """
+    Local SQLite index of the run summaries in log directories, so the analysis scripts do not
+    load every JSON log on each invocation. The challenge of a run is its canonical name, parsed
+    from the log file name.
+
+    `update` ingests the JSON logs under a directory, keyed by path, mtime and size so unchanged
+    logs are skipped and deleted logs are dropped. Logs that fail to parse are indexed with
+    valid = 0, and re-read once they change.
+    """
+    def __init__(self, path=DEFAULT_INDEX):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            self.db.executescript("DROP TABLE IF EXISTS runs; DROP TABLE IF EXISTS flag_scans;")
+            self.db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def path_range(logdir):
+        """Bounds of the paths under logdir, so the lookups use the primary key"""
+        prefix = str(Path(logdir).resolve()) + "/"
+        # "0" is the character after "/"
+        return prefix, prefix[:-1] + "0"
+
+    def update(self, logdir, jobs=None):
+        """
+        Index the new and changed JSON logs under logdir, returns the number of logs read.
+        The logs are read in a pool of jobs processes, one per CPU by default.
+        """
+        logdir = Path(logdir).resolve()
+        indexed = {row["path"]: (row["mtime"], row["size"]) for row in
+                   self.db.execute("SELECT path, mtime, size FROM runs WHERE path >= ? AND path < ?",
+                                   self.path_range(logdir))}
+        seen = set()
+        changed = []
+        for log in logdir.rglob("*.json"):
+            # Other JSON files next to the logs, such as the Chrome traces
+            if log.name.endswith(".trace.json"):
+                continue
+            stat = log.stat()
+            path = str(log)
+            seen.add(path)
+            if indexed.get(path) == (stat.st_mtime, stat.st_size):
+                continue
+            changed.append(path)
+        rows = parallel_map(read_log, changed, jobs=jobs)
+        removed = [(path,) for path in indexed if path not in seen]
+        with self.db:
+            self.db.executemany(f"INSERT OR REPLACE INTO runs ({', '.join(COLUMNS)}) "
+                                f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+                                [[row.get(c) for c in COLUMNS] for row in rows])
+            self.db.executemany("DELETE FROM runs WHERE path = ?", removed)
+            self.db.executemany("DELETE FROM flag_scans WHERE path = ?", removed)
+        return len(rows)
+
+    def runs(self, logdir, recursive=True, **filters):
+        """
+        Summary rows of the runs under logdir as dicts, ordered by path and optionally filtered by column values.
+        recursive: include the logs in subdirectories of logdir.
+        """
+        query = "SELECT * FROM runs WHERE path >= ? AND path < ?"
+        params = list(self.path_range(logdir))
+        for column, value in filters.items():
+            if column not in COLUMNS:
+                raise ValueError(f"Unknown column {column}")
+            query += f" AND {column} = ?"
+            params.append(value)
+        rows = [dict(row) for row in self.db.execute(query + " ORDER BY path", params)]
+        if not recursive:
+            rows = [row for row in rows if Path(row["path"]).parent == Path(logdir).resolve()]
+        return rows
+
+    def flag_found(self, runs, flags, jobs=None):
+        """
+        Kind of the flag match in the raw log of each run, see FlagScanner, or None.
+        flags has the flag of each run. The logs are scanned in a process pool, and the
+        results are cached with the log mtime.
+        """
+        kinds = []
+        todo = []
+        for run, flag in zip(runs, flags):
+            row = self.db.execute("SELECT mtime, kind FROM flag_scans WHERE path = ? AND flag = ?",
+                                  (run["path"], flag)).fetchone()
+            if row is not None and row["mtime"] == run["mtime"]:
+                kinds.append(row["kind"])
+            else:
+                kinds.append(None)
+                todo.append((len(kinds) - 1, run, flag))
+        scanned = parallel_map(scan_log, [(run["path"], flag) for _, run, flag in todo], jobs=jobs)
+        with self.db:
+            for (i, run, flag), kind in zip(todo, scanned):
+                kinds[i] = kind
+                self.db.execute("INSERT OR REPLACE INTO flag_scans (path, mtime, flag, kind) VALUES (?, ?, ?, ?)",
+                                (run["path"], run["mtime"], flag, kind))
+        return kinds
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser("Index the run summaries of log directories for the analysis scripts.")
+    parser.add_argument("logdirs", nargs="+", help="Log directories to index")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="Path of the SQLite index")
+    parser.add_argument("-j", "--jobs", default=None, type=int, help="Processes reading the logs, default is one per CPU")
+    args = parser.parse_args()
+
+    with ResultsIndex(args.index) as index:
+        for logdir in args.logdirs:
+            read = index.update(logdir, jobs=args.jobs)
+            runs = index.runs(logdir)
+            solved = sum(1 for r in runs if r["success"])
+            print(f"{logdir}: {len(runs)} runs, {read} read, {solved} solved")
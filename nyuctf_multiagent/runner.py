@@ -0,0 +1,112 @@
+from pathlib import Path
+
+from .environment import CTFEnvironment
+from .ghidra_cache import load_ghidra_cache
+from .attempts import SpeculativeAttempts, attempt_logfile, attempt_temperature
+from .backends import MODELS, Role
+from .backends.rate_limit import load_rate_limiter
+from .backends.replay_backend import Cassette, RecordingBackend, cassette_path, replay_source, use_replay
+from .prompting import PromptManager
+from .agent import PlannerExecutorSystem, PlannerAgent, ExecutorAgent, AutoPromptAgent
+from .logging import logger
+from .utils import APIKeys, load_config
+
+def load_dcipher_options(parser):
+    """Options specific to the D-CIPHER planner-executor runners"""
+    parser.add_argument("--logdir", default="logs_dcipher", type=str, help="Log directory")
+    parser.add_argument("--config", default=None, help="YAML config for the planner-executor multiagent. If not provided, it picks one automatically based on challenge cateogory.")
+
+    # Config overriding options
+    parser.add_argument("--planner-model", default=None, help="Planner model to use (overrides config)")
+    parser.add_argument("--executor-model", default=None, help="Executor model to use (overrides config)")
+    parser.add_argument("--autoprompter-model", default=None, help="AutoPrompt model to use (overrides config)")
+    parser.add_argument("--max-cost", default=0.0, type=float, help="Max cost in $ (overrides config)")
+    parser.add_argument("--enable-autoprompt", action="store_true", help="Init prompt message auto generated, else use generic base prompt")
+
+    # Record and replay
+    parser.add_argument("--record", action="store_true", help="Record the model responses to a cassette next to the log, for --replay")
+    parser.add_argument("--replay", default=None, help="Replay the model responses from a cassette or JSON log instead of calling the models. " + \
+                        "A directory is searched for the cassette or log of the challenge.")
+
+    # Speculative attempts
+    parser.add_argument("--attempts", default=1, type=int, help="Independent attempts per challenge run concurrently, the first to solve cancels the rest. Attempts share --max-cost.")
+    parser.add_argument("--attempt-temperatures", default=None, nargs="+", type=float, help="Temperature of the agents of each attempt, cycled over the attempts (overrides config)")
+
+def get_dcipher_config_path(args, challenge, config_dir):
+    """Use the --config if provided, else pick one based on challenge category"""
+    if args.config:
+        return Path(args.config)
+    return Path(config_dir) / f"{challenge.category}_planner_executor.yaml"
+
+def build_planner_executor(args, challenge, logfile, config_dir, container_pool=None, temperature=None):
+    """
+    Create the D-CIPHER planner-executor system for one challenge.
+    The returned system is a context manager that should be entered to run the challenge.
+    temperature: overrides the temperature of all the agents.
+    """
+    keys = APIKeys(args.keys)
+    environment = CTFEnvironment(challenge, args.container_image, args.container_network,
+                                 container_pool=container_pool, ghidra_cache=load_ghidra_cache(args),
+                                 ghidra_prefetch=args.ghidra_prefetch,
+                                 max_output_bytes=args.max_output_bytes or None,
+                                 kill_output_bytes=args.kill_output_bytes)
+
+    config_f = get_dcipher_config_path(args, challenge, config_dir)
+    logger.print(f"Using config: {str(config_f)}", force=True)
+    config = load_config(config_f, args=args)
+    if args.replay is not None:
+        use_replay(config, replay_source(args.replay, challenge))
+    if temperature is not None:
+        config.planner.temperature = config.executor.temperature = config.autoprompter.temperature = temperature
+
+    autoprompter_backend_cls = MODELS[config.autoprompter.model]
+    autoprompter_backend = autoprompter_backend_cls(Role.AUTOPROMPTER, config.autoprompter.model,
+                                          environment.get_toolset(config.autoprompter.toolset),
+                                          keys.get(autoprompter_backend_cls.NAME.upper()), config)
+    autoprompter_backend.rate_limiter = load_rate_limiter(args, autoprompter_backend_cls.NAME, keys.get(autoprompter_backend_cls.NAME.upper()))
+    autoprompter_prompter = PromptManager(config_f.parent / config.autoprompter.prompt, challenge, environment)
+    autoprompter = AutoPromptAgent(environment, challenge, autoprompter_prompter,
+                           autoprompter_backend, max_rounds=config.autoprompter.max_rounds)
+
+    if config.experiment.enable_autoprompt:
+        autoprompter.enable_autoprompt()
+
+    planner_backend_cls = MODELS[config.planner.model]
+    planner_backend = planner_backend_cls(Role.PLANNER, config.planner.model,
+                                          environment.get_toolset(config.planner.toolset),
+                                          keys.get(planner_backend_cls.NAME.upper()), config)
+    planner_backend.rate_limiter = load_rate_limiter(args, planner_backend_cls.NAME, keys.get(planner_backend_cls.NAME.upper()))
+    planner_prompter = PromptManager(config_f.parent / config.planner.prompt, challenge, environment)
+    planner = PlannerAgent(environment, challenge, planner_prompter,
+                           planner_backend, max_rounds=config.planner.max_rounds,
+                           max_parallel_tasks=config.planner.max_parallel_tasks)
+
+    executor_backend_cls = MODELS[config.executor.model]
+    executor_backend = executor_backend_cls(Role.EXECUTOR, config.executor.model,
+                                            environment.get_toolset(config.executor.toolset),
+                                            keys.get(executor_backend_cls.NAME.upper()), config)
+    executor_backend.rate_limiter = load_rate_limiter(args, executor_backend_cls.NAME, keys.get(executor_backend_cls.NAME.upper()))
+    executor_prompter = PromptManager(config_f.parent / config.executor.prompt, challenge, environment)
+    executor = ExecutorAgent(environment, challenge, executor_prompter,
+                             executor_backend, max_rounds=config.executor.max_rounds)
+    executor.conversation.len_observations = config.executor.len_observations
+    if args.record:
+        # All backends record to one cassette, the replay picks the responses of each role
+        cassette = Cassette(cassette_path(logfile))
+        autoprompter.backend = RecordingBackend(autoprompter.backend, cassette)
+        planner.backend = RecordingBackend(planner.backend, cassette)
+        executor.backend = RecordingBackend(executor.backend, cassette)
+
+    return PlannerExecutorSystem(environment, challenge, autoprompter, planner, executor,
+                                 max_cost=config.experiment.max_cost, logfile=logfile)
+
+def build_attempts(args, challenge, logfile, config_dir, container_pool=None):
+    """
+    Create --attempts planner-executor systems for one challenge, run as speculative attempts.
+    Each attempt logs to its own file next to the logfile, which gets the summary of the attempts.
+    """
+    systems = [build_planner_executor(args, challenge, attempt_logfile(logfile, i), config_dir,
+                                      container_pool=container_pool,
+                                      temperature=attempt_temperature(args.attempt_temperatures, i))
+               for i in range(args.attempts)]
+    return SpeculativeAttempts(challenge, systems, max_cost=systems[0].max_cost, logfile=logfile)
@@ -1,6 +1,7 @@
 from pathlib import Path
 import json
 import re
+import shlex
 import subprocess
 
 from .tool import Tool
@@ -8,6 +9,18 @@ from ..logging import logger
 
 DECOMPILE = "/opt/ghidra/customScripts/decompile.sh"
 DISASSEMBLE = "/opt/ghidra/customScripts/disassemble.sh"
+# Single analysis pass emitting both decompilation and disassembly of each function
+ANALYZE = "/opt/ghidra/customScripts/analyze.sh"
+# Seconds a Ghidra analysis may take, it holds the cache lock of the binary while running
+GHIDRA_TIMEOUT = 600
+
+def project_analysis(analysis, kind):
+    """View of the combined analysis with only one kind ("decompilation" or "disassembly") of each function"""
+    functions = {name: f[kind] for name, f in analysis["functions"].items() if kind in f}
+    return {
+        "functions": functions,
+        "addresses": {addr: name for addr, name in analysis["addresses"].items() if name in functions},
+    }
 
 class GhidraBaseTool(Tool):
     """
@@ -15,6 +28,8 @@ class GhidraBaseTool(Tool):
     Do not use this directly, only use the subclasses.
     """
     NAME = None
+    # Which output of the combined analysis the tool returns
+    KIND = None
     def __init__(self, environment):
         super().__init__()
         self.environment = environment
@@ -39,24 +54,101 @@ class GhidraBaseTool(Tool):
         # Nothing found
         return None
 
-    def run_ghidra(self, script, binary):
+    def get_analysis(self, binary):
+        """
+        Combined Ghidra analysis of the binary, shared by the Ghidra tools of the environment.
+        Waits for the prefetched analysis if there is one, or for the analysis of a concurrent executor.
+        """
+        key = str(self.environment.normalize_path(binary))
+        with self.environment.ghidra_lock(key):
+            if key in self.environment.ghidra_analyses:
+                return self.environment.ghidra_analyses[key]
+            out = None
+            prefetched = self.environment.get_prefetched(binary)
+            if prefetched is not None:
+                logger.debug_message(f"Waiting for prefetched Ghidra analysis of {binary}...")
+                try:
+                    out = prefetched.result()
+                except Exception as e:
+                    logger.debug_message(f"Prefetched Ghidra analysis failed: {e}")
+            if out is None:
+                out = self.run_ghidra(binary)
+            if out is not None:
+                self.environment.ghidra_analyses[key] = out
+            return out
+
+    def get_view(self, binary):
+        """Analysis output of this tool's KIND for the binary, None if Ghidra failed"""
+        # Concurrent executors can both project the analysis, which is cheap and gives the same view
+        if binary not in self.rev_cache:
+            analysis = self.get_analysis(binary)
+            if analysis is None:
+                return None
+            self.rev_cache[binary] = project_analysis(analysis, self.KIND)
+        return self.rev_cache[binary]
+
+    def binary_digest(self, binary):
+        """SHA-256 of the binary inside the container, None if it cannot be read"""
+        res = self.environment.exec_session.run(f"sha256sum -- {shlex.quote(binary)}", 60)
+        if res["returncode"] != 0:
+            return None
+        digest = res["stdout"].decode("utf-8", errors="replace").split(maxsplit=1)
+        return digest[0] if len(digest) > 0 else None
+
+    def run_ghidra(self, binary, script=ANALYZE):
+        with self.environment.tracer.span(Path(script).stem, "ghidra", binary=binary) as span:
+            return self._cached_ghidra(binary, script, span)
+
+    def _cached_ghidra(self, binary, script, span):
+        cache = self.environment.ghidra_cache
+        if cache is None:
+            return self._run_ghidra(script, binary)[0]
+
+        digest = self.binary_digest(binary)
+        if digest is None:
+            # Let Ghidra report the failure
+            return self._run_ghidra(script, binary)[0]
+        script_name = Path(script).stem
+        # A miss is counted by the lookup under the lock
+        if (out := cache.get(digest, script_name, count_miss=False)) is not None:
+            span.set(cache="hit")
+            return out
+        # Another run may be analyzing the same binary, wait for it and check again
+        with cache.lock(digest, script_name):
+            if (out := cache.get(digest, script_name)) is not None:
+                span.set(cache="hit")
+                return out
+            span.set(cache="miss")
+            out, raw = self._run_ghidra(script, binary)
+            if out is not None:
+                cache.put(digest, script_name, raw)
+        return out
+
+    def _run_ghidra(self, script, binary):
+        """Returns the parsed and raw JSON outputs of the Ghidra script"""
         logger.debug_message(f"Running Ghidra for {binary}...")
-        # TODO add timeout
-        res = subprocess.run(["docker", "exec", self.environment.container, script, binary],
-                             check=False, capture_output=True)
+        # `timeout` stops the analysis inside the container, the subprocess timeout is a backstop for docker itself
+        cmd = ["docker", "exec", self.environment.container, "timeout", "-k", "10", str(GHIDRA_TIMEOUT), script, binary]
+        try:
+            res = subprocess.run(cmd, check=False, capture_output=True, timeout=GHIDRA_TIMEOUT + 30)
+        except subprocess.TimeoutExpired:
+            logger.debug_message(f"GHIDRA TIMED OUT after {GHIDRA_TIMEOUT}s")
+            return None, None
         if res.returncode != 0:
             logger.debug_message("GHIDRA FAILED!!")
             logger.debug_message(res.stdout.decode("utf-8"))
-            return None
-        out = json.loads(res.stdout.decode("utf-8"))
+            return None, None
+        raw = res.stdout.decode("utf-8")
+        out = json.loads(raw)
         # logger.debug_message("\n".join(out["functions"].keys()))
-        return out
+        return out, raw
 
     def print_tool_call(self, tool_call):
         logger.assistant_action(f"**{self.NAME}** binary:`{tool_call.parsed_arguments['binary']}` function:`{tool_call.parsed_arguments.get('function', '')}`")
 
 class DisassembleTool(GhidraBaseTool):
     NAME = "disassemble"
+    KIND = "disassembly"
     DESCRIPTION = "Disassemble a function from a binary using Ghidra."
     PARAMETERS = {
         "binary": ("string", "path of the binary to disassemble"),
@@ -72,13 +164,11 @@ class DisassembleTool(GhidraBaseTool):
         if binary is None:
             return {"error": "No binary provided"}
 
-        if binary not in self.rev_cache:
-            disasm_out = self.run_ghidra(DISASSEMBLE, binary)
-            if disasm_out is None:
-                return {"error": f"Failed to run Ghidra for {binary}! Make sure the file exists and is a binary file."}
-            self.rev_cache[binary] = disasm_out
+        disasm_out = self.get_view(binary)
+        if disasm_out is None:
+            return {"error": f"Failed to run Ghidra for {binary}! Make sure the file exists and is a binary file."}
 
-        if found := self.find_function(self.rev_cache[binary], function):
+        if found := self.find_function(disasm_out, function):
             return {"disassembly": found}
         else:
             return {"error": f"Function {function} not found in {binary}"}
@@ -91,6 +181,7 @@ class DisassembleTool(GhidraBaseTool):
 
 class DecompileTool(GhidraBaseTool):
     NAME = "decompile"
+    KIND = "decompilation"
     DESCRIPTION = "Decompile a function from a binary using Ghidra."
     PARAMETERS = {
         "binary": ("string", "path of the binary to decompile"),
@@ -106,13 +197,11 @@ class DecompileTool(GhidraBaseTool):
         if binary is None:
             return {"error": "No binary provided"}
 
-        if binary not in self.rev_cache:
-            decomp_out = self.run_ghidra(DECOMPILE, binary)
-            if decomp_out is None:
-                return {"error": f"Failed to run Ghidra for {binary}! Make sure the file exists and is a binary file."}
-            self.rev_cache[binary] = decomp_out
+        decomp_out = self.get_view(binary)
+        if decomp_out is None:
+            return {"error": f"Failed to run Ghidra for {binary}! Make sure the file exists and is a binary file."}
 
-        if found := self.find_function(self.rev_cache[binary], function):
+        if found := self.find_function(decomp_out, function):
             return {"decompilation": found}
         else:
             return {"error": f"Function {function} not found in {binary}"}
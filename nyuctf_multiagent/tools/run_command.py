@@ -1,5 +1,3 @@
-import subprocess
-
 from ..logging import logger
 from .tool import Tool, ToolResult
 
@@ -30,28 +28,13 @@ class RunCommandTool(Tool):
         if command is None:
             return {"error": "No command provided"}
 
-        p = subprocess.Popen(
-            ['docker', 'exec', self.environment.container, 'bash', '-c', command],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        try:
-            stdout, stderr = p.communicate(timeout=timeout)
-            out = self._clean(stdout)
-            err = self._clean(stderr)
-            return {"stdout": out, "stderr": err, "returncode": p.returncode, "timed_out": False}
-        except subprocess.TimeoutExpired as e:
-            p.kill()
-            stdout, stderr = p.communicate(timeout=timeout)     
-            out = self._clean(stdout)
-            err = self._clean(stderr) 
-            # out = self._clean(e.stdout)
-            # err = self._clean(e.stderr)
-            return {"stdout": out, "stderr": err, "returncode": None, "timed_out": True}
-        except subprocess.CalledProcessError as e:
-            out = self._clean(e.stdout)
-            err = self._clean(e.stderr)
-            return {"stdout": out, "stderr": err, "returncode": e.returncode, "timed_out": False}
+        res = self.environment.exec_session.run(command, timeout, max_output=self.environment.max_output_bytes,
+                                                kill_output=self.environment.kill_output_bytes)
+        stderr = self._clean(res["stderr"])
+        if res["killed"]:
+            stderr = (stderr or "") + f"\n[killed after {res['stdout_size'] + res['stderr_size']} bytes of output]"
+        return {"stdout": self._clean(res["stdout"]), "stderr": stderr,
+                "returncode": res["returncode"], "timed_out": res["timed_out"]}
 
     def print_tool_call(self, tool_call):
         logger.assistant_action(f"**{self.NAME}**\n```\n{tool_call.parsed_arguments['command']}\n```")
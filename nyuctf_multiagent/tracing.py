@@ -0,0 +1,157 @@
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+
+now = lambda: time.time()
+
+# Agent role, round and executor index of the running agent, inherited by the spans it opens
+_context = contextvars.ContextVar("trace_context", default={})
+
+# Called with (span, duration, context) of every finished span, even without a transcript
+_listeners = []
+
+def add_listener(listener):
+    _listeners.append(listener)
+
+class Span:
+    """Attributes of a span, which can be set while the span is open"""
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def set_response(self, response):
+        """Token counts and cost of a BackendResponse"""
+        self.set(input_tokens=response.input_tokens, output_tokens=response.output_tokens,
+                 cost=response.cost, error=response.error)
+
+class Tracer:
+    """
+    Records timed spans of backend calls, tool calls, docker execs, Ghidra runs and log writes.
+
+    Each span records the role, round and executor of the agent that opened it (set with `context`),
+    and is written to the transcript as a "span" event. Spans are only written while a transcript is set,
+    so the tracer can be used unconditionally; listeners such as the metrics see all of them. Export the spans to a Chrome trace with
+    `python3 -m nyuctf_multiagent.tracing <log>`.
+    """
+    def __init__(self):
+        self.transcript = None
+
+    def start(self, transcript):
+        self.transcript = transcript
+
+    def stop(self):
+        self.transcript = None
+
+    @contextmanager
+    def context(self, **attrs):
+        """Set the agent attributes of the spans opened in this block, including in threads started with to_thread"""
+        token = _context.set({**_context.get(), **attrs})
+        try:
+            yield
+        finally:
+            _context.reset(token)
+
+    @contextmanager
+    def span(self, name, category, **args):
+        span = Span(name, category, args)
+        start = now()
+        start_perf = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            duration = time.perf_counter() - start_perf
+            context = _context.get()
+            for listener in _listeners:
+                listener(span, duration, context)
+            # Read once, the transcript can be stopped from another thread
+            transcript = self.transcript
+            if transcript is not None:
+                transcript.event("span", name=span.name, category=span.category, start=start, duration=duration,
+                                 thread=threading.current_thread().name, **context, args=span.args)
+
+def load_spans(path):
+    """Spans from a JSONL transcript, or from the JSON log it was compacted into"""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        spans = []
+        with path.open("r") as f:
+            for line in f:
+                try:
+                    ev = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                if ev["event"] == "span":
+                    spans.append(ev)
+        return spans
+    with path.open("r") as f:
+        return json.load(f).get("spans", [])
+
+def span_lane(span):
+    """Timeline row of the span: the agent that opened it, or the thread for background work"""
+    if span.get("executor") is not None:
+        return f"executor {span['executor']}"
+    return span.get("role") or span["thread"]
+
+def chrome_trace(spans):
+    """
+    Chrome trace-event document of the spans, viewable in chrome://tracing or https://ui.perfetto.dev.
+    Each agent gets its own row, with the tool, docker and Ghidra spans nested under its rounds.
+    """
+    lanes = {}
+    events = []
+    start = min((s["start"] for s in spans), default=0.0)
+    for s in spans:
+        lane = span_lane(s)
+        if lane not in lanes:
+            lanes[lane] = len(lanes)
+            events.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": lanes[lane], "args": {"name": lane}})
+        args = {k: v for k, v in s["args"].items() if v is not None}
+        if s.get("round") is not None:
+            args["round"] = s["round"]
+        events.append({
+            "name": s["name"],
+            "cat": s["category"],
+            "ph": "X",
+            "ts": (s["start"] - start) * 1e6,
+            "dur": s["duration"] * 1e6,
+            "pid": 0,
+            "tid": lanes[lane],
+            "args": args,
+        })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def summarize(spans):
+    """Count and total time of the spans by category and name"""
+    summary = {}
+    for s in spans:
+        key = f"{s['category']}:{s['name']}"
+        count, total = summary.get(key, (0, 0.0))
+        summary[key] = (count + 1, total + s["duration"])
+    return summary
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser("Export the spans of a run to a Chrome trace-event file.")
+    parser.add_argument("log", help="JSON log, or JSONL transcript of a running or interrupted run")
+    parser.add_argument("-o", "--output", default=None, help="Output trace file, default is the log path with .trace.json suffix")
+    parser.add_argument("--summary", action="store_true", help="Print the time spent by span category and name")
+    args = parser.parse_args()
+
+    spans = load_spans(args.log)
+    output = Path(args.output) if args.output else Path(args.log).with_suffix(".trace.json")
+    with output.open("w") as f:
+        json.dump(chrome_trace(spans), f)
+    print(f"Wrote {len(spans)} spans to {output}")
+    if args.summary:
+        for key, (count, total) in sorted(summarize(spans).items(), key=lambda kv: -kv[1][1]):
+            print(f"{key:<40} {count:>6} {total:>10.3f}s")
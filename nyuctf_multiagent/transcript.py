@@ -0,0 +1,163 @@
+import json
+import time
+import threading
+from pathlib import Path
+
+now = lambda: time.time()
+
+def transcript_path(logfile):
+    """JSONL event log path for the JSON log file"""
+    return Path(logfile).with_suffix(".jsonl")
+
+class TranscriptWriter:
+    """
+    Append-only JSONL event log of a run.
+
+    Messages of the watched conversations are written at the end of each round,
+    along with the cost and executor boundaries, so an interrupted run keeps its
+    transcript up to the last round. Use `compact` to convert it to the JSON log.
+    """
+    def __init__(self, path, cost_fn=None, tracer=None):
+        self.path = Path(path)
+        # Truncate the transcript left by a killed run of the same log, when it is run again
+        self.file = self.path.open("w")
+        # Returns the current total cost, logged when it changes
+        self.cost_fn = cost_fn
+        self.last_cost = None
+        # [conversation, name, executor index, messages written]
+        self.watched = []
+        # Concurrent executors flush from their own threads
+        self.lock = threading.RLock()
+        # Tracer of the run, times the writes of each round
+        self.tracer = tracer
+
+    def event(self, event, **data):
+        with self.lock:
+            if self.file.closed:
+                # Background work can finish after the run is logged
+                return
+            self.file.write(json.dumps({"event": event, "time": now(), **data}) + "\n")
+
+    def watch(self, conversation, name, executor=None):
+        """Log the messages of the conversation, flushing at the start of each of its rounds"""
+        with self.lock:
+            self.watched.append([conversation, name, executor, 0])
+        conversation.on_next_round = self.flush
+
+    def flush(self, conversation=None):
+        """
+        Write the new messages of the conversation whose round ended, or of all watched conversations.
+        The other conversations can be in the middle of a round, with tool calls not yet parsed.
+        """
+        if self.tracer is None:
+            self._flush(conversation)
+            return
+        with self.tracer.span("flush", "log"):
+            self._flush(conversation)
+
+    def _flush(self, only=None):
+        with self.lock:
+            for w in self.watched:
+                conversation, name, executor, written = w
+                if only is not None and conversation is not only:
+                    continue
+                messages = conversation.all_messages[written:]
+                for m in messages:
+                    self.event("message", conversation=name, executor=executor, message=m.dump())
+                w[3] = written + len(messages)
+            if self.cost_fn is not None:
+                cost = self.cost_fn()
+                if cost != self.last_cost:
+                    self.event("cost", total_cost=cost)
+                    self.last_cost = cost
+            self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+def compact(path):
+    """
+    Build the JSON log of the run from the JSONL event log.
+    If the run was interrupted, the log is marked with an error.
+    """
+    log = {}
+    conversations = {"autoprompter": [], "planner": [], "executors": [], "executor": []}
+    summary = None
+    last_time = None
+    total_cost = 0.0
+    executor_errors = []
+    executor_tasks = []
+    spans = []
+    with Path(path).open("r") as f:
+        for line in f:
+            try:
+                ev = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line can be partially written if the process was killed
+                break
+            last_time = ev["time"]
+            if ev["event"] == "start":
+                log.update(ev["info"])
+            elif ev["event"] == "message":
+                if ev["executor"] is not None:
+                    execs = conversations["executors"]
+                    while len(execs) <= ev["executor"]:
+                        execs.append([])
+                    execs[ev["executor"]].append(ev["message"])
+                else:
+                    conversations[ev["conversation"]].append(ev["message"])
+            elif ev["event"] == "executor_start":
+                while len(executor_tasks) <= ev["executor"]:
+                    executor_tasks.append(None)
+                executor_tasks[ev["executor"]] = ev.get("task_id")
+            elif ev["event"] == "executor_end":
+                # Concurrent executors end out of order
+                while len(executor_errors) <= ev["executor"]:
+                    executor_errors.append(None)
+                executor_errors[ev["executor"]] = ev["error"]
+            elif ev["event"] == "span":
+                del ev["event"]
+                spans.append(ev)
+            elif ev["event"] == "cost":
+                total_cost = ev["total_cost"]
+            elif ev["event"] == "end":
+                summary = ev["summary"]
+
+    if summary is None:
+        start_time = log.get("start_time", last_time)
+        summary = {
+            "end_time": last_time,
+            "time_taken": last_time - start_time if last_time is not None else 0.0,
+            "total_cost": total_cost,
+            "success": False,
+            "exit_reason": "error",
+            "error": "Run interrupted, transcript is incomplete",
+        }
+        if log.get("planner_model") is not None:
+            summary["executor_errors"] = executor_errors
+    log.update(summary)
+    # Single executor runs have one executor conversation, planner-executor runs have a list
+    if log.get("planner_model") is not None:
+        del conversations["executor"]
+        log["executor_tasks"] = executor_tasks
+    else:
+        del conversations["planner"]
+        del conversations["executors"]
+    debug_log = log.pop("debug_log", [])
+    log.update(conversations)
+    if len(spans) > 0:
+        log["spans"] = spans
+    log["debug_log"] = debug_log
+    return log
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser("Compact the JSONL transcript of a run into the JSON log.")
+    parser.add_argument("transcript", help="Transcript JSONL file")
+    parser.add_argument("-o", "--output", default=None, help="Output JSON file, default is the transcript path with .json suffix")
+    args = parser.parse_args()
+
+    output = Path(args.output) if args.output else Path(args.transcript).with_suffix(".json")
+    with output.open("w") as f:
+        json.dump(compact(args.transcript), f, indent=2)
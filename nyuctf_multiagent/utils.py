@@ -3,6 +3,8 @@ from datetime import datetime
 from .config import Config
 import getpass
 from nyuctf_multiagent.backends import MODELS
+from nyuctf_multiagent.ghidra_cache import DEFAULT_CACHE_DIR
+from nyuctf_multiagent.backends.rate_limit import DEFAULT_STATE_DIR
 
 class APIKeys(dict):
     """Loads and holds API keys"""
@@ -14,8 +16,12 @@ class APIKeys(dict):
             tag, k = line.strip().split("=")
             self[tag] = k
 
-def load_common_options(parser):
-    parser.add_argument("--challenge", required=True, help="Name of the challenge")
+def load_common_options(parser, single_challenge=True):
+    if single_challenge:
+        parser.add_argument("--challenge", required=True, help="Name of the challenge")
+    else:
+        parser.add_argument("--challenges", default=[], nargs="+", help="Names of the challenges to run. Runs the whole split if not provided.")
+        parser.add_argument("--challenge-list", default=None, help="File with one challenge name per line, alternative to --challenges")
     parser.add_argument("--dataset", help="Dataset JSON path. Only provide if not using the NYUCTF dataset at default path")
     parser.add_argument("-n", "--experiment-name", default="default", type=str, help="Experiment name (creates subdir in logdir)")
     parser.add_argument("-s", "--split", default="development", choices=["test", "development"], help="Dataset split to select. Only used when --dataset not provided.")
@@ -23,6 +29,15 @@ def load_common_options(parser):
 
     parser.add_argument("--container-image", default="ctfenv:multiagent", help="Image tag of docker container")
     parser.add_argument("--container-network", default="ctfnet", help="Network name of docker container")
+    parser.add_argument("--ghidra-cache-dir", default=DEFAULT_CACHE_DIR, help="Directory of the Ghidra output cache shared across runs")
+    parser.add_argument("--ghidra-prefetch", default=False, action="store_true", help="Analyze rev/pwn challenge binaries with Ghidra in the background during setup")
+    parser.add_argument("--ghidra-cache-size", default=2048, type=int, help="Max size of the Ghidra output cache in MB (0 to disable)")
+    parser.add_argument("--rate-limit", default=[], action="append", help="Requests and tokens per minute of a provider as provider=RPM,TPM, e.g. openai=500,800000. Shared by all processes using the same API key. Can be repeated.")
+    parser.add_argument("--rate-limit-dir", default=DEFAULT_STATE_DIR, help="Directory of the rate limiter state shared across processes")
+    parser.add_argument("--max-output-bytes", default=1 << 20, type=int, help="Bytes kept of the stdout and stderr of each command, the first and last half; the middle is dropped while reading (0 to keep all)")
+    parser.add_argument("--kill-output-bytes", default=None, type=int, help="Kill commands once they produce this many bytes of output")
+    parser.add_argument("--metrics-port", default=None, type=int, help="Serve Prometheus metrics of the run at http://<metrics-host>:<port>/metrics")
+    parser.add_argument("--metrics-host", default="127.0.0.1", help="Address of the metrics endpoint, local only by default")
 
     # Logging options
     parser.add_argument("-d", "--debug", default=False, action="store_true", help="Print debug messages")
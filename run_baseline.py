@@ -13,7 +13,8 @@ from nyuctf.dataset import CTFDataset
 from nyuctf.challenge import CTFChallenge
 
 from nyuctf_baseline.ctflogging import status
-from nyuctf_baseline.backends import Backend, OpenAIBackend, AnthropicBackend, VLLMBackend
+from nyuctf_baseline.backends import Backend, OpenAIBackend, AnthropicBackend, VLLMBackend, ReplayBackend, RecordingBackend
+from nyuctf_baseline.backends.replay_backend import cassette_path
 from nyuctf_baseline.formatters import Formatter
 from nyuctf_baseline.prompts.prompts import PromptManager
 from nyuctf_baseline.environment import CTFEnvironment
@@ -50,7 +51,11 @@ def main():
     parser.add_argument("--hints", default=[], nargs="+", help="list of hints to provide")
     parser.add_argument("--disable-markdown", default=False, action="store_true", help="don't render Markdown formatting in messages")
     parser.add_argument("-m", "--max-rounds", type=int, default=10, help="maximum number of rounds to run")
+    parser.add_argument("--max-output-bytes", default=1 << 20, type=int, help="bytes kept of the stdout and stderr of each command, the first and last half; the middle is dropped while reading (0 to keep all)")
+    parser.add_argument("--kill-output-bytes", default=None, type=int, help="kill commands once they produce this many bytes of output")
     parser.add_argument("--max-cost", type=float, default=10, help="maximum cost of the conversation to run")
+    parser.add_argument("--record", action="store_true", help="record the model responses to a cassette next to the log, for --replay")
+    parser.add_argument("--replay", default=None, help="replay the model responses from a cassette or JSON log instead of calling the model (sets --backend replay)")
 
     # Log directory options
     parser.add_argument("--skip-exist", action="store_true", help="Skip existing logs and experiments")
@@ -82,6 +87,8 @@ def main():
         args.hints = config_demostration.get("hints", [])
 
     status.set(quiet=args.quiet, debug=args.debug, disable_markdown=args.disable_markdown)
+    if args.replay is not None:
+        args.backend = "replay"
 
     if args.dataset is not None:
         dataset = CTFDataset(dataset_json=args.dataset)
@@ -104,7 +111,9 @@ def main():
         status.print(f"[red bold]Challenge log {logfile} exists; skipping[/red bold]", markup=True)
         exit()
         
-    environment = CTFEnvironment(challenge, args.container_image, args.network)
+    environment = CTFEnvironment(challenge, args.container_image, args.network,
+                                 max_output_bytes=args.max_output_bytes or None,
+                                 kill_output_bytes=args.kill_output_bytes)
     prompt_manager = PromptManager(prompt_set=args.prompt_set, config=config)
 
     if args.backend == "openai":
@@ -138,6 +147,16 @@ def main():
                         formatter=args.formatter,
                         args=args
                     )
+    elif args.backend == "replay":
+        backend = ReplayBackend(
+                        prompt_manager.system_message(challenge),
+                        prompt_manager.hints_message(),
+                        environment.available_tools,
+                        model=args.model,
+                        args=args
+                    )
+    if args.record:
+        backend = RecordingBackend(backend, cassette_path(logfile))
 
     with CTFConversation(environment, challenge, prompt_manager, backend, logfile, max_rounds=args.max_rounds, max_cost=args.max_cost, args=args) as convo:
         convo.run()
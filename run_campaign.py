@@ -0,0 +1,23 @@
+import argparse
+import sys
+from pathlib import Path
+
+from nyuctf_multiagent.campaign import run_campaign
+from nyuctf_multiagent.runner import load_dcipher_options
+from nyuctf_multiagent.logging import logger
+from nyuctf_multiagent.utils import load_common_options
+
+parser = argparse.ArgumentParser(description="Run the Multi-agent Planner-Executor LLM over a set of CTF challenges")
+
+# Loads the dataset and container related common options into parser
+load_common_options(parser, single_challenge=False)
+load_dcipher_options(parser)
+parser.add_argument("-w", "--workers", default=4, type=int, help="Number of challenges to run concurrently")
+parser.add_argument("--pool-size", default=1, type=int, help="Pre-started idle player containers kept per worker (0 to disable)")
+
+args = parser.parse_args()
+
+logger.set(quiet=args.quiet, debug=args.debug)
+
+config_d = Path(sys.argv[0]).parent / "configs" / "dcipher"
+run_campaign(args, config_d)
@@ -1,4 +1,5 @@
 import argparse
+import copy
 import yaml
 import sys
 from pathlib import Path
@@ -7,10 +8,15 @@ from nyuctf.dataset import CTFDataset
 from nyuctf.challenge import CTFChallenge
 
 from nyuctf_multiagent.environment import CTFEnvironment
+from nyuctf_multiagent.ghidra_cache import load_ghidra_cache
 from nyuctf_multiagent.backends import MODELS, Role
+from nyuctf_multiagent.backends.rate_limit import load_rate_limiter
+from nyuctf_multiagent.backends.replay_backend import Cassette, RecordingBackend, cassette_path, replay_source, use_replay
 from nyuctf_multiagent.prompting import PromptManager
 from nyuctf_multiagent.agent import SingleAgent, AutoPromptAgent
+from nyuctf_multiagent.attempts import SpeculativeAttempts, attempt_logfile, attempt_temperature
 from nyuctf_multiagent.logging import logger
+from nyuctf_multiagent.metrics import start_metrics_server
 from nyuctf_multiagent.utils import APIKeys, load_common_options, get_log_filename, load_config
 from nyuctf_multiagent.config import Config
 
@@ -26,10 +32,15 @@ parser.add_argument("--executor-model", default=None, help="Executor model to us
 parser.add_argument("--autoprompter-model", default=None, help="AutoPrompt model to use (overrides config)")
 parser.add_argument("--max-cost", default=0.0, type=float, help="Max cost in $ (overrides config)")
 parser.add_argument("--enable-autoprompt", action="store_true", help="Init prompt message auto generated, else use generic base prompt")
+parser.add_argument("--record", action="store_true", help="Record the model responses to a cassette next to the log, for --replay")
+parser.add_argument("--replay", default=None, help="Replay the model responses from a cassette or JSON log instead of calling the models")
+parser.add_argument("--attempts", default=1, type=int, help="Independent attempts run concurrently, the first to solve cancels the rest. Attempts share --max-cost.")
+parser.add_argument("--attempt-temperatures", default=None, nargs="+", type=float, help="Temperature of the agents of each attempt, cycled over the attempts (overrides config)")
 
 args = parser.parse_args()
 
 logger.set(quiet=args.quiet, debug=args.debug)
+start_metrics_server(args)
 
 if args.dataset is not None:
     dataset = CTFDataset(dataset_json=args.dataset)
@@ -44,8 +55,6 @@ if logfile.exists() and args.skip_existing:
     exit(0)
 
 keys = APIKeys(args.keys)
-environment = CTFEnvironment(challenge, args.container_image, args.container_network)
-
 if args.config:
     config_f = Path(args.config)
 else:
@@ -60,6 +69,8 @@ if args.autoprompter_model:
     config.autoprompter.model = args.autoprompter_model
 if args.max_cost > 0:
     config.experiment.max_cost = args.max_cost
+if args.replay is not None:
+    use_replay(config, replay_source(args.replay, challenge))
 
 if config.executor.model not in MODELS:
     raise KeyError(f"Model {config.executor.model} not in options. Select from {', '.join(MODELS.keys())}")
@@ -68,24 +79,50 @@ if config.autoprompter.model not in MODELS:
 
 config.experiment.enable_autoprompt = True if args.enable_autoprompt else config.experiment.enable_autoprompt
 
-autoprompter_backend_cls = MODELS[config.autoprompter.model]
-autoprompter_backend = autoprompter_backend_cls(Role.AUTOPROMPTER, config.autoprompter.model,
-                                      environment.get_toolset(config.autoprompter.toolset),
-                                      keys[autoprompter_backend_cls.NAME.upper()], config)
-autoprompter_prompter = PromptManager(config_f.parent / config.autoprompter.prompt, challenge, environment)
-autoprompter = AutoPromptAgent(environment, challenge, autoprompter_prompter,
-                       autoprompter_backend, max_rounds=config.autoprompter.max_rounds)
-
-if config.experiment.enable_autoprompt:
-    autoprompter.enable_autoprompt()
-
-executor_backend_cls = MODELS[config.executor.model]
-executor_backend = executor_backend_cls(Role.EXECUTOR, config.executor.model,
-                                        environment.get_toolset(config.executor.toolset),
-                                        keys[executor_backend_cls.NAME.upper()], config)
-executor_prompter = PromptManager(config_f.parent / config.executor.prompt, challenge, environment)
-
-with SingleAgent(environment, challenge, executor_prompter, executor_backend, autoprompter,
-                 max_rounds=config.executor.max_rounds, max_cost=config.experiment.max_cost,
-                 len_observations=config.executor.len_observations, logfile=logfile) as executor:
+def build_single_agent(config, logfile, temperature=None):
+    """Create the single executor agent, with its own environment. temperature overrides the config."""
+    environment = CTFEnvironment(challenge, args.container_image, args.container_network,
+                                 ghidra_cache=load_ghidra_cache(args),
+                                 ghidra_prefetch=args.ghidra_prefetch,
+                                 max_output_bytes=args.max_output_bytes or None,
+                                 kill_output_bytes=args.kill_output_bytes)
+    if temperature is not None:
+        # Backends read the config on each request, so the attempt gets its own copy
+        config = copy.deepcopy(config)
+        config.executor.temperature = config.autoprompter.temperature = temperature
+
+    autoprompter_backend_cls = MODELS[config.autoprompter.model]
+    autoprompter_backend = autoprompter_backend_cls(Role.AUTOPROMPTER, config.autoprompter.model,
+                                          environment.get_toolset(config.autoprompter.toolset),
+                                          keys.get(autoprompter_backend_cls.NAME.upper()), config)
+    autoprompter_backend.rate_limiter = load_rate_limiter(args, autoprompter_backend_cls.NAME, keys.get(autoprompter_backend_cls.NAME.upper()))
+    autoprompter_prompter = PromptManager(config_f.parent / config.autoprompter.prompt, challenge, environment)
+    autoprompter = AutoPromptAgent(environment, challenge, autoprompter_prompter,
+                           autoprompter_backend, max_rounds=config.autoprompter.max_rounds)
+
+    if config.experiment.enable_autoprompt:
+        autoprompter.enable_autoprompt()
+
+    executor_backend_cls = MODELS[config.executor.model]
+    executor_backend = executor_backend_cls(Role.EXECUTOR, config.executor.model,
+                                            environment.get_toolset(config.executor.toolset),
+                                            keys.get(executor_backend_cls.NAME.upper()), config)
+    executor_backend.rate_limiter = load_rate_limiter(args, executor_backend_cls.NAME, keys.get(executor_backend_cls.NAME.upper()))
+    executor_prompter = PromptManager(config_f.parent / config.executor.prompt, challenge, environment)
+    if args.record:
+        cassette = Cassette(cassette_path(logfile))
+        autoprompter.backend = RecordingBackend(autoprompter.backend, cassette)
+        executor_backend = RecordingBackend(executor_backend, cassette)
+
+    return SingleAgent(environment, challenge, executor_prompter, executor_backend, autoprompter,
+                       max_rounds=config.executor.max_rounds, max_cost=config.experiment.max_cost,
+                       len_observations=config.executor.len_observations, logfile=logfile)
+
+if args.attempts > 1:
+    systems = [build_single_agent(config, attempt_logfile(logfile, i), attempt_temperature(args.attempt_temperatures, i))
+               for i in range(args.attempts)]
+    executor = SpeculativeAttempts(challenge, systems, max_cost=config.experiment.max_cost, logfile=logfile)
+else:
+    executor = build_single_agent(config, logfile)
+with executor:
     executor.run()
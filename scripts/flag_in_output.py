@@ -1,21 +1,7 @@
 from pathlib import Path
 from nyuctf.dataset import CTFDataset
 from nyuctf.challenge import CTFChallenge
-import json
-
-def look_for_flag(logdata, chal):
-    for message in logdata["planner"]:
-        if "content" in message and message["content"] is not None:
-            if chal.flag in message["content"]:
-                return True
-
-    for executor in logdata["executors"]:
-        for message in executor:
-            if "content" in message and message["content"] is not None: 
-                if chal.flag in message["content"]:
-                    return True
-
-    return False
+from nyuctf_multiagent.results_index import ResultsIndex, DEFAULT_INDEX
 
 if __name__ == "__main__":
     import argparse
@@ -23,7 +9,9 @@ if __name__ == "__main__":
     parser.add_argument("--logdir", required=True)
     parser.add_argument("--split", default="test")
     parser.add_argument("--dataset", default=None)
-    
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="Results index of the logs, updated with the new and changed logs")
+    parser.add_argument("-j", "--jobs", default=None, type=int, help="Processes reading the logs, default is one per CPU")
+
     args = parser.parse_args()
 
     if args.dataset is not None:
@@ -32,13 +20,22 @@ if __name__ == "__main__":
         ds = CTFDataset(split=args.split)
 
     logdir = Path(args.logdir)
+    index = ResultsIndex(args.index)
+    index.update(logdir, jobs=args.jobs)
 
-    for log in logdir.glob("*.json"):
-        logdata = log.open().read()
-        logjson = json.loads(logdata)
-        if logjson["success"]:
+    runs = []
+    flags = []
+    # Summary logs of the speculative attempts have no messages, the attempt logs are scanned
+    for run in index.runs(logdir, recursive=False):
+        if run["success"] or run["format"] == "attempts":
+            continue
+        try:
+            chal = ds.get(run["challenge"])
+        except KeyError:
+            print(f"Skipping unknown challenge: {run['challenge']} ({run['path']})")
             continue
-        chal = CTFChallenge(ds.get(log.stem), ds.basedir)
-        # print("Checking", log.stem, chal.flag)
-        if chal.flag in logdata or look_for_flag(logjson, chal):
-            print("Flag found in messages:", log.stem)
+        runs.append(run)
+        flags.append(CTFChallenge(chal, ds.basedir).flag)
+    for run, kind in zip(runs, index.flag_found(runs, flags, jobs=args.jobs)):
+        if kind is not None:
+            print(f"Flag found in messages: {run['challenge']} ({kind})")
@@ -1,9 +1,10 @@
-import json
 import os
 from pathlib import Path
 import itertools as it
 from tabulate import tabulate
 
+from nyuctf_multiagent.results_index import ResultsIndex, DEFAULT_INDEX
+
 getsubdirs = lambda d: filter(lambda p: p.is_dir(), d.iterdir())
 def getconvos(d, model=None):
     for p in d.iterdir():
@@ -24,20 +25,6 @@ def filter_chals(args, year, event, cat, chal):
         return False
     return True
 
-def check_for_mistakes(convo):
-    mistakes = set()
-    for msg in convo["messages"]:
-        cont = msg[1].get("content", msg[1].get("text"))
-        if not cont:
-            continue
-        if "{PORT}" in cont:
-            mistakes.add("PortMissing")
-        if "{port}" in cont:
-            mistakes.add("PortMissing")
-        if "{box}" in cont or "nc None" in cont:
-            mistakes.add("ServerMissing")
-    return mistakes
-
 
 if __name__ == "__main__":
     import argparse
@@ -48,6 +35,8 @@ if __name__ == "__main__":
     parser.add_argument("-t", "--cat", default=[], nargs="+", help="Categories to select, space separated")
     parser.add_argument("-c", "--chal", default=[], nargs="+", help="Challenges to select, space separated")
     parser.add_argument("-m", "--model", default="gpt-3.5-turbo-1106", help="Full name of model to select")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="Results index of the logs, updated with the new and changed logs")
+    parser.add_argument("-j", "--jobs", default=None, type=int, help="Processes reading the logs, default is one per CPU")
     args = parser.parse_args()
 
     table = []
@@ -57,13 +46,19 @@ if __name__ == "__main__":
         print("ERROR:", logdir, "is not a directory.")
         exit(1)
 
+    index = ResultsIndex(args.index)
+    index.update(logdir, jobs=args.jobs)
+    runs = {Path(run["path"]).relative_to(logdir.resolve()): run for run in index.runs(logdir)}
+
     chals = (chal for year in getsubdirs(logdir) for event in getsubdirs(year)
                   for cat in getsubdirs(event) for chal in getsubdirs(cat)
                   if filter_chals(args, year.parts[-1], event.parts[-1], cat.parts[-1], chal.parts[-1]))
     success = set()
     total = 0
     for chal in chals:
-        convos = list(getconvos(chal, args.model))
+        # Only the run logs, not the traces or the logs of the speculative attempts of a run
+        convos = [c for c in getconvos(chal, args.model)
+                  if c.relative_to(logdir) in runs and runs[c.relative_to(logdir)]["format"] != "attempt"]
         if len(convos) == 0:
             # No logs
             print("No logs for challenge:", chal, "model:", args.model)
@@ -74,29 +69,18 @@ if __name__ == "__main__":
         reason = set()
         mistakes = set()
         for cjson in convos:
-            with cjson.open() as f:
-                try:
-                    convo = json.load(f)
-                except:
-                    reason.add("invalid_json")
-                    print("WARN: invalid json", cjson)
-                    continue
-                mistakes |= check_for_mistakes(convo)
-                if convo["solved"]:
-                    solved += 1
-                    success.add(str(chal))
-                else:
-                    if convo["finish_reason"] == "exception":
-                        exptype = convo["exception_info"]["exception_type"]
-                        if exptype == "BadRequestError" and \
-                                ("context_length_exceeded" in convo["exception_info"]["exception_message"] \
-                                or "string_above_max_length" in convo["exception_info"]["exception_message"]):
-                            exptype = "context_length"
-                        if exptype == "RateLimitError":
-                            exptype = "rate_limit"
-                        reason.add(exptype)
-                    else:
-                        reason.add(convo["finish_reason"])
+            run = runs[cjson.relative_to(logdir)]
+            if not run["valid"]:
+                reason.add("invalid_json")
+                print("WARN: invalid json", cjson)
+                continue
+            if run["mistakes"]:
+                mistakes |= set(run["mistakes"].split(","))
+            if run["success"]:
+                solved += 1
+                success.add(str(chal))
+            else:
+                reason.add(run["exit_reason"])
 
         chalname = f"{chal.parts[-1]}({chal.parts[-4]}{'f' if 'Final' in chal.parts[-3] else 'q'})"
         table.append([chalname, f"{solved}/{len(convos)}", ", ".join(list(mistakes)), ", ".join(list(reason))])
@@ -2,6 +2,14 @@ import json
 
 from nyuctf_multiagent.logging import logger
 
+def tool_calls(msg):
+    """Tool calls of the message, parallel tool calls are dumped as a list"""
+    if msg.get("tool_calls") is not None:
+        return msg["tool_calls"]
+    if msg.get("tool_call") is not None:
+        return [msg["tool_call"]]
+    return []
+
 def print_msg(msg):
     if msg["role"] == "MessageRole.SYSTEM":
         logger.system_message(msg["content"])
@@ -9,10 +17,16 @@ def print_msg(msg):
         logger.user_message(msg["content"])
     elif msg["role"] == "MessageRole.ASSISTANT":
         logger.assistant_thought(msg["content"])
-        if "tool_call" in msg and msg["tool_call"] is not None:
-            action = f"**{msg['tool_call']['name']}**:\n\n"
-            for arg, val in msg["tool_call"]["parsed_args"].items():
-                action += f"- {arg}:\n\n```\n{val}\n```\n\n"
+        if len(tool_calls(msg)) > 0:
+            action = ""
+            for tool_call in tool_calls(msg):
+                action += f"**{tool_call['name']}**:\n\n"
+                if "parsed_args" in tool_call:
+                    for arg, val in tool_call["parsed_args"].items():
+                        action += f"- {arg}:\n\n```\n{val}\n```\n\n"
+                else:
+                    # Arguments that failed to parse
+                    action += f"```\n{tool_call['args']}\n```\n\n"
         else:
             action = None
         logger.assistant_action(action)
@@ -42,12 +56,25 @@ if __name__ == "__main__":
 
     if "planner" in transcript and transcript["planner"] is not None:
         logger.print("=============== PLANNER =====================", style="bold")
+        executors = transcript.get("executors", [])
+        # Delegate call id of each executor, rejected or unparsed delegate calls have no executor
+        task_executor = {task_id: i for i, task_id in enumerate(transcript.get("executor_tasks", []))
+                         if task_id is not None}
         exec_count = 0
         for msg in transcript["planner"]:
             print_msg(msg)
-            if "tool_call" in msg and msg["tool_call"]["name"] == "delegate":
-                logger.print(f"=============== EXECUTOR {exec_count+1} =================", style="bold")
-                for msg in transcript["executors"][exec_count]:
+            for tool_call in tool_calls(msg):
+                if tool_call["name"] != "delegate":
+                    continue
+                if task_executor:
+                    index = task_executor.get(tool_call.get("id"))
+                else:
+                    # Older logs without the call ids, count the delegate calls
+                    index = exec_count if exec_count < len(executors) else None
+                    exec_count += 1
+                if index is None:
+                    continue
+                logger.print(f"=============== EXECUTOR {index+1} =================", style="bold")
+                for msg in executors[index]:
                     print_msg(msg)
                 logger.print(f"=============== EXECUTOR DONE =================", style="bold")
-                exec_count += 1
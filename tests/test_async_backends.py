@@ -0,0 +1,219 @@
+"""
+End to end tests of the async backend path against a local mock of the OpenAI and Anthropic APIs.
+Run with `python3 -m unittest discover tests` from the repository root.
+"""
+import json
+import time
+import asyncio
+import inspect
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from anthropic.resources.messages import AsyncMessages
+
+from nyuctf_multiagent.agent import SingleAgent, AutoPromptAgent
+from nyuctf_multiagent.backends import OpenAIBackend, AnthropicBackend, Role
+from nyuctf_multiagent.config import Config
+from nyuctf_multiagent.environment import CTFEnvironment
+from nyuctf_multiagent.exec_session import ExecSession
+
+FLAG = "csawctf{m0ck_s3rv3r}"
+# The Anthropic backend passes `temperature`, which SDKs newer than the one pinned in requirements.txt do not accept
+ANTHROPIC_SUPPORTED = "temperature" in inspect.signature(AsyncMessages.create).parameters
+# Delay of each mock response, so concurrent requests show up in the elapsed time
+RESPONSE_DELAY = 0.2
+
+def openai_response(body, content, tool_call=None):
+    message = {"role": "assistant", "content": content}
+    if tool_call is not None:
+        name, arguments = tool_call
+        message["tool_calls"] = [{"id": f"call_{len(body['messages'])}", "type": "function",
+                                  "function": {"name": name, "arguments": json.dumps(arguments)}}]
+    return {"id": "chatcmpl-mock", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": message,
+                         "finish_reason": "tool_calls" if tool_call is not None else "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}}
+
+def anthropic_response(body, content, tool_call=None):
+    blocks = [{"type": "text", "text": content}]
+    if tool_call is not None:
+        name, arguments = tool_call
+        blocks.append({"type": "tool_use", "id": f"toolu_{len(body['messages'])}", "name": name, "input": arguments})
+    return {"id": "msg_mock", "type": "message", "role": "assistant", "model": body["model"], "content": blocks,
+            "stop_reason": "tool_use" if tool_call is not None else "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 100, "output_tokens": 10}}
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    """
+    Serves /v1/chat/completions in the OpenAI format and /v1/messages in the Anthropic format.
+    The model runs a command on the first round, and answers with the flag once it has a tool result.
+    """
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, body))
+        time.sleep(RESPONSE_DELAY)
+        if self.path.endswith("/chat/completions"):
+            has_result = any(m["role"] == "tool" for m in body["messages"])
+            make_response = openai_response
+        elif self.path.endswith("/messages"):
+            has_result = any(isinstance(m["content"], list) and any(c["type"] == "tool_result" for c in m["content"])
+                             for m in body["messages"])
+            make_response = anthropic_response
+        else:
+            self.send_error(404)
+            return
+        if has_result:
+            response = make_response(body, f"The flag is {FLAG}")
+        else:
+            response = make_response(body, "Let me look around.", ("run_command", {"command": "ls"}))
+        data = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockChallenge:
+    flag = FLAG
+    files = []
+    category = "misc"
+    canonical_name = "mock"
+
+    def start_challenge_container(self):
+        pass
+
+    def stop_challenge_container(self):
+        pass
+
+class MockExecSession(ExecSession):
+    """Runs no container, every command prints the files of the challenge"""
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.commands = []
+
+    def _run(self, command, timeout, max_output=None, kill_output=None):
+        self.commands.append(command)
+        return {"stdout": b"chall.py\n", "stderr": b"", "returncode": 0, "timed_out": False,
+                "stdout_size": 9, "stderr_size": 0, "killed": False}
+
+    def close(self):
+        pass
+
+class MockEnvironment(CTFEnvironment):
+    def setup(self):
+        self.container = "mock"
+        self.exec_session = MockExecSession(self.tracer)
+
+    def teardown(self, exc_type, exc_value, traceback):
+        pass
+
+class MockPrompter:
+    def get(self, key, **kwargs):
+        return f"{key} prompt"
+
+class AsyncBackendTest(unittest.TestCase):
+    BACKENDS = [(OpenAIBackend, "gpt-4o-2024-11-20"), (AnthropicBackend, "claude-3-5-sonnet-20241022")]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), MockAPIHandler)
+        cls.server.requests = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}/v1"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def make_backend(self, backend_class, model, role=Role.EXECUTOR):
+        backend = backend_class(role, model, self.environment.get_toolset(["run_command"]), "mock-key", Config())
+        backend.client.base_url = self.base_url
+        backend.aclient.base_url = self.base_url
+        return backend
+
+    def make_agent(self, backend_class, model, logfile=None):
+        """Agent with a new environment, run against the mock server"""
+        if backend_class is AnthropicBackend and not ANTHROPIC_SUPPORTED:
+            self.skipTest("installed anthropic SDK does not accept temperature, install the version in requirements.txt")
+        self.server.requests.clear()
+        self.environment = MockEnvironment(MockChallenge(), "mock", "mock")
+        self.environment.setup()
+        backend = self.make_backend(backend_class, model)
+        autoprompter = AutoPromptAgent(self.environment, MockChallenge(), MockPrompter(),
+                                       self.make_backend(backend_class, model, Role.AUTOPROMPTER))
+        agent = SingleAgent(self.environment, MockChallenge(), MockPrompter(), backend, autoprompter,
+                            max_rounds=3, logfile=logfile)
+        # The token budget is not under test, counting tokens downloads the tiktoken encoding
+        agent.conversation.max_input_tokens = None
+        return agent
+
+    def test_asend(self):
+        for backend_class, model in self.BACKENDS:
+            with self.subTest(backend=backend_class.NAME):
+                agent = self.make_agent(backend_class, model)
+                agent.add_start_prompts()
+                response = asyncio.run(agent.backend.asend(agent.conversation.messages))
+                self.assertIsNone(response.error)
+                self.assertEqual(response.content, "Let me look around.")
+                self.assertEqual(response.tool_call.name, "run_command")
+                self.assertEqual(response.input_tokens, 100)
+                self.assertEqual(response.output_tokens, 10)
+                self.assertGreater(response.cost, 0)
+                path, body = self.server.requests[-1]
+                self.assertEqual(body["model"], model)
+
+    def test_asend_concurrent(self):
+        for backend_class, model in self.BACKENDS:
+            with self.subTest(backend=backend_class.NAME):
+                agent = self.make_agent(backend_class, model)
+                agent.add_start_prompts()
+
+                async def send_all():
+                    return await asyncio.gather(*[agent.backend.asend(agent.conversation.messages) for _ in range(5)])
+                start = time.time()
+                responses = asyncio.run(send_all())
+                self.assertEqual(len(responses), 5)
+                self.assertTrue(all(r.error is None for r in responses))
+                # The requests overlap instead of waiting for each other
+                self.assertLess(time.time() - start, 5 * RESPONSE_DELAY)
+
+    def test_arun_one_round(self):
+        for backend_class, model in self.BACKENDS:
+            with self.subTest(backend=backend_class.NAME):
+                agent = self.make_agent(backend_class, model)
+                agent.add_start_prompts()
+                agent.conversation.next_round()
+                asyncio.run(agent.arun_one_round())
+                self.assertEqual(self.environment.exec_session.commands[-1], "ls")
+                roles = [m.role.value for m in agent.conversation.all_messages]
+                self.assertEqual(roles[-2:], ["assistant", "observation"])
+                self.assertEqual(agent.conversation.all_messages[-1].tool_data.result["stdout"], "chall.py\n")
+                self.assertFalse(self.environment.solved)
+                self.assertGreater(agent.current_cost, 0)
+
+    def test_arun(self):
+        for backend_class, model in self.BACKENDS:
+            with self.subTest(backend=backend_class.NAME), tempfile.TemporaryDirectory() as logdir:
+                logfile = Path(logdir) / "mock.json"
+                agent = self.make_agent(backend_class, model, logfile=logfile)
+
+                async def run():
+                    async with agent:
+                        await agent.arun()
+                asyncio.run(run())
+                self.assertTrue(agent.environment.solved)
+                log = json.loads(logfile.read_text())
+                self.assertTrue(log["success"])
+                self.assertEqual(len([m for m in log["executor"] if m["role"] == "MessageRole.ASSISTANT"]), 2)
+                self.assertEqual(len(self.server.requests), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests of the return codes and timeouts reported by ExecSession, against a fake docker API client.
+Run with `python3 -m unittest discover tests` from the repository root.
+"""
+import struct
+import unittest
+from socket import socketpair
+from unittest import mock
+
+from nyuctf_multiagent import exec_session
+from nyuctf_multiagent.exec_session import ExecSession, STDOUT, STDERR, EXEC_MARKER, MIN_TIMEOUT
+
+class FakeClock:
+    def __init__(self):
+        self.time = 1000.0
+
+    def __call__(self):
+        return self.time
+
+class FakeAPIClient:
+    """
+    Stands in for docker.APIClient. The command "runs" for `elapsed` seconds of the fake clock,
+    writes `frames` and exits with `exit_code`.
+    """
+    def __init__(self, clock, frames=(), exit_code=0, elapsed=0.0):
+        self.clock = clock
+        self.frames = frames
+        self.exit_code = exit_code
+        self.elapsed = elapsed
+        self.created = []
+
+    def exec_create(self, container, cmd, **kwargs):
+        self.created.append((cmd, kwargs))
+        return {"Id": f"exec{len(self.created)}"}
+
+    def exec_start(self, exec_id, socket=False):
+        if not socket:
+            return b""
+        ours, theirs = socketpair()
+        for stream, data in self.frames:
+            ours.sendall(struct.pack(">BxxxL", stream, len(data)) + data)
+        ours.close()
+        self.clock.time += self.elapsed
+        return theirs
+
+    def exec_inspect(self, exec_id):
+        return {"Running": False, "ExitCode": self.exit_code}
+
+    def close(self):
+        pass
+
+class ExecSessionTest(unittest.TestCase):
+    def run_command(self, timeout=10, kill_output=None, **kwargs):
+        clock = FakeClock()
+        session = ExecSession.__new__(ExecSession)
+        session.container = "mock"
+        session.running = set()
+        session.client = FakeAPIClient(clock, **kwargs)
+        with mock.patch.object(exec_session, "now", clock):
+            res = session._run("true", timeout, kill_output=kill_output)
+        return res, session.client
+
+    def test_output(self):
+        res, _ = self.run_command(frames=[(STDOUT, b"out\n"), (STDERR, b"err\n"), (STDOUT, b"more\n")])
+        self.assertEqual(res["stdout"], b"out\nmore\n")
+        self.assertEqual(res["stderr"], b"err\n")
+        self.assertEqual(res["returncode"], 0)
+        self.assertFalse(res["timed_out"])
+
+    def test_exit_codes_before_timeout(self):
+        # Commands can exit with the codes of `timeout` on their own
+        for code in (1, 124, 137):
+            with self.subTest(code=code):
+                res, _ = self.run_command(timeout=10, exit_code=code, elapsed=0.5)
+                self.assertEqual(res["returncode"], code)
+                self.assertFalse(res["timed_out"])
+
+    def test_timed_out(self):
+        for code in (124, 137):
+            with self.subTest(code=code):
+                res, _ = self.run_command(timeout=10, exit_code=code, elapsed=10.2)
+                self.assertIsNone(res["returncode"])
+                self.assertTrue(res["timed_out"])
+
+    def test_exit_after_timeout(self):
+        # Any other code is the command's own, even if it took longer than the timeout
+        res, _ = self.run_command(timeout=10, exit_code=2, elapsed=10.2)
+        self.assertEqual(res["returncode"], 2)
+        self.assertFalse(res["timed_out"])
+
+    def test_min_timeout(self):
+        for timeout in (0, -5):
+            with self.subTest(timeout=timeout):
+                res, client = self.run_command(timeout=timeout)
+                cmd, kwargs = client.created[0]
+                self.assertEqual(cmd[:4], ["timeout", "-k", "5", str(MIN_TIMEOUT)])
+                self.assertEqual(res["returncode"], 0)
+
+    def test_killed(self):
+        res, client = self.run_command(frames=[(STDOUT, b"x" * 100)] * 3, exit_code=137, kill_output=150)
+        self.assertTrue(res["killed"])
+        self.assertIsNone(res["returncode"])
+        self.assertFalse(res["timed_out"])
+        # The kill script is run with the marker of the command
+        (cmd, kwargs), (kill_cmd, _) = client.created
+        self.assertTrue(kwargs["environment"][0].startswith(f"{EXEC_MARKER}="))
+        self.assertEqual(kill_cmd[-1], kwargs["environment"][0])
+
+if __name__ == "__main__":
+    unittest.main()